@@ -2,29 +2,36 @@ import Alpine from 'alpinejs'
 import persist from '@alpinejs/persist'
 import morph from '@alpinejs/morph'
 
-// Debounce function to limit the rate at which a function can fire
-const debounce = function (func, wait) {
-    let timeout;
-    return function executedFunction(...args) {
-        const context = this;
-        const later = () => {
-            clearTimeout(timeout);
-            func.apply(context, args);
-        };
-        clearTimeout(timeout);
-        timeout = setTimeout(later, wait);
-    };
-};
+// Ball-by-ball names come straight from CricAPI and are shown as HTML
+const escapeHtml = text => String(text).replace(/[&<>"']/g, char => `&#${char.charCodeAt(0)};`);
+
+// Polling falls back to this when matches.json has no refresh time, or one that has already passed
+const DEFAULT_REFRESH_MS = 2 * 60 * 1000;
+const MIN_REFRESH_MS = 60 * 1000;
+const MAX_REFRESH_MS = 60 * 60 * 1000;
+
 // Register the stream component with Alpine
 Alpine.data('stream', () => ({
     autoplayEnabled: Alpine.$persist(false).as('autoplayEnabled').using(localStorage),
     competitions: {},
-    rawCompetitions: {},
+    // Each match's card data by match ID, kept between refreshes so unchanged matches aren't re-rendered
+    matchIndex: new Map(),
     players: new Map(),
+    // Videos whose thumbnail has been swapped for a player
+    activePlayers: {},
+    visibleVideos: new Set(),
+    facadeObserver: null,
+    youTubeApi: null,
     apiReady: false,
-    playersInitialized: false,
     metadataLoaded: false,
+    // When the data shown was generated, and the time its age is reckoned from
+    lastUpdated: null,
+    now: Date.now(),
     error: null,
+    // When the server said the data is next worth fetching, and when the next poll is due
+    nextRefresh: null,
+    pollAt: null,
+    refreshTimer: null,
 
     formatLocalTime(gmtTime) {
         if (!gmtTime) return '';
@@ -63,141 +70,252 @@ Alpine.data('stream', () => ({
         await this.loadStreamData();
         this.metadataLoaded = true;
 
-        // Set up periodic updates
-        setInterval(() => this.loadStreamData(), 2 * 60 * 1000);
+        // Each load schedules the next from the refresh time in the data
+        setInterval(() => { this.now = Date.now(); }, 30 * 1000);
+
+        // Timers are slowed down in background tabs, so catch up when the page is shown again
+        document.addEventListener('visibilitychange', () => {
+            if (document.visibilityState === 'visible' && this.pollAt && Date.now() >= this.pollAt) {
+                this.loadStreamData();
+            }
+        });
 
-        // Load YouTube IFrame API
-        if (!window.YT) {
-            console.log('Loading YouTube IFrame API');
-            const tag = document.createElement('script');
-            tag.src = "https://www.youtube.com/iframe_api";
-            const firstScriptTag = document.getElementsByTagName('script')[0];
-            firstScriptTag.parentNode.insertBefore(tag, firstScriptTag);
+        // The service worker serves cached data straight away, and says when a newer copy has arrived
+        navigator.serviceWorker?.addEventListener('message', event => {
+            if (event.data?.type === 'data-updated' && event.data.path === '/data/matches.json') {
+                this.loadStreamData();
+            }
+        });
 
-            // Define the global callback for the API
-            window.onYouTubeIframeAPIReady = () => {
-                console.log('YouTube IFrame API Ready');
+        // Streams show a thumbnail until they're clicked, or scroll into view with Play All on
+        this.facadeObserver = new IntersectionObserver(entries => {
+            entries.forEach(entry => {
+                const videoId = entry.target.dataset.videoId;
+                if (!entry.target.isConnected) {
+                    this.facadeObserver.unobserve(entry.target);
+                    this.visibleVideos.delete(videoId);
+                } else if (entry.isIntersecting) {
+                    this.visibleVideos.add(videoId);
+                    if (this.autoplayEnabled) this.activatePlayer(videoId, { muted: true });
+                } else {
+                    this.visibleVideos.delete(videoId);
+                }
+            });
+        }, { rootMargin: '200px' });
+    },
+
+    observeFacade(element, videoId) {
+        element.dataset.videoId = videoId;
+        this.facadeObserver?.observe(element);
+    },
+
+    loadYouTubeApi() {
+        // The IFrame API is only fetched once the first player is needed
+        if (!this.youTubeApi) {
+            this.youTubeApi = new Promise(resolve => {
+                if (window.YT?.Player) {
+                    resolve();
+                    return;
+                }
+                console.log('Loading YouTube IFrame API');
+                window.onYouTubeIframeAPIReady = () => {
+                    console.log('YouTube IFrame API Ready');
+                    resolve();
+                };
+                const tag = document.createElement('script');
+                tag.src = "https://www.youtube.com/iframe_api";
+                document.head.appendChild(tag);
+            }).then(() => {
                 this.apiReady = true;
-                this.initializePlayers();
-            };
-        } else {
-            console.log('YouTube IFrame API already loaded');
-            this.apiReady = true;
-            this.initializePlayers();
+            });
         }
+        return this.youTubeApi;
     },
 
-    initializePlayers: debounce(function () {
-        if (!this.apiReady || this.playersInitialized) {
-            console.log("apiReady", this.apiReady);
-            console.log("playersInitialized", this.playersInitialized);
-            console.log('Players already initialized or API not ready');
-            return;
-        }
+    thumbnailUrl(videoId) {
+        return `https://i.ytimg.com/vi/${videoId}/hqdefault.jpg`;
+    },
 
-        console.log('Initializing players...');
-        this.playersInitialized = true;
-
-        Object.values(this.competitions).forEach(competition => {
-            competition.live.forEach(stream => {
-                if (stream.videoId && !this.players.has(stream.videoId)) {
-                    try {
-                        console.log(`Creating player for video ${stream.videoId}`);
-                        new YT.Player(`player-${stream.videoId}`, {
-                            videoId: stream.videoId,
-                            playerVars: {
-                                'mute': this.autoplayEnabled ? 1 : 0,
-                                'playsinline': 1,
-                                'rel': 0
-                            },
-                            events: {
-                                'onReady': (event) => this.onPlayerReady(stream.videoId, event),
-                                'onError': (event) => console.error(`Player error for video ${stream.videoId}:`, event)
-                            }
-                        });
-                    } catch (error) {
-                        console.error(`Failed to initialize player for video ${stream.videoId}:`, error);
-                    }
+    async activatePlayer(videoId, { muted = false } = {}) {
+        if (!videoId || this.activePlayers[videoId]) return;
+        this.activePlayers[videoId] = true;
+
+        await this.loadYouTubeApi();
+        // Wait for the thumbnail to be swapped for the player's placeholder
+        await this.$nextTick();
+        if (!this.activePlayers[videoId] || !document.getElementById(`player-${videoId}`)) return;
+
+        try {
+            console.log(`Creating player for video ${videoId}`);
+            new YT.Player(`player-${videoId}`, {
+                videoId,
+                playerVars: {
+                    'autoplay': 1,
+                    'mute': muted ? 1 : 0,
+                    'playsinline': 1,
+                    'rel': 0
+                },
+                events: {
+                    'onReady': (event) => this.onPlayerReady(videoId, event),
+                    'onError': (event) => console.error(`Player error for video ${videoId}:`, event)
                 }
             });
-        });
-    }, 500),
+        } catch (error) {
+            console.error(`Failed to initialize player for video ${videoId}:`, error);
+            delete this.activePlayers[videoId];
+        }
+    },
+
+    removePlayer(videoId) {
+        const player = this.players.get(videoId);
+        if (player && typeof player.destroy === 'function') {
+            player.destroy();
+        }
+        this.players.delete(videoId);
+        delete this.activePlayers[videoId];
+    },
 
     async loadStreamData() {
         try {
-            this.error = null;
-            const response = await fetch(`data/matches.json?t=${Date.now()}`);
+            // Revalidated with the server rather than fetched in full, and served by the service worker when there is one
+            const response = await fetch('data/matches.json', { cache: 'no-cache' });
             if (!response.ok) {
                 throw new Error(`HTTP error! status: ${response.status}`);
             }
             const data = await response.json();
 
-            // Extract lastUpdated and competitions from the data
-            const { lastUpdated, competitions } = data;
+            // Extract lastUpdated, competitions and the refresh hint from the data
+            const { lastUpdated, competitions, refresh } = data;
+            this.error = null;
+            this.now = Date.now();
+
+            // Older data, from a cached copy served while a newer one was on its way, is ignored
+            if (this.lastUpdated && new Date(lastUpdated) < new Date(this.lastUpdated)) {
+                return;
+            }
 
             // Only update if there are changes or this is the first load
             if (Object.keys(competitions).length > 0 || !this.metadataLoaded) {
-                // Store the raw competition data
-                this.rawCompetitions = competitions;
-
-                // Transform the matches data into the expected format
-                const transformedCompetitions = {};
-
-                Object.entries(competitions).forEach(([compName, comp]) => {
-                    transformedCompetitions[compName] = {
-                        live: [],
-                        upcoming: []
-                    };
-
-                    comp.matches.forEach(match => {
-                        const streamData = {
-                            videoId: match.stream?.videoId,
-                            title: match.stream?.title,
-                            channelId: match.stream?.channelId,
-                            matchEnded: match.matchEnded,
-                            fixture: {
-                                match_id: match.id,
-                                home_team: match.homeTeam,
-                                away_team: match.awayTeam,
-                                venue: match.venue,
-                                start_time_gmt: match.startTime || null,
-                                day: match.status?.split(' - ')?.[0]
-                            }
-                        };
-
-                        // Add to live array if there's a videoId, otherwise to upcoming
-                        if (match.stream?.videoId) {
-                            transformedCompetitions[compName].live.push(streamData);
-                        } else {
-                            transformedCompetitions[compName].upcoming.push(streamData);
-                        }
-                    });
-
-                    // Sort matches by home team, with ended matches last
-                    transformedCompetitions[compName].live.sort((a, b) => {
-                        if (a.matchEnded && !b.matchEnded) return 1;
-                        if (!a.matchEnded && b.matchEnded) return -1;
-                        return a.fixture.home_team.localeCompare(b.fixture.home_team);
-                    });
-                    transformedCompetitions[compName].upcoming.sort((a, b) => {
-                        if (a.matchEnded && !b.matchEnded) return 1;
-                        if (!a.matchEnded && b.matchEnded) return -1;
-                        return a.fixture.home_team.localeCompare(b.fixture.home_team);
-                    });
-                });
-
-                this.competitions = transformedCompetitions;
+                this.updateMatches(competitions);
+                this.lastUpdated = lastUpdated;
                 this.metadataLoaded = true;
-
-                // Reinitialize players if needed
-                if (this.apiReady) {
-                    this.playersInitialized = false;
-                    this.initializePlayers();
-                }
             }
+            this.nextRefresh = refresh?.nextRefresh ?? null;
         } catch (error) {
             console.error('Error loading stream data:', error);
-            this.error = 'Failed to load match data. Please try refreshing the page.';
+            // The last data loaded stays on the page, with its age
+            this.error = this.lastUpdated
+                ? "Couldn't refresh the match data."
+                : 'Failed to load match data. Please try refreshing the page.';
+        } finally {
+            this.scheduleRefresh(this.nextRefresh);
+        }
+    },
+
+    scheduleRefresh(nextRefresh) {
+        clearTimeout(this.refreshTimer);
+        let delay = nextRefresh ? new Date(nextRefresh) - Date.now() : NaN;
+        if (!(delay > 0)) {
+            delay = DEFAULT_REFRESH_MS;
+        }
+        delay = Math.min(Math.max(delay, MIN_REFRESH_MS), MAX_REFRESH_MS);
+        // Spread clients out a little, so they don't all arrive the moment the data is due
+        delay += Math.random() * Math.min(delay * 0.1, 30 * 1000);
+        this.pollAt = Date.now() + delay;
+        this.refreshTimer = setTimeout(() => this.loadStreamData(), delay);
+    },
+
+    formatAge(timestamp) {
+        if (!timestamp) return '';
+        const minutes = Math.max(0, Math.floor((this.now - new Date(timestamp)) / (60 * 1000)));
+        if (minutes < 1) return 'Updated just now';
+        if (minutes < 60) return `Updated ${minutes}m ago`;
+        const hours = Math.floor(minutes / 60);
+        if (hours < 24) return `Updated ${hours}h ${minutes % 60}m ago`;
+        return `Updated ${this.formatTimestamp(timestamp)} on ${new Date(timestamp).toLocaleDateString()}`;
+    },
+
+    toStream(match, signature) {
+        const score = this.formatScore(match);
+        return {
+            signature,
+            videoId: match.stream?.videoId,
+            title: match.stream?.title,
+            channelId: match.stream?.channelId,
+            matchEnded: match.matchEnded,
+            fixture: {
+                match_id: match.id,
+                home_team: match.homeTeam,
+                away_team: match.awayTeam,
+                venue: match.venue,
+                start_time_gmt: match.startTime || null,
+                day: match.status?.split(' - ')?.[0]
+            },
+            score: {
+                summary: score.split('<br>')[0],
+                details: score.split('<br>').slice(1).join('<br>')
+            }
+        };
+    },
+
+    updateMatches(competitions) {
+        // Matches are compared with what's shown by their serialized data, and only changed ones are updated,
+        // so Alpine's keyed lists leave the cards and players of unchanged matches alone
+        const seen = new Set();
+        const updated = {};
+
+        Object.entries(competitions).forEach(([compName, comp]) => {
+            const live = [];
+            const upcoming = [];
+
+            comp.matches.forEach(match => {
+                seen.add(match.id);
+                const signature = JSON.stringify(match);
+                let stream = this.matchIndex.get(match.id);
+                if (!stream) {
+                    this.matchIndex.set(match.id, this.toStream(match, signature));
+                    stream = this.matchIndex.get(match.id);
+                } else if (stream.signature !== signature) {
+                    if (stream.videoId && stream.videoId !== match.stream?.videoId) {
+                        this.removePlayer(stream.videoId);
+                    }
+                    Object.assign(stream, this.toStream(match, signature));
+                }
+
+                // Add to live array if there's a videoId, otherwise to upcoming
+                (stream.videoId ? live : upcoming).push(stream);
+            });
+
+            // Sort matches by home team, with ended matches last
+            const byHomeTeam = (a, b) => {
+                if (a.matchEnded && !b.matchEnded) return 1;
+                if (!a.matchEnded && b.matchEnded) return -1;
+                return a.fixture.home_team.localeCompare(b.fixture.home_team);
+            };
+            live.sort(byHomeTeam);
+            upcoming.sort(byHomeTeam);
+
+            // Lists whose matches and order are unchanged are kept as they are
+            const current = this.competitions[compName];
+            const sameMatches = (a, b) => a.length === b.length && a.every((stream, i) => stream === b[i]);
+            updated[compName] = current || { live, upcoming };
+            if (current && !sameMatches(current.live, live)) current.live = live;
+            if (current && !sameMatches(current.upcoming, upcoming)) current.upcoming = upcoming;
+        });
+
+        // Matches that have dropped out of the data lose their players
+        [...this.matchIndex.keys()].forEach(matchId => {
+            if (!seen.has(matchId)) {
+                const videoId = this.matchIndex.get(matchId).videoId;
+                if (videoId) this.removePlayer(videoId);
+                this.matchIndex.delete(matchId);
+            }
+        });
+
+        const currentNames = Object.keys(this.competitions);
+        const updatedNames = Object.keys(updated);
+        if (currentNames.length !== updatedNames.length || currentNames.some((name, i) => name !== updatedNames[i])) {
+            this.competitions = updated;
         }
     },
 
@@ -212,15 +330,7 @@ Alpine.data('stream', () => ({
         });
     },
 
-    getMatchScore(matchId) {
-        // Find the match in raw competitions data
-        let match = null;
-        for (const comp of Object.values(this.rawCompetitions)) {
-            match = comp.matches.find(m => m.id === matchId);
-            if (match) break;
-        }
-        if (!match) return null;
-
+    formatScore(match) {
         let scoreText = `<strong>${match.status || ''}</strong>`;
 
         // Add scores for each innings in reverse order
@@ -238,19 +348,31 @@ Alpine.data('stream', () => ({
             });
         }
 
+        // Batters, bowler and the over so far, when ball-by-ball data is being followed
+        const live = match.live;
+        if (live) {
+            const batters = live.batters.map(batter => `${escapeHtml(batter.name)} ${batter.runs}* (${batter.balls})`);
+            if (batters.length) scoreText += `<br>${batters.join(', ')}`;
+            if (live.bowler) {
+                const { name, overs, runs, wickets } = live.bowler;
+                scoreText += `<br>${escapeHtml(name)} ${overs}-${runs}-${wickets}`;
+            }
+            const over = live.thisOver.length ? live.thisOver : live.lastOver;
+            if (over.length) scoreText += `<br>${live.thisOver.length ? 'This over' : 'Last over'}: ${escapeHtml(over.join(' '))}`;
+            if (live.fallOfWickets.length) scoreText += `<br>Last wicket: ${escapeHtml(live.fallOfWickets.at(-1))}`;
+        }
+
         return scoreText;
     },
 
+    getMatchScore(matchId) {
+        const stream = this.matchIndex.get(matchId);
+        if (!stream) return null;
+        return [stream.score.summary, stream.score.details].filter(Boolean).join('<br>');
+    },
+
     isMatchInStreams(matchId) {
-        // Check if the match is in any competition's live or upcoming arrays
-        return Object.values(this.competitions).some(competition => {
-            const allMatches = [...(competition.live || []), ...(competition.upcoming || [])];
-            return allMatches.some(stream => {
-                // Check both match_id and match_url for compatibility
-                const streamMatchId = stream.fixture?.match_id || stream.fixture?.match_url;
-                return streamMatchId === matchId;
-            });
-        });
+        return this.matchIndex.has(matchId);
     },
 
     onPlayerReady(videoId, event) {
@@ -269,14 +391,14 @@ Alpine.data('stream', () => ({
     },
 
     toggleAllPlayers() {
-        if (!this.apiReady) {
-            console.log('YouTube API not ready yet, waiting...');
-            return;
-        }
-
         console.log(`Toggling all players. Autoplay enabled: ${this.autoplayEnabled}`);
         console.log(`Number of players: ${this.players.size}`);
 
+        // Streams in view that are still thumbnails get a player, which starts playing muted when it's ready
+        if (this.autoplayEnabled) {
+            this.visibleVideos.forEach(videoId => this.activatePlayer(videoId, { muted: true }));
+        }
+
         const playVideo = (player) => {
             if (player && typeof player.playVideo === 'function') {
                 console.log('Playing video');
@@ -1,10 +1,18 @@
-const CACHE_NAME = 'county-cricket-live-v1';
+const CACHE_NAME = 'county-cricket-live-v2';
+const DATA_CACHE_NAME = 'county-cricket-live-data-v1';
 const STATIC_ASSETS = [
     '/',
     '/index.html',
     '/css/compiled.css',
     '/js/bundle.js'
 ];
+// Data files served from the cache straight away and refreshed in the background
+const DATA_FILES = [
+    '/data/matches.json',
+    '/data/streams.json'
+];
+// Revalidations under way, so requests from every open tab share one fetch
+const inFlight = new Map();
 
 // Install event - cache static assets
 self.addEventListener('install', event => {
@@ -22,7 +30,7 @@ self.addEventListener('activate', event => {
         caches.keys().then(cacheNames => {
             return Promise.all(
                 cacheNames.map(cacheName => {
-                    if (cacheName !== CACHE_NAME) {
+                    if (cacheName !== CACHE_NAME && cacheName !== DATA_CACHE_NAME) {
                         return caches.delete(cacheName);
                     }
                 })
@@ -31,8 +39,72 @@ self.addEventListener('activate', event => {
     );
 });
 
+// Fetch the latest copy of a data file, asking the server only for changes since the cached one
+function revalidate(path) {
+    if (inFlight.has(path)) {
+        return inFlight.get(path);
+    }
+
+    const update = (async () => {
+        const cache = await caches.open(DATA_CACHE_NAME);
+        const cached = await cache.match(path);
+        const headers = {};
+        if (cached?.headers.get('ETag')) {
+            headers['If-None-Match'] = cached.headers.get('ETag');
+        }
+        if (cached?.headers.get('Last-Modified')) {
+            headers['If-Modified-Since'] = cached.headers.get('Last-Modified');
+        }
+
+        // Skip the browser's HTTP cache, which would otherwise answer with its own copy
+        const response = await fetch(path, { headers, cache: 'no-store' });
+        if (response.status === 304 && cached) {
+            return { response: cached, changed: false };
+        }
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        await cache.put(path, response.clone());
+        return { response, changed: Boolean(cached) };
+    })();
+
+    inFlight.set(path, update);
+    update.finally(() => inFlight.delete(path)).catch(() => {});
+    return update;
+}
+
+// Tell open pages when a data file they were served from the cache has changed
+async function notifyClients(path) {
+    const clients = await self.clients.matchAll({ type: 'window' });
+    clients.forEach(client => client.postMessage({ type: 'data-updated', path }));
+}
+
+async function staleWhileRevalidate(event, path) {
+    const cache = await caches.open(DATA_CACHE_NAME);
+    const cached = await cache.match(path);
+    const update = revalidate(path);
+
+    if (cached) {
+        event.waitUntil(
+            update
+                .then(({ changed }) => changed && notifyClients(path))
+                .catch(error => console.log(`Couldn't refresh ${path}: `, error))
+        );
+        return cached;
+    }
+    const { response } = await update;
+    return response.clone();
+}
+
 // Fetch event - serve from cache, falling back to network
 self.addEventListener('fetch', event => {
+    const url = new URL(event.request.url);
+    // Data files are cached by path, whatever their query string
+    if (event.request.method === 'GET' && url.origin === self.location.origin && DATA_FILES.includes(url.pathname)) {
+        event.respondWith(staleWhileRevalidate(event, url.pathname));
+        return;
+    }
+
     event.respondWith(
         caches.match(event.request)
             .then(response => {
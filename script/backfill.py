@@ -0,0 +1,206 @@
+import json
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, time, timedelta, timezone
+from pathlib import Path
+import httplib2
+from pydantic import ValidationError
+from models import Channel, Fixture, ReplayInfo, ReplaysData
+import clock
+from state import STATE_DIR, load_json, save_json
+from update_streams import (
+    youtube,
+    load_channels,
+    load_fixtures,
+    get_channel_id_for_team,
+    get_fixture_start_time,
+    iter_playlist_items,
+)
+
+REPLAYS_FILE = Path("public/data/replays.json")
+CHECKPOINT_FILE = STATE_DIR / "backfill-checkpoint.json"
+BACKFILL_WORKERS = 4
+# Streams are often scheduled a few days before they're broadcast
+SCHEDULING_LEAD = timedelta(days=14)
+
+
+def load_fixtures_in_range(start: date, end: date) -> list[Fixture]:
+    """Load the unique fixtures from every fixtures file between two dates."""
+    fixtures = {}
+    day = start
+    while day <= end:
+        try:
+            for fixture in load_fixtures(day):
+                fixtures.setdefault(fixture.match_id, fixture)
+        except ValidationError as e:
+            print(f"Skipping fixtures for {day}: {str(e)}")
+        day += timedelta(days=1)
+    return list(fixtures.values())
+
+
+def load_replays(replays_file: Path = REPLAYS_FILE) -> ReplaysData:
+    try:
+        with open(replays_file) as f:
+            return ReplaysData(**json.load(f))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return ReplaysData(last_updated=clock.now(), replays={})
+
+
+def write_replays(replays_data: ReplaysData, replays_file: Path = REPLAYS_FILE):
+    replays_data.last_updated = clock.now()
+    replays_data.replays = dict(sorted(replays_data.replays.items()))
+    with open(replays_file, "w") as f:
+        json.dump(replays_data.model_dump(by_alias=True, mode="json"), f, indent=2)
+
+
+def match_replays(
+    items: list[dict],
+    fixtures: list[Fixture],
+    start: date,
+    end: date,
+) -> dict[str, list[ReplayInfo]]:
+    """Match finished streams to fixtures by the day they were broadcast.
+
+    Where a channel has more than one fixture on a day, or more than one stream,
+    each fixture day keeps the stream that started closest to its scheduled start.
+    """
+    best: dict[tuple[str, date], tuple[float, ReplayInfo]] = {}
+    for item in items:
+        live_details = item.get("liveStreamingDetails", {})
+        if not live_details.get("actualStartTime"):
+            continue
+        actual_start = datetime.fromisoformat(live_details["actualStartTime"].replace("Z", "+00:00"))
+        day = actual_start.date()
+        if not start <= day <= end:
+            continue
+
+        for fixture in fixtures:
+            if not fixture.start_date <= day <= fixture.end_date:
+                continue
+            scheduled = get_fixture_start_time(fixture, day) or actual_start
+            distance = abs((actual_start - scheduled).total_seconds())
+            key = (fixture.match_id, day)
+            if key in best and best[key][0] <= distance:
+                continue
+            best[key] = (distance, ReplayInfo(
+                match_date=day,
+                video_id=item["id"],
+                title=item["snippet"]["title"],
+                channel_id=item["snippet"]["channelId"],
+                actual_start_time=actual_start,
+            ))
+
+    replays: dict[str, list[ReplayInfo]] = {}
+    for (match_id, _), (_, replay) in sorted(best.items(), key=lambda entry: (entry[0][0], entry[0][1])):
+        replays.setdefault(match_id, []).append(replay)
+    return replays
+
+
+def merge_replays(replays: dict[str, list[ReplayInfo]], new_replays: dict[str, list[ReplayInfo]]):
+    """Add newly found replays, one per match and day, keeping the days a scan didn't cover."""
+    for match_id, match_replays in new_replays.items():
+        by_date = {replay.match_date: replay for replay in replays.get(match_id, [])}
+        by_date.update((replay.match_date, replay) for replay in match_replays)
+        replays[match_id] = [by_date[day] for day in sorted(by_date)]
+
+
+def find_channel_replays(
+    channel: Channel,
+    fixtures: list[Fixture],
+    start: date,
+    end: date,
+) -> dict[str, list[ReplayInfo]]:
+    """Scan a channel's uploads back to the start of the range and match its streams."""
+    # Each worker thread gets its own connection, as the shared client isn't thread-safe
+    http = httplib2.Http(timeout=30)
+    published_after = datetime.combine(start, time(0, 0), tzinfo=timezone.utc) - SCHEDULING_LEAD
+    video_ids = [
+        video_id
+        for video_id, _ in iter_playlist_items(channel.uploads_playlist_id, published_after, http=http)
+    ]
+
+    items = []
+    for i in range(0, len(video_ids), 50):
+        request = youtube.videos().list(
+            part="snippet,liveStreamingDetails",
+            id=",".join(video_ids[i:i + 50])
+        )
+        items.extend(request.execute(http=http).get("items", []))
+    return match_replays(items, fixtures, start, end)
+
+
+def backfill(
+    start: date,
+    end: date,
+    replays_file: Path = REPLAYS_FILE,
+    checkpoint_file: Path = CHECKPOINT_FILE,
+) -> ReplaysData:
+    """Attach replay streams to past fixtures between two dates.
+
+    Channels are scanned concurrently. Each completed channel and range is
+    checkpointed with its results, so a resumed run skips it.
+    """
+    channels = load_channels()
+    fixtures = load_fixtures_in_range(start, end)
+    checkpoint = load_json(checkpoint_file, {"completed": []})
+    replays_data = load_replays(replays_file)
+
+    fixtures_by_channel: dict[str, list[Fixture]] = {}
+    for fixture in fixtures:
+        channel_id = get_channel_id_for_team(fixture.home_team, channels)
+        if channel_id:
+            fixtures_by_channel.setdefault(channel_id, []).append(fixture)
+
+    pending = {}
+    for channel in channels.values():
+        key = f"{channel.youtube_channel_id}:{start}:{end}"
+        if channel.youtube_channel_id not in fixtures_by_channel:
+            continue
+        if key in checkpoint["completed"]:
+            print(f"Skipping {channel.name}, already backfilled for {start} to {end}")
+            continue
+        pending[key] = channel
+
+    print(f"Backfilling {len(pending)} channels for {len(fixtures)} fixtures from {start} to {end}")
+    with ThreadPoolExecutor(max_workers=BACKFILL_WORKERS) as executor:
+        futures = {
+            executor.submit(
+                find_channel_replays,
+                channel,
+                fixtures_by_channel[channel.youtube_channel_id],
+                start,
+                end,
+            ): key
+            for key, channel in pending.items()
+        }
+        for future in as_completed(futures):
+            key = futures[future]
+            channel = pending[key]
+            try:
+                channel_replays = future.result()
+            except Exception as e:
+                print(f"Error backfilling {channel.name}: {str(e)}")
+                if "quotaExceeded" in str(e):
+                    print("YouTube API quota exceeded. Resume the backfill later.")
+                continue
+
+            merge_replays(replays_data.replays, channel_replays)
+            write_replays(replays_data, replays_file)
+            checkpoint["completed"].append(key)
+            save_json(checkpoint_file, checkpoint)
+            print(f"Found {len(channel_replays)} replays for {channel.name}")
+
+    return replays_data
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Attach replay streams to past fixtures")
+    parser.add_argument("--start", type=date.fromisoformat, required=True, help="First day (YYYY-MM-DD)")
+    parser.add_argument(
+        "--end",
+        type=date.fromisoformat,
+        default=clock.today() - timedelta(days=1),
+        help="Last day (YYYY-MM-DD), yesterday by default"
+    )
+    args = parser.parse_args()
+    backfill(args.start, args.end)
@@ -0,0 +1,225 @@
+import json
+import os
+from datetime import timedelta
+from pathlib import Path
+from typing import Iterator, NamedTuple, Optional
+from models import BatterScore, BowlerFigures, LiveSummary
+from state import STATE_DIR, StateStore, get_store
+
+BALL_BY_BALL_DIR = STATE_DIR / "ball-by-ball"
+BALL_BY_BALL_NAMESPACE = "ball-by-ball"
+# A match's cursor and summary are dropped once it hasn't been ingested for this long
+BALL_BY_BALL_TTL = timedelta(days=int(os.getenv("BALL_BY_BALL_TTL_DAYS", "7")))
+
+# CricAPI's names for extras that are added to a delivery's runs, by their scorecard abbreviation
+EXTRA_TYPES = {
+    "wide": "wd",
+    "wides": "wd",
+    "noball": "nb",
+    "no ball": "nb",
+    "bye": "b",
+    "byes": "b",
+    "legbye": "lb",
+    "leg bye": "lb",
+    "legbyes": "lb",
+}
+# Extras that aren't legal deliveries, and are charged to the bowler
+ILLEGAL_DELIVERIES = {"wd", "nb"}
+# Dismissals the bowler isn't credited with
+NOT_BOWLERS_WICKETS = {"run out", "retired hurt", "retired out", "obstructing the field"}
+
+
+class Delivery(NamedTuple):
+    """One ball, as kept in a match's log."""
+    number: int
+    innings: int
+    over: int
+    ball: int
+    batter: str
+    bowler: str
+    runs: int
+    extras: int
+    extra_type: str
+    # The batter dismissed, if any, and how
+    out: str
+    dismissal: str
+
+
+def parse_delivery(item: dict) -> Delivery:
+    """Turn one of CricAPI's ball-by-ball entries into a delivery."""
+    dismissal = (item.get("dismissal") or "").lower()
+    batter = (item.get("batsman") or {}).get("name", "")
+    return Delivery(
+        number=int(item["n"]),
+        innings=int(item.get("inning") or 0),
+        over=int(item.get("over") or 0),
+        ball=int(item.get("ball") or 0),
+        batter=batter,
+        bowler=(item.get("bowler") or {}).get("name", ""),
+        runs=int(item.get("runs") or 0),
+        extras=int(item.get("extras") or 0),
+        extra_type=EXTRA_TYPES.get((item.get("penalty") or "").lower(), ""),
+        out=((item.get("dismissed") or {}).get("name") or batter) if dismissal else "",
+        dismissal=dismissal,
+    )
+
+
+def new_deliveries(items: list[dict], cursor: int) -> list[Delivery]:
+    """Parse the deliveries after the cursor, reading back from the end of the payload.
+
+    CricAPI lists deliveries in order, so only the entries since the last poll
+    are parsed, however long the match has been going.
+    """
+    new = []
+    for item in reversed(items):
+        if int(item.get("n") or 0) <= cursor:
+            break
+        new.append(parse_delivery(item))
+    return new[::-1]
+
+
+def new_summary(innings: int = 0) -> dict:
+    """The running totals for an innings before its first ball."""
+    return {
+        "innings": innings,
+        "runs": 0,
+        "wickets": 0,
+        "over": 0,
+        # Runs and balls for each batter, and the ones not out, in the order they came in
+        "batters": {},
+        "atCrease": [],
+        # Legal balls, runs and wickets for each bowler
+        "bowlers": {},
+        "bowler": None,
+        "thisOver": [],
+        "lastOver": [],
+        "fallOfWickets": [],
+    }
+
+
+def delivery_label(delivery: Delivery) -> str:
+    if delivery.dismissal:
+        return "W"
+    if delivery.extra_type:
+        return f"{delivery.runs + delivery.extras}{delivery.extra_type}"
+    return str(delivery.runs)
+
+
+def apply_delivery(summary: dict, delivery: Delivery) -> dict:
+    """Add a delivery to an innings' running totals, starting afresh for a new innings."""
+    if delivery.innings != summary["innings"]:
+        summary = new_summary(delivery.innings)
+    if delivery.over != summary["over"]:
+        if summary["thisOver"]:
+            summary["lastOver"] = summary["thisOver"]
+        summary["thisOver"] = []
+        summary["over"] = delivery.over
+
+    legal = delivery.extra_type not in ILLEGAL_DELIVERIES
+    summary["runs"] += delivery.runs + delivery.extras
+
+    batter = summary["batters"].setdefault(delivery.batter, [0, 0])
+    batter[0] += delivery.runs
+    if delivery.extra_type != "wd":
+        batter[1] += 1
+    if delivery.batter not in summary["atCrease"]:
+        # Only the last two batters in can be at the crease
+        summary["atCrease"] = [*summary["atCrease"], delivery.batter][-2:]
+
+    bowler = summary["bowlers"].setdefault(delivery.bowler, [0, 0, 0])
+    bowler[0] += legal
+    bowler[1] += delivery.runs + (delivery.extras if delivery.extra_type in ILLEGAL_DELIVERIES else 0)
+    summary["bowler"] = delivery.bowler
+
+    if delivery.dismissal:
+        summary["wickets"] += 1
+        if delivery.dismissal not in NOT_BOWLERS_WICKETS:
+            bowler[2] += 1
+        summary["atCrease"] = [name for name in summary["atCrease"] if name != delivery.out]
+        summary["fallOfWickets"].append(
+            f"{summary['runs']}-{summary['wickets']} ({delivery.out}, {delivery.over}.{delivery.ball})"
+        )
+    summary["thisOver"].append(delivery_label(delivery))
+    return summary
+
+
+def live_summary(summary: dict) -> LiveSummary:
+    """The parts of an innings' running totals shown with the match."""
+    bowler = summary["bowlers"].get(summary["bowler"]) if summary["bowler"] is not None else None
+    return LiveSummary(
+        batters=[
+            BatterScore(name=name, runs=summary["batters"][name][0], balls=summary["batters"][name][1])
+            for name in summary["atCrease"]
+        ],
+        bowler=BowlerFigures(
+            name=summary["bowler"],
+            overs=f"{bowler[0] // 6}.{bowler[0] % 6}",
+            runs=bowler[1],
+            wickets=bowler[2],
+        ) if bowler else None,
+        this_over=summary["thisOver"],
+        last_over=summary["lastOver"],
+        fall_of_wickets=summary["fallOfWickets"],
+    )
+
+
+class BallByBall:
+    """Each live match's deliveries, logged as they arrive, and the summary kept from them.
+
+    A match's deliveries are appended to its own log in log_dir, one compact
+    JSON array per line. The number of the last delivery logged is kept as a
+    cursor in the state store along with the innings' running totals, so each
+    poll only parses and applies the deliveries since the last. The cursor is
+    moved after the log is written, so deliveries logged twice by a run that
+    was cut short are skipped when the log is read.
+    """
+
+    def __init__(self, log_dir: Path = BALL_BY_BALL_DIR, store: Optional[StateStore] = None):
+        self.log_dir = log_dir
+        self.entries = (store or get_store()).namespace(BALL_BY_BALL_NAMESPACE, ttl=BALL_BY_BALL_TTL)
+
+    def log_file(self, match_id: str) -> Path:
+        return self.log_dir / f"{match_id}.jsonl"
+
+    def needs_update(self, match_id: str, score_key: Optional[str]) -> bool:
+        """Whether the match's score has moved on since its deliveries were last fetched."""
+        state = self.entries.get(match_id)
+        return state is None or score_key is None or state["scoreKey"] != score_key
+
+    def ingest(self, match_id: str, items: list[dict], score_key: Optional[str] = None) -> LiveSummary:
+        """Log the deliveries in a ball-by-ball payload that haven't been seen, and update the summary."""
+        state = self.entries.get(match_id) or {"cursor": 0, "scoreKey": None, "summary": new_summary()}
+        deliveries = new_deliveries(items, state["cursor"])
+        if deliveries:
+            self.log_dir.mkdir(parents=True, exist_ok=True)
+            with open(self.log_file(match_id), "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(list(delivery), separators=(",", ":")) + "\n" for delivery in deliveries)
+            for delivery in deliveries:
+                state["summary"] = apply_delivery(state["summary"], delivery)
+            state["cursor"] = deliveries[-1].number
+        state["scoreKey"] = score_key
+        self.entries.set(match_id, state)
+        return live_summary(state["summary"])
+
+    def summary(self, match_id: str) -> Optional[LiveSummary]:
+        state = self.entries.get(match_id)
+        return live_summary(state["summary"]) if state else None
+
+    def read_log(self, match_id: str) -> Iterator[Delivery]:
+        """Read back a match's deliveries in order."""
+        if not self.log_file(match_id).exists():
+            return
+        last = 0
+        with open(self.log_file(match_id), encoding="utf-8") as f:
+            for line in f:
+                delivery = Delivery(*json.loads(line))
+                if delivery.number > last:
+                    last = delivery.number
+                    yield delivery
+
+    def rebuild(self, match_id: str) -> LiveSummary:
+        """Work the summary out again from the whole log."""
+        summary = new_summary()
+        for delivery in self.read_log(match_id):
+            summary = apply_delivery(summary, delivery)
+        return live_summary(summary)
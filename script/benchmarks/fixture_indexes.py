@@ -0,0 +1,97 @@
+"""Time building the fixture indexes on a calendar of several seasons.
+
+Run from the repository root:
+
+    python script/benchmarks/fixture_indexes.py --seasons 1 5 10
+"""
+import sys
+import argparse
+import json
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fixture_extractor import group_fixtures_by_day, write_fixtures_to_json
+from fixture_index import build_indexes, content_hash, iter_fixture_files
+from models import Fixture
+from clock import VirtualClock, use_clock
+
+TEAMS = [f"County {i}" for i in range(18)]
+# Matches each team plays a season, and how many days they last
+COMPETITIONS = {
+    "County Championship Division One": (14, 4),
+    "One-Day Cup": (8, 1),
+    "T20 Blast": (14, 1),
+}
+
+
+def make_calendar(seasons: int) -> list[Fixture]:
+    """A season from April to September each year, each team playing every competition."""
+    fixtures = []
+    for season in range(seasons):
+        opening_day = date(2025 + season, 4, 4)
+        for number, (competition, (rounds, match_days)) in enumerate(COMPETITIONS.items()):
+            for round_number in range(rounds):
+                start = opening_day + timedelta(days=round_number * 11 + number * 3)
+                for i in range(0, len(TEAMS), 2):
+                    home, away = TEAMS[(i + round_number) % len(TEAMS)], TEAMS[(i + round_number + 1) % len(TEAMS)]
+                    fixtures.append(Fixture(
+                        match_id=f"{season}-{number}-{round_number}-{i}",
+                        competition=competition,
+                        home_team=home,
+                        away_team=away,
+                        start_date=start,
+                        end_date=start + timedelta(days=match_days - 1),
+                        start_time_gmt="11:00",
+                        venue=f"{home} Ground",
+                    ))
+    return fixtures
+
+
+def scan_for_next_matches(fixtures_dir: Path, today: str) -> dict[str, str]:
+    """Answer "when is each team's next match" the old way, by scanning every date file."""
+    next_matches = {}
+    for fixtures_file in sorted(fixtures_dir.glob("*.json")):
+        if fixtures_file.stem < today:
+            continue
+        with open(fixtures_file) as f:
+            for fixture in json.load(f):
+                for team in (fixture["homeTeam"], fixture["awayTeam"]):
+                    next_matches.setdefault(team, fixture["startDate"])
+    return next_matches
+
+
+def main(season_counts: list[int]):
+    print(f"{'seasons':>8} {'matches':>8} {'files':>6} {'build':>9} {'scan query':>11} {'index size':>11}")
+    for seasons in season_counts:
+        fixtures = make_calendar(seasons)
+        with tempfile.TemporaryDirectory() as fixtures_dir, use_clock(VirtualClock(datetime(2025, 1, 1, tzinfo=timezone.utc))):
+            # Files are written as if extracted before the first season, so none are skipped
+            write_fixtures_to_json(group_fixtures_by_day(fixtures), fixtures_dir)
+            files = len(list(Path(fixtures_dir).glob("*.json")))
+
+            start = time.perf_counter()
+            indexes = build_indexes(iter_fixture_files(Path(fixtures_dir)))
+            for data in indexes.values():
+                content_hash(data)
+            build_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            scan_for_next_matches(Path(fixtures_dir), "2025-06-01")
+            scan_time = time.perf_counter() - start
+
+        size = sum(len(json.dumps(data, separators=(",", ":"))) for data in indexes.values())
+        print(
+            f"{seasons:>8} {len(fixtures):>8} {files:>6} {build_time * 1000:>7.1f}ms "
+            f"{scan_time * 1000:>9.1f}ms {size / 1024:>9.0f}KB"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seasons", type=int, nargs="+", default=[1, 5, 10])
+    args = parser.parse_args()
+    main(args.seasons)
@@ -0,0 +1,65 @@
+"""Measure the score archive on a season of snapshots.
+
+Run from the repository root:
+
+    python script/benchmarks/score_archive.py --days 180 --matches 9 --match-days 4
+"""
+import sys
+import argparse
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from models import MatchScore
+from score_archive import INDEX_FILE, SNAPSHOTS_FILE, ScoreArchive
+
+# Scores are fetched every 15 minutes over a day's play
+POLLS_PER_DAY = 28
+
+
+def main(days: int, matches: int, match_days: int):
+    opening_day = datetime(2025, 4, 4, 10, 0, tzinfo=timezone.utc)
+    with tempfile.TemporaryDirectory() as archive_dir:
+        archive = ScoreArchive(Path(archive_dir))
+        start = time.perf_counter()
+        for day in range(days):
+            for poll in range(POLLS_PER_DAY):
+                scores = {
+                    f"match-{day // match_days}-{match}": MatchScore(innings=[{
+                        "innings": f"Team {match} Inning {day % match_days + 1}",
+                        "runs": poll * 9 + match,
+                        "wickets": poll // 3,
+                        "overs": poll * 1.4,
+                    }])
+                    for match in range(matches)
+                }
+                archive.record_many(scores, at=opening_day + timedelta(days=day, minutes=15 * poll))
+        append_time = time.perf_counter() - start
+
+        reopened = ScoreArchive(Path(archive_dir))
+        start = time.perf_counter()
+        match_snapshots = reopened.match(f"match-{days // 2 // match_days}-0")
+        match_time = time.perf_counter() - start
+        start = time.perf_counter()
+        day_snapshots = reopened.day(date(2025, 4, 4) + timedelta(days=days // 2))
+        day_time = time.perf_counter() - start
+
+        snapshots_size = (Path(archive_dir) / SNAPSHOTS_FILE).stat().st_size
+        index_size = (Path(archive_dir) / INDEX_FILE).stat().st_size
+
+    print(f"Snapshots: {reopened.count} in {snapshots_size / 1024:.0f}KB, index {index_size / 1024:.0f}KB")
+    print(f"Appending: {append_time * 1000 / (days * POLLS_PER_DAY):.2f}ms per poll")
+    print(f"One match: {len(match_snapshots)} snapshots in {match_time * 1000:.2f}ms")
+    print(f"One day: {len(day_snapshots)} snapshots in {day_time * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--matches", type=int, default=9, help="Matches played each day")
+    parser.add_argument("--match-days", type=int, default=4, help="Days each match lasts")
+    args = parser.parse_args()
+    main(args.days, args.matches, args.match_days)
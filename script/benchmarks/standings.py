@@ -0,0 +1,71 @@
+"""Time building a league table from scratch against updating one result.
+
+Run from the repository root:
+
+    python script/benchmarks/standings.py --teams 18 --rounds 14
+"""
+import sys
+import argparse
+import random
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from models import Competition, MatchDetails
+from standings import LeagueTable
+
+BLAST = Competition(seriesId="benchmark", competition="T20 Blast", overs=20, points={"win": 4, "tie": 2, "noResult": 2})
+
+
+def make_result(match_id: str, home: str, away: str, rng: random.Random) -> MatchDetails:
+    home_runs, away_runs = rng.randint(120, 220), rng.randint(120, 220)
+    winner = home if home_runs > away_runs else away
+    return MatchDetails(
+        id=match_id,
+        status=f"{winner} won" if home_runs != away_runs else "Match tied",
+        matchStarted=True,
+        matchEnded=True,
+        score={"innings": [
+            {"innings": f"{home} Inning 1", "runs": home_runs, "wickets": rng.randint(3, 10), "overs": 20},
+            {"innings": f"{away} Inning 1", "runs": away_runs, "wickets": rng.randint(3, 10), "overs": rng.choice([17.4, 19.1, 20])},
+        ]},
+    )
+
+
+def main(teams: int, rounds: int):
+    rng = random.Random(1)
+    names = [f"County {i}" for i in range(teams)]
+    matches = [
+        (f"{round_number}-{i}", names[(i + round_number) % teams], names[(i + round_number + 1) % teams])
+        for round_number in range(rounds)
+        for i in range(0, teams, 2)
+    ]
+    results = {match_id: make_result(match_id, home, away, rng) for match_id, home, away in matches}
+    resolve = lambda name: name
+
+    start = time.perf_counter()
+    table = LeagueTable(BLAST, matches, resolve)
+    table.load_results(results)
+    table.to_json()
+    full_time = time.perf_counter() - start
+
+    updates = 200
+    start = time.perf_counter()
+    for _ in range(updates):
+        match_id, home, away = rng.choice(matches)
+        table.update_result(match_id, make_result(match_id, home, away, rng))
+        table.to_json()
+    update_time = (time.perf_counter() - start) / updates
+
+    print(f"Table of {teams} teams and {len(matches)} matches")
+    print(f"From scratch: {full_time * 1000:.2f}ms")
+    print(f"One result changed: {update_time * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--teams", type=int, default=18)
+    parser.add_argument("--rounds", type=int, default=14, help="Rounds of matches in the season")
+    args = parser.parse_args()
+    main(args.teams, args.rounds)
@@ -0,0 +1,81 @@
+"""Time opening the state store and reading and writing entries, against a JSON state file.
+
+Run from the repository root:
+
+    python script/benchmarks/state_store.py --entries 1000 10000
+"""
+import sys
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from state import StateStore, load_json, save_json
+
+OPERATIONS = 1000
+
+
+def make_entry(i: int) -> dict:
+    """Something like a channel's feed state."""
+    return {"etag": f'"{i:08x}"', "videoIds": [f"video{i}-{n}" for n in range(15)], "settled": []}
+
+
+def percentiles(timings: list[float]) -> str:
+    timings = sorted(timings)
+    p50 = statistics.median(timings) * 1e6
+    p99 = timings[int(len(timings) * 0.99)] * 1e6
+    return f"p50 {p50:.0f}us, p99 {p99:.0f}us"
+
+
+def timed(operation, count: int = OPERATIONS) -> list[float]:
+    timings = []
+    for i in range(count):
+        start = time.perf_counter()
+        operation(i)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main(entry_counts: list[int]):
+    for entries in entry_counts:
+        with tempfile.TemporaryDirectory() as state_dir:
+            data = {f"key{i}": make_entry(i) for i in range(entries)}
+            store = StateStore(Path(state_dir) / "state.db")
+            namespace = store.namespace("benchmark")
+            namespace.set_many(data)
+            store.close()
+
+            start = time.perf_counter()
+            store = StateStore(Path(state_dir) / "state.db")
+            namespace = store.namespace("benchmark")
+            open_time = time.perf_counter() - start
+
+            reads = timed(lambda i: namespace.get(f"key{i % entries}"))
+            writes = timed(lambda i: namespace.set(f"key{i % entries}", make_entry(i)))
+            start = time.perf_counter()
+            namespace.set_many({f"key{i}": make_entry(i) for i in range(100)})
+            batch_time = time.perf_counter() - start
+            store.close()
+
+            # The JSON state files are read whole, and rewritten whole to change one entry
+            json_file = Path(state_dir) / "state.json"
+            save_json(json_file, data)
+            start = time.perf_counter()
+            load_json(json_file)
+            json_load_time = time.perf_counter() - start
+            json_writes = timed(lambda i: save_json(json_file, data), count=20)
+
+        print(f"{entries} entries")
+        print(f"  Store: open {open_time * 1000:.2f}ms, read {percentiles(reads)}, write {percentiles(writes)}, "
+              f"100 writes in one batch {batch_time * 1000:.2f}ms")
+        print(f"  JSON file: load {json_load_time * 1000:.2f}ms, write {percentiles(json_writes)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, nargs="+", default=[1000, 10000])
+    args = parser.parse_args()
+    main(args.entries)
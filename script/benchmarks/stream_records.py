@@ -0,0 +1,170 @@
+"""Compare discovery built on Pydantic stream models with the compact records.
+
+Run from the repository root:
+
+    python script/benchmarks/stream_records.py --fixtures 1000 5000
+"""
+import os
+import sys
+import argparse
+import gc
+import time
+import tracemalloc
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Optional
+from pydantic import BaseModel, Field, ConfigDict
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+# update_streams builds its YouTube client on import, but this makes no requests
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+from models import Channel, Fixture, StreamsData, StreamInfo
+from update_streams import (
+    StreamRecord,
+    create_placeholder_streams,
+    format_streams_for_output,
+    get_channel_id_for_team,
+)
+
+
+class LegacyVideoStream(BaseModel):
+    """The Pydantic model discovery used before, with an embedded fixture."""
+    model_config = ConfigDict(populate_by_name=True)
+
+    video_id: Optional[str] = Field(None, alias="videoId")
+    title: str
+    channel_name: str = Field(alias="channelName")
+    channel_id: str = Field(alias="channelId")
+    description: str
+    published_at: Optional[datetime] = Field(None, alias="publishedAt")
+    scheduled_start_time: Optional[datetime] = Field(None, alias="scheduledStartTime")
+    is_placeholder: bool = Field(default=False, alias="isPlaceholder")
+    fixture: Fixture
+
+
+def legacy_pipeline(fixtures, channels, streamed):
+    """Discovery as it was: models per stream, and a rescan of every stream per fixture."""
+    live_streams = [
+        LegacyVideoStream(
+            video_id=f"video{fixture.match_id}",
+            title=f"{fixture.home_team} v {fixture.away_team}",
+            channel_name=next(
+                ch.name for ch in channels.values()
+                if ch.youtube_channel_id == get_channel_id_for_team(fixture.home_team, channels)
+            ),
+            channel_id=get_channel_id_for_team(fixture.home_team, channels),
+            description="Live stream",
+            published_at=datetime.now(timezone.utc),
+            fixture=fixture,
+        )
+        for fixture in streamed
+    ]
+    upcoming_matches = []
+    placeholders = []
+    for fixture in fixtures:
+        channel_id = get_channel_id_for_team(fixture.home_team, channels)
+        has_stream = False
+        for stream in live_streams + upcoming_matches:
+            if stream.fixture.match_id == fixture.match_id:
+                has_stream = True
+                break
+        if not has_stream:
+            placeholders.append(LegacyVideoStream(
+                video_id=None,
+                title=f"{fixture.home_team} vs {fixture.away_team}",
+                channel_name=next(ch.name for ch in channels.values() if ch.youtube_channel_id == channel_id),
+                channel_id=channel_id,
+                description=f"{fixture.competition} - {fixture.venue}",
+                is_placeholder=True,
+                fixture=fixture,
+            ))
+
+    output = StreamsData(last_updated=datetime.now(timezone.utc), streams={})
+    for stream in live_streams + placeholders:
+        output.streams[stream.fixture.match_id] = StreamInfo(
+            video_id=stream.video_id,
+            title=stream.title,
+            channel_id=stream.channel_id,
+            standard_title=f"{stream.fixture.home_team} vs {stream.fixture.away_team}",
+        )
+    output.streams = dict(sorted(output.streams.items()))
+    return output, live_streams, placeholders
+
+
+def compact_pipeline(fixtures, channels, streamed):
+    """Discovery with compact records."""
+    live_streams = [
+        StreamRecord(
+            fixture=fixture,
+            video_id=f"video{fixture.match_id}",
+            title=f"{fixture.home_team} v {fixture.away_team}",
+            channel_id=get_channel_id_for_team(fixture.home_team, channels),
+        )
+        for fixture in streamed
+    ]
+    placeholders = create_placeholder_streams(fixtures, channels, live_streams, [])
+    return format_streams_for_output(live_streams, [], placeholders), live_streams, placeholders
+
+
+def make_data(count: int):
+    channels = {
+        f"county{i}": Channel(
+            name=f"County {i}",
+            youtubeChannelId=f"channel{i}",
+            nicknames=[],
+            uploadsPlaylistId=f"playlist{i}",
+        )
+        for i in range(18)
+    }
+    fixtures = [
+        Fixture(
+            match_id=f"{i:06d}",
+            competition="T20 Blast",
+            home_team=f"County {i % 18}",
+            away_team=f"County {(i + 1) % 18}",
+            start_date=date(2025, 6, 1),
+            end_date=date(2025, 6, 1),
+            start_time_gmt="18:30",
+            venue=f"Ground {i % 18}",
+        )
+        for i in range(count)
+    ]
+    # Half the fixtures have found a stream
+    return channels, fixtures, fixtures[::2]
+
+
+def measure(pipeline, fixtures, channels, streamed) -> tuple[float, int, StreamsData]:
+    """Time a pipeline, and measure the memory its stream objects hold on to."""
+    gc.collect()
+    start = time.perf_counter()
+    output, _, _ = pipeline(fixtures, channels, streamed)
+    elapsed = time.perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    retained = pipeline(fixtures, channels, streamed)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del retained
+    return elapsed, memory, output
+
+
+def main(counts: list[int]):
+    print(f"{'fixtures':>9} {'pydantic':>10} {'compact':>10} {'pydantic mem':>13} {'compact mem':>12}")
+    for count in counts:
+        channels, fixtures, streamed = make_data(count)
+        legacy_time, legacy_memory, legacy_output = measure(legacy_pipeline, fixtures, channels, streamed)
+        compact_time, compact_memory, compact_output = measure(compact_pipeline, fixtures, channels, streamed)
+        assert legacy_output.streams == compact_output.streams, "Pipelines disagree"
+        print(
+            f"{count:>9} {legacy_time * 1000:>8.1f}ms {compact_time * 1000:>8.1f}ms "
+            f"{legacy_memory / 1024:>11.0f}KB {compact_memory / 1024:>10.0f}KB"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixtures", type=int, nargs="+", default=[100, 1000, 5000])
+    args = parser.parse_args()
+    main(args.fixtures)
@@ -0,0 +1,262 @@
+import os
+import json
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+from atproto import Client, IdResolver, client_utils
+from dotenv import load_dotenv
+from models import Fixture
+import clock
+from state import STATE_DIR, StateStore, get_store, load_json, save_json
+
+# Load environment variables
+load_dotenv()
+
+BLUESKY_USERNAME = os.getenv("BLUESKY_USERNAME")
+BLUESKY_PASSWORD = os.getenv("BLUESKY_PASSWORD")
+SESSION_FILE = Path(os.getenv("BLUESKY_SESSION_FILE", STATE_DIR / "bluesky-session.json"))
+# How long a resolved handle is trusted before it is looked up again
+HANDLE_CACHE_TTL = timedelta(days=int(os.getenv("HANDLE_CACHE_TTL_DAYS", "7")))
+HANDLE_CACHE_MAX_ENTRIES = 1000
+RESOLVE_WORKERS = 8
+
+# Client and handle cache kept between posts so a resident process stays warm
+_client: Optional[Client] = None
+_handle_cache: Optional["HandleCache"] = None
+
+
+def save_session(client: Client, session_file: Path = SESSION_FILE):
+    # The session string is a credential, so the file is private from the start
+    save_json(session_file, {"session": client.export_session_string()}, mode=0o600)
+
+
+def login(
+    username: Optional[str] = BLUESKY_USERNAME,
+    password: Optional[str] = BLUESKY_PASSWORD,
+    session_file: Path = SESSION_FILE,
+) -> Optional[Client]:
+    """Log in to Bluesky, reusing the persisted session if it's still valid.
+
+    Resuming a session refreshes expired access tokens with the refresh token,
+    so a full login (which is rate limited) only happens when that fails too.
+    Refreshed tokens are persisted as the client rotates them.
+    """
+    client = Client()
+    client.on_session_change(lambda *_: save_session(client, session_file))
+
+    session_string = load_json(session_file, {}).get("session")
+    if session_string:
+        try:
+            client.login(session_string=session_string)
+            print("Resumed Bluesky session")
+            return client
+        except Exception as e:
+            print(f"Could not resume Bluesky session, logging in again: {str(e)}")
+
+    try:
+        print("Attempting to login to Bluesky...")
+        client.login(username, password)
+        print("Successfully logged in to Bluesky")
+    except Exception as e:
+        print(f"ERROR: Failed to login to Bluesky: {str(e)}")
+        return None
+    save_session(client, session_file)
+    return client
+
+
+def resolve_handle_did(handle: str) -> Optional[str]:
+    """Resolve a handle to a DID through DNS or the handle's well-known endpoint."""
+    return IdResolver().handle.resolve(handle)
+
+
+class HandleCache:
+    """Handle to DID cache in the state store, with a TTL.
+
+    Handles almost never move, so a resolved DID is reused until it expires.
+    Cache misses are resolved concurrently.
+    """
+
+    def __init__(
+        self,
+        store: Optional[StateStore] = None,
+        ttl: timedelta = HANDLE_CACHE_TTL,
+        resolver: Callable[[str], Optional[str]] = resolve_handle_did,
+    ):
+        self.entries = (store or get_store()).namespace("bluesky-handles", ttl=ttl, max_entries=HANDLE_CACHE_MAX_ENTRIES)
+        self.resolver = resolver
+
+    def get(self, handle: str) -> Optional[str]:
+        """Get a cached DID if it hasn't expired."""
+        return self.entries.get(handle)
+
+    def resolve_many(self, handles: Iterable[str]) -> dict[str, str]:
+        """Resolve handles to DIDs, only looking up the ones not already cached."""
+        handles = set(handles)
+        resolved = self.entries.get_many(handles)
+        misses = sorted(handles - resolved.keys())
+        if not misses:
+            return resolved
+
+        def resolve(handle):
+            try:
+                return self.resolver(handle)
+            except Exception as e:
+                print(f"Error resolving handle {handle}: {str(e)}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=RESOLVE_WORKERS) as executor:
+            dids = list(executor.map(resolve, misses))
+
+        found = {}
+        for handle, did in zip(misses, dids):
+            if did:
+                print(f"Resolved handle {handle} to {did}")
+                found[handle] = did
+        self.entries.set_many(found)
+        resolved.update(found)
+        return resolved
+
+
+def channel_handles(channels_file: Path = Path("channels.json")) -> list[str]:
+    """Get every Bluesky handle listed in channels.json."""
+    with open(channels_file) as f:
+        channels = json.load(f)
+    return sorted(
+        channel["blueskyHandle"] for channel in channels.values() if channel.get("blueskyHandle")
+    )
+
+
+def prewarm_handle_cache(
+    channels_file: Path = Path("channels.json"),
+    cache: Optional[HandleCache] = None,
+) -> dict[str, str]:
+    """Resolve every handle in channels.json ahead of posting."""
+    cache = cache or HandleCache()
+    handles = channel_handles(channels_file)
+    resolved = cache.resolve_many(handles)
+    for handle in handles:
+        if handle not in resolved:
+            print(f"Could not resolve handle {handle}")
+    print(f"Handle cache holds {len(resolved)} of {len(handles)} channel handles")
+    return resolved
+
+
+def get_client() -> Optional[Client]:
+    """Get a logged-in Bluesky client, reusing the existing session if there is one."""
+    global _client
+    if _client is None:
+        _client = login()
+    return _client
+
+
+def get_handle_cache() -> HandleCache:
+    """Get the handle to DID cache, keeping it in memory between posts."""
+    global _handle_cache
+    if _handle_cache is None:
+        _handle_cache = HandleCache()
+    return _handle_cache
+
+
+def post_to_bluesky(fixtures_list: list[Fixture], video_ids: dict[str, Optional[str]]) -> bool:
+    """Post to Bluesky about newly added streams.
+
+    video_ids maps each fixture's match ID to its stream's video ID. Returns
+    whether the streams were dealt with, either posted or deliberately skipped.
+    """
+    
+    # Skip posting if SKIP_BLUESKY_POSTING is set
+    if os.getenv("SKIP_BLUESKY_POSTING", "false").lower() == "true":
+        print("Skipping Bluesky post due to SKIP_BLUESKY_POSTING environment variable")
+        return True
+    
+    # Verify Bluesky credentials are set
+    if not BLUESKY_USERNAME or not BLUESKY_PASSWORD:
+        print("ERROR: Bluesky credentials not properly set")
+        return False
+        
+    print(f"Attempting to post about {len(fixtures_list)} new streams to Bluesky")
+    
+    client = get_client()
+    if not client:
+        return False
+    
+    # Create the post text using TextBuilder
+    text_builder = client_utils.TextBuilder()
+    text_builder.text(f"📺 New stream{ 's' if len(fixtures_list) > 1 else '' } posted:\n\n")
+
+    # Group fixtures by competition from the fixtures list
+    fixtures_by_comp = {}
+    for fixture in fixtures_list:
+        if fixture.competition not in fixtures_by_comp:
+            fixtures_by_comp[fixture.competition] = []
+        fixtures_by_comp[fixture.competition].append(fixture)
+
+    # Resolve all handles up front, from the persistent cache where possible
+    resolved_handles = get_handle_cache().resolve_many(
+        handle
+        for fixture in fixtures_list
+        for handle in (fixture.home_bluesky_handle, fixture.away_bluesky_handle)
+        if handle
+    )
+    resolve_handle = resolved_handles.get
+    
+    # Add stream details in alphabetical order by competition
+    for comp_name in sorted(fixtures_by_comp.keys()):
+        streams = fixtures_by_comp[comp_name]
+        # Shorten competition name if needed
+        comp_short = comp_name.replace("County Championship ", "")
+        text_builder.text(f"🏏 {comp_short}\n")
+        # Sort streams by home team name
+        for stream_data in sorted(streams, key=lambda x: x.home_team):
+            text_builder.text("• ")
+            # Add home team with handle if it exists
+            if stream_data.home_bluesky_handle:
+                did = resolve_handle(stream_data.home_bluesky_handle)
+                if did:
+                    text_builder.mention(stream_data.home_team, did)
+                else:
+                    text_builder.text(stream_data.home_team)
+            else:
+                text_builder.text(stream_data.home_team)
+            text_builder.text(" vs ")
+            # Add away team with handle if it exists
+            if stream_data.away_bluesky_handle:
+                did = resolve_handle(stream_data.away_bluesky_handle)
+                if did:
+                    text_builder.mention(stream_data.away_team, did)
+                else:
+                    text_builder.text(stream_data.away_team)
+            else:
+                text_builder.text(stream_data.away_team)
+            text_builder.text(" - ")
+            video_id = video_ids.get(stream_data.match_id)
+            if video_id:
+                text_builder.link("YT", f"https://youtube.com/watch?v={video_id}")
+            else:
+                text_builder.text("No stream available")
+            text_builder.text("\n")
+        text_builder.text("\n")
+    
+    # Add link at the end
+    text_builder.text("\n🔗 Watch all streams at ")
+    text_builder.link("countycricket.live", "https://countycricket.live")
+
+    if len(fixtures_list) > 0:
+        client.send_post(text=text_builder)
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bluesky session and handle cache maintenance")
+    parser.add_argument(
+        "--prewarm",
+        action="store_true",
+        help="Resolve every blueskyHandle in channels.json into the handle cache"
+    )
+    args = parser.parse_args()
+    if args.prewarm:
+        prewarm_handle_cache()
+    else:
+        parser.print_help()
@@ -0,0 +1,49 @@
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Iterator
+
+
+def system_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+# Where the scripts get the current time from, so they can run on a virtual clock
+_source: Callable[[], datetime] = system_now
+
+
+def now() -> datetime:
+    """Get the current time in UTC."""
+    return _source()
+
+
+def today() -> date:
+    """Get today's date in UTC."""
+    return _source().date()
+
+
+@contextmanager
+def use_clock(source: Callable[[], datetime]) -> Iterator[None]:
+    """Read the time from another source, like a VirtualClock, while in the block."""
+    global _source
+    previous = _source
+    _source = source
+    try:
+        yield
+    finally:
+        _source = previous
+
+
+class VirtualClock:
+    """A clock that only moves when it's told to."""
+
+    def __init__(self, start: datetime):
+        self.current = start
+
+    def __call__(self) -> datetime:
+        return self.current
+
+    def advance(self, delta: timedelta):
+        self.current += delta
+
+    def set(self, moment: datetime):
+        self.current = moment
@@ -0,0 +1,32 @@
+import json
+from pathlib import Path
+from models import Competition
+
+COMPETITIONS_FILE = Path(__file__).parent.parent / "competitions.json"
+
+
+def load_competitions(competitions_file: Path = COMPETITIONS_FILE) -> list[Competition]:
+    """Load the series to follow from competitions.json, keyed by CricAPI series ID.
+
+    Competitions are known only by the names listed here, so a new one needs no
+    code change. Series listed under the same name share its table and title
+    keywords, so they must agree on the rest of its settings.
+    """
+    with open(competitions_file, "r", encoding="utf-8") as f:
+        competitions = [
+            Competition(series_id=series_id, **competition)
+            for series_id, competition in json.load(f).items()
+        ]
+
+    settings: dict[str, dict] = {}
+    for competition in competitions:
+        competition_settings = competition.model_dump(exclude={"series_id"})
+        if settings.setdefault(competition.competition, competition_settings) != competition_settings:
+            raise ValueError(
+                f"Series listed as {competition.competition!r} in {competitions_file.name} have different settings"
+            )
+    return competitions
+
+
+def competitions_by_name(competitions: list[Competition]) -> dict[str, Competition]:
+    return {competition.competition: competition for competition in competitions}
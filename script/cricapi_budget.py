@@ -0,0 +1,175 @@
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from enum import IntEnum
+from pathlib import Path
+from typing import Callable, Optional
+import clock
+from state import STATE_DIR, load_json, save_json
+
+CRICAPI_USAGE_FILE = STATE_DIR / "cricapi-usage.json"
+# Daily hit limit of the CricAPI plan, until a response reports it
+CRICAPI_DAILY_HITS = int(os.getenv("CRICAPI_DAILY_HITS", "100"))
+# The bucket refills at this many calls a minute, and holds enough for a short burst
+CRICAPI_CALLS_PER_MINUTE = float(os.getenv("CRICAPI_CALLS_PER_MINUTE", "30"))
+CRICAPI_BURST = int(os.getenv("CRICAPI_BURST", "10"))
+# The longest a call waits for the bucket before it's shed
+CRICAPI_MAX_WAIT = float(os.getenv("CRICAPI_MAX_WAIT", "30"))
+
+
+class Priority(IntEnum):
+    """What a CricAPI call is for, most important first."""
+    LIVE_SCORES = 0
+    SCORES = 1
+    FIXTURES = 2
+
+
+# Share of the daily hits each priority leaves for the ones above it, so live
+# scores keep working after fixture refreshes and idle score updates are shed
+DAILY_RESERVE = {
+    Priority.LIVE_SCORES: 0.0,
+    Priority.SCORES: 0.1,
+    Priority.FIXTURES: 0.25,
+}
+# Tokens each priority leaves in the bucket for the ones above it
+BUCKET_RESERVE = {
+    Priority.LIVE_SCORES: 0,
+    Priority.SCORES: 1,
+    Priority.FIXTURES: 2,
+}
+
+
+class BudgetExhausted(Exception):
+    """A call was shed to keep the remaining hits for more important ones."""
+
+
+class HitBudget:
+    """Accounts for CricAPI hits and paces calls through a token bucket.
+
+    Fixture extraction, score generation and deploys all draw on the one daily
+    allowance, so the hits used are read from every response and persisted with
+    the bucket's state, and each run picks up where the last one left off. Each
+    workflow keeps its own copy, which catches up with the others' calls from
+    the first response of a run.
+    A call that would dip into the reserve for higher priorities, or that would
+    wait too long for the bucket, is shed with BudgetExhausted.
+    """
+
+    def __init__(
+        self,
+        usage_file: Optional[Path] = CRICAPI_USAGE_FILE,
+        daily_limit: int = CRICAPI_DAILY_HITS,
+        calls_per_minute: float = CRICAPI_CALLS_PER_MINUTE,
+        burst: int = CRICAPI_BURST,
+        max_wait: float = CRICAPI_MAX_WAIT,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.usage_file = usage_file
+        self.rate = calls_per_minute / 60
+        self.burst = burst
+        self.max_wait = max_wait
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        # Calls made and shed in this run, by priority
+        self.calls: Counter = Counter()
+        self.shed: Counter = Counter()
+
+        usage = load_json(usage_file, {}) if usage_file else {}
+        self.day = usage.get("date", clock.today().isoformat())
+        self.hits_today: int = usage.get("hitsToday", 0)
+        self.hits_limit: int = usage.get("hitsLimit", daily_limit)
+        self.tokens: float = usage.get("tokens", burst)
+        refilled_at = usage.get("refilledAt")
+        self.refilled_at = datetime.fromisoformat(refilled_at) if refilled_at else clock.now()
+        self._roll_day()
+
+    def _roll_day(self):
+        """Start counting afresh when CricAPI's day has turned over."""
+        today = clock.today().isoformat()
+        if self.day != today:
+            self.day = today
+            self.hits_today = 0
+
+    def _refill(self):
+        now = clock.now()
+        elapsed = max((now - self.refilled_at).total_seconds(), 0)
+        self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+        self.refilled_at = now
+
+    def remaining(self) -> int:
+        return max(self.hits_limit - self.hits_today, 0)
+
+    def acquire(self, priority: Priority):
+        """Wait for a token for a call, or raise BudgetExhausted if it's shed."""
+        waited = 0.0
+        while True:
+            with self.lock:
+                self._roll_day()
+                reserve = self.hits_limit * DAILY_RESERVE[priority]
+                if self.remaining() <= reserve:
+                    self.shed[priority.name] += 1
+                    raise BudgetExhausted(
+                        f"{self.remaining()} of {self.hits_limit} CricAPI hits left, "
+                        f"saving them for calls more important than {priority.name.lower()}"
+                    )
+                self._refill()
+                needed = BUCKET_RESERVE[priority] + 1
+                if self.tokens >= needed:
+                    self.tokens -= 1
+                    self.calls[priority.name] += 1
+                    return
+                wait = (needed - self.tokens) / self.rate
+                if waited + wait > self.max_wait:
+                    self.shed[priority.name] += 1
+                    raise BudgetExhausted(f"CricAPI rate limit reached, shedding {priority.name.lower()} call")
+            self.sleep(wait)
+            waited += wait
+
+    def record(self, info: Optional[dict]):
+        """Update the hits used from a response's info, or count the call if it has none."""
+        with self.lock:
+            self._roll_day()
+            if info and "hitsToday" in info:
+                self.hits_today = info["hitsToday"]
+            else:
+                self.hits_today += 1
+            if info and info.get("hitsLimit"):
+                self.hits_limit = info["hitsLimit"]
+            self.save()
+
+    def usage(self) -> dict:
+        return {
+            "date": self.day,
+            "hitsToday": self.hits_today,
+            "hitsLimit": self.hits_limit,
+            "hitsRemaining": self.remaining(),
+            "calls": dict(sorted(self.calls.items())),
+            "shed": dict(sorted(self.shed.items())),
+        }
+
+    def report(self):
+        """Print the run's usage, and add it to the GitHub Actions job summary if there is one."""
+        usage = self.usage()
+        calls = sum(self.calls.values())
+        shed = sum(self.shed.values())
+        line = (
+            f"CricAPI: {calls} calls this run, {shed} shed, "
+            f"{usage['hitsToday']} of {usage['hitsLimit']} hits used today"
+        )
+        print(line)
+        summary_file = os.getenv("GITHUB_STEP_SUMMARY")
+        if summary_file:
+            with open(summary_file, "a") as f:
+                f.write(f"{line}\n")
+
+    def save(self):
+        if self.usage_file:
+            save_json(self.usage_file, {
+                "date": self.day,
+                "hitsToday": self.hits_today,
+                "hitsLimit": self.hits_limit,
+                "tokens": self.tokens,
+                "refilledAt": self.refilled_at.isoformat(),
+            })
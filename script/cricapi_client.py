@@ -1,32 +1,140 @@
 import os
+import re
 import json
 from pathlib import Path
 from dotenv import load_dotenv
 import requests
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, time, timedelta, timezone
+from threading import Lock
+from typing import Optional
+import clock
+from ball_by_ball import BallByBall
+from competitions import COMPETITIONS_FILE, load_competitions
+from cricapi_budget import BudgetExhausted, HitBudget, Priority
+from state import STATE_DIR, load_json, save_json
+from team_index import TeamIndex
+from title_matcher import get_fixture_start_time
 from models import (
+    Channel,
+    Competition,
     Fixture,
-    CompetitionType,
     MatchDetails,
     MatchData,
     CompetitionMatches,
     MatchesData,
+    RefreshHint,
     StreamsData,
     MatchScore,
     InningsScore,
+    LiveSummary,
 )
 
 # Load environment variables from .env file
 load_dotenv()
 
+FIXTURES_DIR = Path(__file__).parent.parent / "public" / "data" / "fixtures"
+SERIES_CACHE_FILE = STATE_DIR / "series-info.json"
+# How long a series' match list is reused before it's fetched again
+SERIES_CACHE_TTL = timedelta(hours=float(os.getenv("SERIES_CACHE_TTL_HOURS", "12")))
+SERIES_WORKERS = int(os.getenv("SERIES_WORKERS", "8"))
+# Don't let one slow series hold up the rest
+CRICAPI_TIMEOUT = 30
+# Fetch live matches' ball-by-ball data for their batters, bowler, overs and wickets, at a hit a poll per match
+BALL_BY_BALL = os.getenv("BALL_BY_BALL", "false").lower() == "true"
+# How often clients fetch matches.json while a match is being played, and at most how long they wait otherwise
+REFRESH_LIVE_INTERVAL = int(os.getenv("REFRESH_LIVE_INTERVAL", "120"))
+REFRESH_MAX_INTERVAL = int(os.getenv("REFRESH_MAX_INTERVAL", "3600"))
+# Clients start checking this long before a match is due to start
+REFRESH_START_WINDOW = timedelta(minutes=int(os.getenv("REFRESH_START_WINDOW_MINUTES", "10")))
+# A match still going this long after the day's scheduled start is taken to be over for the day
+REFRESH_CLOSE_OF_PLAY = timedelta(hours=int(os.getenv("REFRESH_CLOSE_OF_PLAY_HOURS", "8")))
+# CricAPI's status once play has stopped for the day in a multi-day match
+_STUMPS = re.compile(r"\b(stumps|close of play)\b", re.IGNORECASE)
+
+
+def refresh_hint(matches: MatchesData, fixtures: list[Fixture], now: datetime) -> RefreshHint:
+    """Work out when clients should next fetch matches.json.
+
+    Clients poll at the live interval while a match is in play or due to
+    start, and wait until shortly before the first ball when the day's play
+    hasn't started, including between the days of a multi-day match. Once play
+    is over for the day, at stumps or close of play, or the match has finished,
+    they come back at most hourly, and at midnight for the next day's fixtures.
+    """
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), time(0, 0), tzinfo=timezone.utc)
+    interval = min(REFRESH_MAX_INTERVAL, (tomorrow - now).total_seconds())
+    reason = "idle"
+
+    fixtures_by_id = {fixture.match_id: fixture for fixture in fixtures}
+    unfinished = [
+        match
+        for competition in matches.competitions.values()
+        for match in competition.matches_list
+        if not match.match_ended
+    ]
+    for match in unfinished:
+        fixture = fixtures_by_id.get(match.match_id)
+        start_time = fixture and get_fixture_start_time(fixture, now.date())
+        if start_time and now < start_time - REFRESH_START_WINDOW:
+            until_start = (start_time - REFRESH_START_WINDOW - now).total_seconds()
+            if until_start < interval:
+                interval, reason = until_start, "start"
+            continue
+        if start_time and (now >= start_time + REFRESH_CLOSE_OF_PLAY or (match.match_started and _STUMPS.search(match.status))):
+            # Nothing changes until the next day's play
+            continue
+        # In play, or due any minute
+        interval, reason = REFRESH_LIVE_INTERVAL, "live"
+        break
+
+    max_age = max(int(interval), REFRESH_LIVE_INTERVAL)
+    return RefreshHint(
+        next_refresh=now + timedelta(seconds=max_age),
+        max_age=max_age,
+        cache_control=f"public, max-age={max_age}",
+        reason=reason,
+    )
+
+
+def is_series_cache_fresh(cached: dict, competition: Competition) -> bool:
+    """Check whether a cached match list can be used without fetching the series again."""
+    fetched_at = datetime.fromisoformat(cached["fetchedAt"])
+    if clock.now() - fetched_at < SERIES_CACHE_TTL:
+        return True
+    # A series that had finished when it was fetched won't change
+    last_start = max(
+        (date.fromisoformat(match["dateTimeGMT"][:10]) for match in cached["matchList"]),
+        default=None,
+    )
+    return last_start is not None and last_start + timedelta(days=competition.match_days) <= fetched_at.date()
+
 
 class CricAPIClient:
-    def __init__(self):
+    def __init__(
+        self,
+        budget: Optional[HitBudget] = None,
+        competitions: Optional[list[Competition]] = None,
+        series_cache_file: Path = SERIES_CACHE_FILE,
+        ball_by_ball: Optional[BallByBall] = None,
+    ):
         self.api_key = os.getenv("CRICKET_API_KEY")
         if not self.api_key:
             raise ValueError("CRICKET_API_KEY environment variable is not set")
         self.base_url = "https://api.cricapi.com/v1"
+        # Every call draws on the daily hits shared with the other workflows
+        self.budget = budget or HitBudget()
+        self.competitions = competitions if competitions is not None else load_competitions()
+        self.series_cache_file = series_cache_file
+        self.series_cache: dict[str, dict] = load_json(series_cache_file, {})
+        self.series_cache_changed = False
+        # Series are fetched from several threads
+        self.series_cache_lock = Lock()
+        self.ball_by_ball = ball_by_ball or (BallByBall() if BALL_BY_BALL else None)
         self.channels_data = self._load_channels_data()
+        self.team_index = TeamIndex(
+            {key: Channel(**team_data) for key, team_data in self.channels_data.items()}
+        )
 
     def _load_channels_data(self) -> dict:
         """Load channels data from channels.json file."""
@@ -34,89 +142,135 @@ class CricAPIClient:
         with open(channels_file, "r", encoding="utf-8") as f:
             return json.load(f)
 
+    def _get(self, endpoint: str, priority: Priority, **params) -> dict:
+        """Call a CricAPI endpoint once the budget allows, recording the hits it reports."""
+        self.budget.acquire(priority)
+        response = requests.get(
+            f"{self.base_url}/{endpoint}",
+            params={"apikey": self.api_key, **params},
+            timeout=CRICAPI_TIMEOUT,
+        )
+        response.raise_for_status()
+        data = response.json()
+        self.budget.record(data.get("info"))
+        return data
+
     def _get_bluesky_handle(self, team_name: str) -> str | None:
         """Get Bluesky handle for a team from channels data."""
-        for team_data in self.channels_data.values():
-            if team_name in team_data["nicknames"] or team_name == team_data["name"]:
-                return team_data.get("blueskyHandle")
-        return None
+        channel = self.team_index.channel(team_name)
+        return channel.bluesky_handle if channel else None
+
+    def get_series_matches(self, competition: Competition) -> list[dict]:
+        """Get a series' match list, reusing the cached copy while it's fresh.
+
+        A cached copy is fresh for SERIES_CACHE_TTL, or for good once every match
+        in it had finished when it was fetched. If fetching fails, a stale copy
+        is used rather than dropping the series' fixtures.
+        """
+        with self.series_cache_lock:
+            cached = self.series_cache.get(competition.series_id)
+        if cached and is_series_cache_fresh(cached, competition):
+            return cached["matchList"]
+
+        try:
+            data = self._get("series_info", Priority.FIXTURES, id=competition.series_id)
+            if data["status"] != "success":
+                raise ValueError(f"CricAPI returned status {data['status']}")
+            match_list = data["data"]["matchList"]
+        except (BudgetExhausted, requests.exceptions.RequestException, KeyError, ValueError) as e:
+            if not cached:
+                raise
+            print(f"Using cached fixtures for {competition.competition}: {str(e)}")
+            return cached["matchList"]
+
+        with self.series_cache_lock:
+            self.series_cache[competition.series_id] = {
+                "fetchedAt": clock.now().isoformat(),
+                "matchList": match_list,
+            }
+            self.series_cache_changed = True
+        return match_list
+
+    def parse_series_matches(self, competition: Competition, match_list: list[dict]) -> list[Fixture]:
+        """Turn a series' match list into fixtures, using the series' match length."""
+        fixtures = []
+        for match in match_list:
+            # Parse the full datetime
+            full_datetime = datetime.strptime(
+                match["dateTimeGMT"], "%Y-%m-%dT%H:%M:%S"
+            )
+            # Extract just the time in HH:MM format
+            start_time = full_datetime.strftime("%H:%M")
+            start_date = full_datetime.date()
+            end_date = start_date + timedelta(days=competition.match_days - 1)
+
+            # Get Bluesky handles for both teams
+            home_team = match["teams"][0]
+            away_team = match["teams"][1]
+            home_bluesky_handle = self._get_bluesky_handle(home_team)
+            away_bluesky_handle = self._get_bluesky_handle(away_team)
+
+            fixtures.append(Fixture(
+                match_id=match["id"],
+                competition=competition.competition,
+                home_team=home_team,
+                home_bluesky_handle=home_bluesky_handle,
+                away_team=away_team,
+                away_bluesky_handle=away_bluesky_handle,
+                start_date=start_date,
+                end_date=end_date,
+                start_time_gmt=start_time,
+                venue=match["venue"],
+            ))
+        return fixtures
 
     def get_county_fixtures(self) -> list[Fixture]:
-        """Get all County Championship fixtures from CricAPI."""
-        # Series IDs for County Championship competitions
-        series_ids = {
-            CompetitionType.COUNTY_CHAMPIONSHIP_DIV_ONE: "9362b075-d007-478c-b4a9-e08b9306caef",
-            CompetitionType.COUNTY_CHAMPIONSHIP_DIV_TWO: "4cdcd4af-0d19-439d-afc3-c2e75d8a8e53",
-            CompetitionType.ONE_DAY_CUP: "475eb151-5521-46fd-8490-ef9f704138cb",
-            CompetitionType.BLAST: "7bbdb91a-1fcc-4ba9-ad54-704162327dc2",
-        }
+        """Get the fixtures of every series in competitions.json from CricAPI.
 
+        Series are fetched concurrently, and a series that fails is skipped
+        without holding up the others.
+        """
+        match_lists = {}
+        with ThreadPoolExecutor(max_workers=SERIES_WORKERS) as executor:
+            futures = {
+                executor.submit(self.get_series_matches, competition): competition
+                for competition in self.competitions
+            }
+            for future in as_completed(futures):
+                competition = futures[future]
+                try:
+                    match_lists[competition.series_id] = future.result()
+                except BudgetExhausted as e:
+                    print(f"Skipping fixtures for {competition.competition}: {str(e)}")
+                except requests.exceptions.RequestException as e:
+                    print(f"Error fetching fixtures for {competition.competition}: {str(e)}")
+                except (KeyError, ValueError) as e:
+                    print(f"Error processing data for {competition.competition}: {str(e)}")
+        if self.series_cache_changed:
+            save_json(self.series_cache_file, self.series_cache)
+            self.series_cache_changed = False
+
+        # Fixtures are parsed in registry order, so the output doesn't depend on which series returned first
         fixtures = []
-        for competition, series_id in series_ids.items():
-            try:
-                response = requests.get(
-                    f"{self.base_url}/series_info",
-                    params={"apikey": self.api_key, "id": series_id},
-                )
-                response.raise_for_status()
-                data = response.json()
-
-                if data["status"] == "success":
-                    for match in data["data"]["matchList"]:
-                        # Parse the full datetime
-                        full_datetime = datetime.strptime(
-                            match["dateTimeGMT"], "%Y-%m-%dT%H:%M:%S"
-                        )
-                        # Extract just the time in HH:MM format
-                        start_time = full_datetime.strftime("%H:%M")
-                        start_date = full_datetime.date()
-
-                        # Set end date based on competition type
-                        if competition in [
-                            CompetitionType.COUNTY_CHAMPIONSHIP_DIV_ONE,
-                            CompetitionType.COUNTY_CHAMPIONSHIP_DIV_TWO,
-                        ]:
-                            end_date = start_date + timedelta(days=3)  # 4-day matches
-                        else:
-                            end_date = start_date  # One-day matches
-
-                        # Get Bluesky handles for both teams
-                        home_team = match["teams"][0]
-                        away_team = match["teams"][1]
-                        home_bluesky_handle = self._get_bluesky_handle(home_team)
-                        away_bluesky_handle = self._get_bluesky_handle(away_team)
-
-                        fixture = Fixture(
-                            match_id=match["id"],
-                            competition=competition,
-                            home_team=home_team,
-                            home_bluesky_handle=home_bluesky_handle,
-                            away_team=away_team,
-                            away_bluesky_handle=away_bluesky_handle,
-                            start_date=start_date,
-                            end_date=end_date,
-                            start_time_gmt=start_time,
-                            venue=match["venue"],
-                        )
-                        fixtures.append(fixture)
-            except requests.exceptions.RequestException as e:
-                print(f"Error fetching fixtures for {competition}: {str(e)}")
+        for competition in self.competitions:
+            if competition.series_id not in match_lists:
                 continue
+            try:
+                fixtures.extend(self.parse_series_matches(competition, match_lists[competition.series_id]))
             except (KeyError, ValueError) as e:
-                print(f"Error processing data for {competition}: {str(e)}")
-                continue
+                print(f"Error processing data for {competition.competition}: {str(e)}")
+
+        # Names that didn't match a channel get no stream or Bluesky handle
+        unresolved = self.team_index.report()["unresolved"]
+        if unresolved:
+            print(f"Team names not matched to a channel: {', '.join(unresolved)}")
 
         return fixtures
 
-    def get_match_details(self, match_id: str) -> MatchDetails:
+    def get_match_details(self, match_id: str, priority: Priority = Priority.SCORES) -> MatchDetails:
         """Get detailed information about a specific match."""
         try:
-            response = requests.get(
-                f"{self.base_url}/match_info",
-                params={"apikey": self.api_key, "id": match_id},
-            )
-            response.raise_for_status()
-            data = response.json()
+            data = self._get("match_info", priority, id=match_id)
 
             if data["status"] == "success":
                 match_data = data["data"]
@@ -142,44 +296,69 @@ class CricAPIClient:
                     score=score,
                 )
             return MatchDetails(match_id=match_id, status="error")
+        except BudgetExhausted as e:
+            print(f"Skipping match details for {match_id}: {str(e)}")
+            return MatchDetails(match_id=match_id, status="error")
         except Exception as e:
             print(f"Error fetching match details for {match_id}: {str(e)}")
             return MatchDetails(match_id=match_id, status="error")
 
-    def generate_matches_data(self, streams_data: StreamsData) -> MatchesData:
+    def ingest_ball_by_ball(self, match_id: str, score: Optional[MatchScore]) -> Optional[LiveSummary]:
+        """Bring a live match's ball-by-ball log up to date, and get its summary.
+
+        The deliveries are only fetched when the score has moved on since they
+        were last, and only the ones since then are logged and applied. If they
+        can't be fetched, the summary from the last time is used.
+        """
+        score_key = score.model_dump_json() if score else None
+        if not self.ball_by_ball.needs_update(match_id, score_key):
+            return self.ball_by_ball.summary(match_id)
+        try:
+            data = self._get("match_bbb", Priority.SCORES, id=match_id)
+            if data["status"] != "success":
+                raise ValueError(f"CricAPI returned status {data['status']}")
+            return self.ball_by_ball.ingest(match_id, data["data"].get("bbb") or [], score_key)
+        except BudgetExhausted as e:
+            print(f"Skipping ball-by-ball for {match_id}: {str(e)}")
+        except (requests.exceptions.RequestException, KeyError, ValueError) as e:
+            print(f"Error fetching ball-by-ball for {match_id}: {str(e)}")
+        return self.ball_by_ball.summary(match_id)
+
+    def generate_matches_data(self, streams_data: StreamsData, fixtures_dir: Path = FIXTURES_DIR) -> MatchesData:
         """Generate matches data from streams and fixtures."""
         try:
             # Read fixtures for today
-            today = datetime.now().strftime("%Y-%m-%d")
-            fixtures_file = (
-                Path(__file__).parent.parent
-                / "public"
-                / "data"
-                / "fixtures"
-                / f"{today}.json"
-            )
+            today = clock.now().strftime("%Y-%m-%d")
+            fixtures_file = fixtures_dir / f"{today}.json"
 
             # Return empty matches data if no fixtures file exists
             if not fixtures_file.exists():
                 print(f"No fixtures file found for {today}, skipping score generation")
-                return MatchesData(last_updated=datetime.now(), competitions={})
+                matches = MatchesData(last_updated=clock.now(), competitions={})
+                matches.refresh = refresh_hint(matches, [], matches.last_updated)
+                return matches
 
             with open(fixtures_file, "r", encoding="utf-8") as f:
                 fixtures = [Fixture(**fixture) for fixture in json.load(f)]
 
             # Initialize matches structure
-            matches = MatchesData(last_updated=datetime.now(), competitions={})
+            matches = MatchesData(last_updated=clock.now(), competitions={})
 
-            # Process all streams
-            for match_id, stream in streams_data.streams.items():
+            # Process all streams, the ones with a live stream first so they get the budget
+            streams = sorted(streams_data.streams.items(), key=lambda item: item[1].video_id is None)
+            for match_id, stream in streams:
                 # Find corresponding fixture
                 fixture = next((f for f in fixtures if f.match_id == match_id), None)
                 if not fixture:
                     print(f"No fixture found for match {match_id}")
                     continue
 
-                # Get match details from API
-                match_details = self.get_match_details(match_id)
+                # Get match details from API, matches being streamed first
+                priority = Priority.LIVE_SCORES if stream.video_id else Priority.SCORES
+                match_details = self.get_match_details(match_id, priority)
+                live = None
+                if self.ball_by_ball and match_details.match_started and not match_details.match_ended:
+                    live = self.ingest_ball_by_ball(match_id, match_details.score)
 
                 # Create match entry
                 match_data = MatchData(
@@ -197,10 +376,11 @@ class CricAPIClient:
                     stream=stream.model_dump(),
                     match_started=match_details.match_started,
                     match_ended=match_details.match_ended,
+                    live=live,
                 )
 
                 # Add to competition group
-                competition = fixture.competition.value
+                competition = fixture.competition
                 if competition not in matches.competitions:
                     matches.competitions[competition] = CompetitionMatches(
                         competition_name=competition, matches_list=[]
@@ -214,6 +394,8 @@ class CricAPIClient:
             # Sort competitions alphabetically
             matches.competitions = dict(sorted(matches.competitions.items()))
 
+            matches.refresh = refresh_hint(matches, fixtures, matches.last_updated)
+            print(f"Clients will refresh in {matches.refresh.max_age}s ({matches.refresh.reason})")
             return matches
         except Exception as e:
             print(f"Error generating matches data: {str(e)}")
@@ -0,0 +1,497 @@
+"""Run the pipeline's alternative implementations side by side on random scenarios.
+
+Seeded generators build a channel set, a fixture calendar and the YouTube and
+CricAPI responses for a match day, with edge cases like double-headers,
+channels without nicknames, failing feeds and quota running out mid-run. The
+reference pipeline and each alternative are run on the same scenario, and
+must write byte-identical fixture files, streams.json and matches.json:
+
+    python script/differential.py --cases 200 --seed 0
+
+Sharded against single-worker polling, playlist against feed discovery, and
+incremental against full fixture extraction are always checked. To check a
+new implementation of a pipeline function against the current one, pass it
+as a candidate:
+
+    python script/differential.py --candidate update_streams.format_streams_for_output=my_module:format_streams
+"""
+import io
+import os
+import sys
+import random
+import argparse
+import contextlib
+import difflib
+import importlib
+import tempfile
+from dataclasses import dataclass, field, replace
+from datetime import date, datetime, time, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Optional
+from unittest.mock import patch
+import requests
+import clock
+import cricapi_client
+import feeds
+import fixture_extractor
+import update_streams
+from clock import VirtualClock
+from cricapi_budget import HitBudget
+from cricapi_client import CricAPIClient
+from feeds import FEEDS_NAMESPACE, FeedDiscovery, FeedError
+from generate_scores import write_matches_file
+from models import Channel, Fixture
+from simulate import Policy, SerialExecutor, StandInYouTube, Video, World, broadcast_duration, registered_competitions
+from state import StateStore
+from team_index import TeamIndex
+from title_matcher import get_fixture_start_time
+
+# Counties to draw channels from, with the nicknames their channels may go by
+COUNTIES = {
+    "Durham": [],
+    "Essex": ["Eagles"],
+    "Glamorgan": [],
+    "Hampshire": ["Hawks"],
+    "Kent": ["Spitfires"],
+    "Lancashire": ["Lightning"],
+    "Middlesex": [],
+    "Somerset": [],
+    "Surrey": [],
+    "Sussex": ["Sharks"],
+    "Warwickshire": ["Bears"],
+    "Yorkshire": ["Vikings"],
+}
+START_TIMES = ["10:30", "11:00", "14:00", "18:30", "TBC"]
+# How a match day can be streamed
+STREAMING = ["home", "home", "away", "both", "none", "late", "not yet"]
+
+
+@dataclass
+class Scenario:
+    """Everything a match day's pipeline runs see, from one seed."""
+    seed: int
+    day: date
+    channels: dict[str, Channel]
+    # The calendar as the last extraction found it, and as it's found today
+    stored_fixtures: list[Fixture]
+    fixtures: list[Fixture]
+    videos: list[Video]
+    poll_times: list[datetime]
+    failing_feeds: set[str]
+    # YouTube calls that succeed before the quota runs out, if it does
+    youtube_quota: Optional[int]
+    cricapi_hits: int
+    # CricAPI match_info responses at each poll by match ID, None for a request that fails
+    match_payloads: list[dict[str, Optional[dict]]]
+
+
+@dataclass(frozen=True)
+class Variant:
+    """One way of running the pipeline."""
+    name: str
+    # Shards to poll with, or 0 for a single worker
+    shards: int = 0
+    discovery: str = "feeds"
+    extraction: str = "full"
+    # Functions swapped in for the current ones, by dotted name
+    candidates: dict[str, Callable] = field(default_factory=dict)
+    # Whether it makes the same YouTube calls as the reference, so a quota running out hits both alike
+    same_calls: bool = True
+
+
+REFERENCE = Variant("reference")
+BUILT_IN = [
+    Variant("sharded polling", shards=3, same_calls=False),
+    Variant("playlist discovery", discovery="playlist", same_calls=False),
+    Variant("incremental extraction", extraction="incremental"),
+]
+
+
+def make_channels(rng: random.Random) -> tuple[list[str], dict[str, Channel]]:
+    """Pick the counties playing, some without a channel and some without nicknames."""
+    teams = sorted(rng.sample(sorted(COUNTIES), rng.randint(2, len(COUNTIES))))
+    channels = {}
+    for i, team in enumerate(teams):
+        if rng.random() < 0.1:
+            continue
+        channels[team.lower()] = Channel(
+            name=f"{team} Cricket",
+            youtubeChannelId=f"UC{team.lower()}{i}",
+            nicknames=COUNTIES[team] if rng.random() < 0.7 else [],
+            uploadsPlaylistId=f"UU{team.lower()}{i}",
+        )
+    return teams, channels
+
+
+def make_calendar(rng: random.Random, teams: list[str], day: date) -> list[Fixture]:
+    """A fortnight of fixtures either side of the day, with a double-header on it."""
+    fixtures = []
+    for offset in range(-7, 8):
+        start = day + timedelta(days=offset)
+        competition = rng.choice(list(registered_competitions().values()))
+        playing = rng.sample(teams, len(teams))
+        for home, away in zip(playing[::2], playing[1::2]):
+            if rng.random() < 0.3:
+                continue
+            fixtures.append(Fixture(
+                match_id=f"{rng.getrandbits(48):012x}",
+                competition=competition.competition,
+                home_team=home,
+                away_team=away,
+                start_date=start,
+                end_date=start + timedelta(days=competition.match_days - 1),
+                start_time_gmt=rng.choice(START_TIMES),
+                venue=f"{home} Ground",
+            ))
+    if rng.random() < 0.5:
+        home, away = rng.sample(teams, 2)
+        for start_time in ("14:00", "18:30"):
+            fixtures.append(Fixture(
+                match_id=f"{rng.getrandbits(48):012x}",
+                competition="T20 Blast",
+                home_team=home,
+                away_team=away,
+                start_date=day,
+                end_date=day,
+                start_time_gmt=start_time,
+                venue=f"{home} Ground",
+            ))
+    return fixtures
+
+
+def make_stored_calendar(rng: random.Random, fixtures: list[Fixture]) -> list[Fixture]:
+    """The calendar as a previous extraction saw it: some matches since added, removed or moved."""
+    stored = []
+    for fixture in fixtures:
+        roll = rng.random()
+        if roll < 0.1:
+            continue
+        if roll < 0.15:
+            stored.append(fixture.model_copy(update={"start_date": fixture.start_date + timedelta(days=1), "end_date": fixture.end_date + timedelta(days=1)}))
+        elif roll < 0.2:
+            stored.append(fixture.model_copy(update={"start_time_gmt": rng.choice(START_TIMES)}))
+        elif roll < 0.25:
+            stored.append(fixture.model_copy(update={"venue": "Outground"}))
+        else:
+            stored.append(fixture)
+        if roll > 0.95:
+            # A match that has since been called off, in a competition still being played
+            stored.append(fixture.model_copy(update={"match_id": f"{rng.getrandbits(48):012x}"}))
+    return stored
+
+
+def title_for(rng: random.Random, fixture: Fixture, day: date, channels: dict[str, Channel]) -> str:
+    def name(team: str) -> str:
+        channel = channels.get(team.lower())
+        return rng.choice([team, *channel.nicknames]) if channel else team
+    home, away = name(fixture.home_team), name(fixture.away_team)
+    return rng.choice([
+        f"LIVE: {home} v {away}",
+        f"{home} vs {away} - {fixture.competition}",
+        f"{fixture.competition}: {home} v {away}",
+        f"{home} v {away} | Day {(day - fixture.start_date).days + 1}",
+    ])
+
+
+def make_videos(
+    rng: random.Random,
+    day: date,
+    fixtures: list[Fixture],
+    channels: dict[str, Channel],
+) -> list[Video]:
+    """Broadcasts for the day's fixtures, streamed in various ways, and other uploads."""
+    videos = []
+    midnight = datetime.combine(day, time(0, 0), tzinfo=timezone.utc)
+    for fixture in fixtures:
+        start = get_fixture_start_time(fixture, day) or midnight + timedelta(hours=11)
+        streaming = rng.choice(STREAMING)
+        teams = {
+            "home": [fixture.home_team], "late": [fixture.home_team], "not yet": [fixture.home_team],
+            "away": [fixture.away_team], "both": [fixture.home_team, fixture.away_team], "none": [],
+        }[streaming]
+        for team in teams:
+            channel = channels.get(team.lower())
+            if not channel:
+                continue
+            actual_start = start - timedelta(minutes=15)
+            if streaming == "late":
+                actual_start = start + timedelta(hours=rng.randint(1, 4))
+            elif streaming == "not yet":
+                actual_start = start + timedelta(days=1)
+            videos.append(Video(
+                video_id=f"v{rng.getrandbits(48):012x}",
+                channel_id=channel.youtube_channel_id,
+                title=title_for(rng, fixture, day, channels),
+                published_at=start - timedelta(hours=rng.randint(1, 36)),
+                scheduled_start=start,
+                actual_start=actual_start,
+                actual_end=actual_start + broadcast_duration(fixture.competition),
+                match_id=fixture.match_id,
+            ))
+    for channel in channels.values():
+        # Other uploads, some from before the playlist lookback
+        for _ in range(rng.randint(0, 4)):
+            videos.append(Video(
+                video_id=f"v{rng.getrandbits(48):012x}",
+                channel_id=channel.youtube_channel_id,
+                title=rng.choice(["Highlights", "Press conference", "Player interview"]),
+                published_at=midnight - timedelta(hours=rng.randint(1, 10 * 24)),
+            ))
+    return videos
+
+
+def make_payload(rng: random.Random, fixture: Fixture, moment: datetime) -> Optional[dict]:
+    """A match_info response for a match as it stands at a moment."""
+    roll = rng.random()
+    if roll < 0.05:
+        return None
+    if roll < 0.12:
+        return {"status": "failure", "reason": "hits today exceeded hits limit"}
+    start = get_fixture_start_time(fixture, moment.date())
+    started = start is not None and moment >= start
+    ended = started and moment >= start + broadcast_duration(fixture.competition)
+    score = []
+    if started:
+        for innings in range(1 if not ended else 2):
+            team = (fixture.home_team, fixture.away_team)[innings]
+            score.append({
+                "inning": f"{team} Inning 1",
+                "r": rng.randint(0, 350),
+                "w": rng.randint(0, 10),
+                "o": rng.randint(0, 49) + rng.randint(0, 5) / 10,
+            })
+    status = "Match not started"
+    if ended:
+        status = f"{fixture.home_team} won by {rng.randint(1, 100)} runs"
+    elif started:
+        status = "In progress"
+    return {"status": "success", "data": {"status": status, "matchStarted": started, "matchEnded": ended, "score": score}}
+
+
+def generate_scenario(seed: int) -> Scenario:
+    """Build a match day's scenario from a seed, the same every time."""
+    rng = random.Random(seed)
+    day = date(2025, 4, 1) + timedelta(days=rng.randrange(180))
+    teams, channels = make_channels(rng)
+    fixtures = make_calendar(rng, teams, day)
+    todays_fixtures = [fixture for fixture in fixtures if fixture.start_date <= day <= fixture.end_date]
+    midnight = datetime.combine(day, time(0, 0), tzinfo=timezone.utc)
+    poll_times = sorted(midnight + timedelta(minutes=rng.randrange(8 * 60, 21 * 60)) for _ in range(rng.randint(2, 5)))
+    return Scenario(
+        seed=seed,
+        day=day,
+        channels=channels,
+        stored_fixtures=make_stored_calendar(rng, fixtures),
+        fixtures=fixtures,
+        videos=make_videos(rng, day, todays_fixtures, channels),
+        poll_times=poll_times,
+        failing_feeds={channel.youtube_channel_id for channel in channels.values() if rng.random() < 0.15},
+        youtube_quota=rng.randint(1, 8) if rng.random() < 0.3 else None,
+        cricapi_hits=rng.randint(3, 30) if rng.random() < 0.3 else 100,
+        match_payloads=[
+            {fixture.match_id: make_payload(rng, fixture, moment) for fixture in todays_fixtures}
+            for moment in poll_times
+        ],
+    )
+
+
+class QuotaYouTube(StandInYouTube):
+    """The simulator's stand-in for YouTube, refusing calls once the quota runs out."""
+
+    def __init__(self, world: World, quota: Optional[int]):
+        super().__init__(world)
+        self.quota = quota
+        self.calls = 0
+
+    def spend(self):
+        self.calls += 1
+        if self.quota is not None and self.calls > self.quota:
+            raise RuntimeError("<HttpError 403: quotaExceeded>")
+
+    def playlist_page(self, playlist_id: str, offset: int, page_size: int) -> dict:
+        self.spend()
+        return super().playlist_page(playlist_id, offset, page_size)
+
+    def video_details(self, video_ids: list[str]) -> dict:
+        self.spend()
+        return super().video_details(video_ids)
+
+
+class Response:
+    def __init__(self, data: dict):
+        self.data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self) -> dict:
+        return self.data
+
+
+class StandInCricAPI:
+    """Answers match_info calls from the scenario's payloads for the current poll."""
+
+    def __init__(self, scenario: Scenario):
+        self.scenario = scenario
+        self.poll = 0
+
+    def get(self, url: str, params: dict, timeout: float) -> Response:
+        payload = self.scenario.match_payloads[self.poll].get(params["id"], {"status": "failure"})
+        if payload is None:
+            raise requests.exceptions.Timeout("Simulated timeout")
+        return Response(payload)
+
+
+def resolve(name: str):
+    """Find the object a dotted name refers to, and the one it's an attribute of."""
+    module_name, _, path = name.partition(".")
+    owner = importlib.import_module(module_name)
+    *parents, attribute = path.split(".")
+    for parent in parents:
+        owner = getattr(owner, parent)
+    return owner, attribute
+
+
+def run(scenario: Scenario, variant: Variant) -> dict[str, bytes]:
+    """Run the pipeline on a scenario, returning every file it writes by name."""
+    world = World(scenario.channels, Policy(feed_failure_rate=0), random.Random(scenario.seed))
+    for video in scenario.videos:
+        world.add(video)
+    youtube = QuotaYouTube(world, scenario.youtube_quota if variant.same_calls else None)
+    cricapi = StandInCricAPI(scenario)
+
+    def fetch_feed(channel_id: str, feed_state: dict):
+        if channel_id in scenario.failing_feeds:
+            raise FeedError("Simulated feed failure")
+        return world.fetch_feed(channel_id, feed_state)
+
+    outputs = {}
+    virtual_clock = VirtualClock(datetime.combine(scenario.day - timedelta(days=1), time(6, 0), tzinfo=timezone.utc))
+    with tempfile.TemporaryDirectory() as work_dir, contextlib.ExitStack() as stack:
+        # The pipeline's files are relative to the working directory, so each run gets its own
+        stack.enter_context(contextlib.chdir(work_dir))
+        stack.enter_context(contextlib.redirect_stdout(io.StringIO()))
+        stack.enter_context(clock.use_clock(virtual_clock))
+        stack.enter_context(patch.dict(os.environ, {"CRICKET_API_KEY": "differential"}))
+        store = StateStore(Path(work_dir) / ".state" / "state.db")
+        stack.callback(store.close)
+        for owner, attribute, value in [
+            (update_streams, "youtube", youtube),
+            (update_streams, "DISCOVERY_BACKEND", variant.discovery),
+            (update_streams, "_team_index", TeamIndex(scenario.channels, cache_file=None)),
+            (update_streams, "_title_matcher", None),
+            (update_streams, "_feed_discovery", FeedDiscovery(store)),
+            (update_streams, "FeedDiscovery", lambda namespace=FEEDS_NAMESPACE: FeedDiscovery(store, namespace)),
+            (feeds, "fetch_feed", fetch_feed),
+            (feeds, "ThreadPoolExecutor", SerialExecutor),
+            (cricapi_client.requests, "get", cricapi.get),
+            *((*resolve(name), candidate) for name, candidate in variant.candidates.items()),
+        ]:
+            stack.enter_context(patch.object(owner, attribute, value))
+
+        # Yesterday's extraction, then today's
+        fixtures_dir = Path("public/data/fixtures")
+        grouped = fixture_extractor.group_fixtures_by_day(scenario.stored_fixtures)
+        fixture_extractor.write_fixtures_to_json(grouped, str(fixtures_dir))
+        virtual_clock.set(datetime.combine(scenario.day, time(6, 0), tzinfo=timezone.utc))
+        if variant.extraction == "incremental":
+            fixture_extractor.update_fixture_files(scenario.fixtures, str(fixtures_dir))
+        else:
+            # A full extraction writes every day afresh
+            for fixtures_file in fixtures_dir.glob("*.json"):
+                fixtures_file.unlink()
+            grouped = fixture_extractor.group_fixtures_by_day(scenario.fixtures)
+            fixture_extractor.write_fixtures_to_json(grouped, str(fixtures_dir))
+        for fixtures_file in sorted(fixtures_dir.glob("*.json")):
+            if fixtures_file.stem >= scenario.day.isoformat():
+                outputs[f"fixtures/{fixtures_file.name}"] = fixtures_file.read_bytes()
+
+        client = CricAPIClient(
+            budget=HitBudget(usage_file=None, daily_limit=scenario.cricapi_hits, burst=1000),
+            competitions=[],
+            series_cache_file=Path(".state/series-info.json"),
+        )
+        streams_file = Path("public/data/streams.json")
+        matches_file = Path("public/data/matches.json")
+        for poll, moment in enumerate(scenario.poll_times):
+            virtual_clock.set(moment)
+            cricapi.poll = poll
+            if variant.shards:
+                for shard_index in range(variant.shards):
+                    update_streams.poll_shard(scenario.channels, shard_index, variant.shards)
+                update_streams.publish_merged_shards(variant.shards)
+            else:
+                update_streams.poll_streams(scenario.channels)
+            write_matches_file(
+                client.generate_matches_data(update_streams.load_existing_streams(), fixtures_dir),
+                matches_file,
+            )
+            label = moment.strftime("%H:%M")
+            outputs[f"{label} streams.json"] = streams_file.read_bytes() if streams_file.exists() else b""
+            outputs[f"{label} matches.json"] = matches_file.read_bytes()
+    return outputs
+
+
+def differences(expected: dict[str, bytes], actual: dict[str, bytes], context: int = 3) -> list[str]:
+    """Describe the files that differ between two runs, as diffs."""
+    found = []
+    for name in sorted(expected.keys() | actual.keys()):
+        if expected.get(name) == actual.get(name):
+            continue
+        if name not in actual or name not in expected:
+            found.append(f"{name}: only written by the {'reference' if name in expected else 'alternative'}")
+            continue
+        diff = difflib.unified_diff(
+            expected[name].decode().splitlines(),
+            actual[name].decode().splitlines(),
+            "reference", "alternative", n=context, lineterm="",
+        )
+        found.append(f"{name}:\n" + "\n".join(list(diff)[:40]))
+    return found
+
+
+def check(seed: int, variants: list[Variant]) -> dict[str, list[str]]:
+    """Run each variant against the reference on a seed's scenario, returning the differences by variant."""
+    scenario = generate_scenario(seed)
+    references = {}
+    mismatches = {}
+    for variant in variants:
+        if variant.same_calls not in references:
+            references[variant.same_calls] = run(scenario, replace(REFERENCE, same_calls=variant.same_calls))
+        found = differences(references[variant.same_calls], run(scenario, variant))
+        if found:
+            mismatches[variant.name] = found
+    return mismatches
+
+
+def load_candidate(spec: str) -> tuple[str, Callable]:
+    """Parse "module.function=other_module:function" into the name to replace and its replacement."""
+    name, _, replacement = spec.partition("=")
+    module_name, _, function_name = replacement.partition(":")
+    if not name or not module_name or not function_name:
+        raise ValueError(f"Expected module.function=module:function, got {spec}")
+    return name, getattr(importlib.import_module(module_name), function_name)
+
+
+def main(cases: int, seed: int, candidates: dict[str, Callable]) -> int:
+    variants = list(BUILT_IN)
+    if candidates:
+        variants.append(Variant("candidates", candidates=candidates))
+    failures = 0
+    for case_seed in range(seed, seed + cases):
+        for name, found in check(case_seed, variants).items():
+            failures += 1
+            print(f"Seed {case_seed}: {name} differs from the reference")
+            for difference in found:
+                print(difference)
+    print(f"{cases} scenarios, {len(variants)} alternatives, {failures} mismatches")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", type=int, default=100, help="Scenarios to generate")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the first scenario")
+    parser.add_argument("--candidate", action="append", default=[], help="module.function=module:function to check against the current implementation")
+    args = parser.parse_args()
+    sys.exit(main(args.cases, args.seed, dict(load_candidate(spec) for spec in args.candidate)))
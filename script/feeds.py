@@ -0,0 +1,163 @@
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional
+import requests
+from state import StateStore, get_store
+
+# Public uploads feed for a channel, which costs no API quota
+FEED_URL = "https://www.youtube.com/feeds/videos.xml?channel_id={channel_id}"
+FEEDS_NAMESPACE = "feeds"
+FEEDS_MAX_ENTRIES = 500
+FEED_TIMEOUT = 10
+FEED_WORKERS = 8
+
+ATOM_NS = "{http://www.w3.org/2005/Atom}"
+YT_NS = "{http://www.youtube.com/xml/schemas/2015}"
+
+
+class FeedError(Exception):
+    pass
+
+
+def parse_feed(chunks) -> list[tuple[str, Optional[datetime]]]:
+    """Parse an uploads feed into (video_id, published) pairs, newest first.
+
+    The feed is parsed incrementally as chunks arrive, and each entry is
+    discarded once read.
+    """
+    parser = ET.XMLPullParser(events=("end",))
+    entries = []
+    try:
+        for chunk in chunks:
+            parser.feed(chunk)
+            for _, element in parser.read_events():
+                if element.tag != f"{ATOM_NS}entry":
+                    continue
+                video_id = element.findtext(f"{YT_NS}videoId")
+                published = element.findtext(f"{ATOM_NS}published")
+                if video_id:
+                    entries.append((
+                        video_id,
+                        datetime.fromisoformat(published) if published else None
+                    ))
+                element.clear()
+        parser.close()
+    except (ET.ParseError, ValueError) as e:
+        raise FeedError(f"Invalid feed: {str(e)}") from e
+    return entries
+
+
+def fetch_feed(channel_id: str, feed_state: dict) -> tuple[list[str], Optional[datetime], dict]:
+    """Fetch a channel's uploads feed with a conditional GET.
+
+    Returns the video IDs in the feed, the newest publish time, and the
+    updated per-channel state. A 304 reuses the IDs from the last fetch.
+    """
+    headers = {}
+    if feed_state.get("etag"):
+        headers["If-None-Match"] = feed_state["etag"]
+    if feed_state.get("lastModified"):
+        headers["If-Modified-Since"] = feed_state["lastModified"]
+
+    try:
+        # Closed on every path, so a 304 or an error doesn't hold its connection
+        with requests.get(
+            FEED_URL.format(channel_id=channel_id),
+            headers=headers,
+            timeout=FEED_TIMEOUT,
+            stream=True,
+        ) as response:
+            if response.status_code == 304 and "videoIds" in feed_state:
+                newest = feed_state.get("newestPublished")
+                return (
+                    feed_state["videoIds"],
+                    datetime.fromisoformat(newest) if newest else None,
+                    feed_state,
+                )
+            response.raise_for_status()
+            entries = parse_feed(response.iter_content(chunk_size=8192))
+    except requests.exceptions.RequestException as e:
+        raise FeedError(str(e)) from e
+
+    video_ids = [video_id for video_id, _ in entries]
+    published_times = [published for _, published in entries if published]
+    newest = max(published_times) if published_times else None
+    new_state = {
+        "etag": response.headers.get("ETag"),
+        "lastModified": response.headers.get("Last-Modified"),
+        "videoIds": video_ids,
+        "newestPublished": newest.isoformat() if newest else None,
+        # Only keep settled IDs that can still show up in the feed
+        "settled": [v for v in feed_state.get("settled", []) if v in video_ids],
+    }
+    return video_ids, newest, new_state
+
+
+class FeedDiscovery:
+    """Discover candidate stream video IDs from channels' public Atom feeds.
+
+    Videos that have been looked up and can never become a live stream (plain
+    uploads and finished broadcasts) are remembered as settled, so only new or
+    still-pending video IDs are passed on to videos.list.
+    """
+
+    def __init__(self, store: Optional[StateStore] = None, namespace: str = FEEDS_NAMESPACE):
+        self.entries = (store or get_store()).namespace(namespace, max_entries=FEEDS_MAX_ENTRIES)
+        self.state: dict[str, dict] = self.entries.items()
+        # Channels whose state has changed since it was loaded or saved
+        self.changed: set[str] = set()
+        self.channel_for_video: dict[str, str] = {}
+
+    def discover(self, channel_ids: set[str]) -> tuple[list[str], set[str]]:
+        """Fetch feeds for the given channels concurrently.
+
+        Returns the video IDs worth looking up, and the channels whose feed
+        couldn't be fetched and should fall back to the uploads playlist. A
+        quiet channel's feed is as good as its playlist, so it doesn't.
+        """
+        video_ids = []
+        fallback_channels = set()
+        channel_list = sorted(channel_ids)
+
+        def fetch(channel_id):
+            try:
+                return fetch_feed(channel_id, self.state.get(channel_id, {}))
+            except FeedError as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=FEED_WORKERS) as executor:
+            results = list(executor.map(fetch, channel_list))
+
+        for channel_id, result in zip(channel_list, results):
+            if isinstance(result, FeedError):
+                print(f"Error fetching feed for channel {channel_id}: {str(result)}")
+                fallback_channels.add(channel_id)
+                continue
+
+            feed_video_ids, newest, channel_state = result
+            self.state[channel_id] = channel_state
+            self.changed.add(channel_id)
+            settled = set(channel_state.get("settled", []))
+            for video_id in feed_video_ids:
+                if video_id not in settled:
+                    video_ids.append(video_id)
+                    self.channel_for_video[video_id] = channel_id
+
+        return video_ids, fallback_channels
+
+    def mark_settled(self, video_ids: set[str]):
+        """Record videos that don't need looking up again."""
+        for video_id in video_ids:
+            channel_id = self.channel_for_video.get(video_id)
+            if not channel_id:
+                continue
+            settled = self.state.setdefault(channel_id, {}).setdefault("settled", [])
+            if video_id not in settled:
+                settled.append(video_id)
+                self.changed.add(channel_id)
+
+    def save(self):
+        """Write the state of the channels that have changed, leaving others' alone for overlapping runs."""
+        self.entries.set_many({channel_id: self.state[channel_id] for channel_id in sorted(self.changed)})
+        self.changed.clear()
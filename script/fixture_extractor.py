@@ -1,42 +1,49 @@
 import json
 import os
-from datetime import datetime, timedelta, date
-from typing import List, Dict
+from datetime import timedelta
+from pathlib import Path
+from typing import List, Dict, Optional
+import clock
 from cricapi_client import CricAPIClient
-from models import Fixture, CompetitionType
+from fixture_index import publish_indexes
+from models import Fixture
+
+# Reschedules and venue changes, one JSON object per line
+CHANGE_LOG_FILE = "public/data/fixture-changes.jsonl"
+# Fields that move a match when they change
+SCHEDULE_FIELDS = ("startDate", "endDate", "startTimeGmt")
 
 def group_fixtures_by_day(fixtures: List[Fixture]) -> Dict[str, List[Dict]]:
     """Group fixtures by day, adding day information to each fixture."""
     grouped = {}
-    today = datetime.now().date()
+    today = clock.today()
     
     for fixture in fixtures:
         # Skip fixtures that have already ended
         if fixture.end_date < today:
             continue
-            
-        # For County Championship matches, create entries for each day
-        if fixture.competition in [CompetitionType.COUNTY_CHAMPIONSHIP_DIV_ONE, CompetitionType.COUNTY_CHAMPIONSHIP_DIV_TWO]:
+        
+        # Each fixture is dumped once, and copied for each of its days
+        fixture_data = fixture.model_dump(by_alias=True, mode="json")
+        
+        # Multi-day matches, like the County Championship, get an entry for each day
+        match_days = (fixture.end_date - fixture.start_date).days + 1
+        if match_days > 1:
             current_date = fixture.start_date
             day_number = 1
-            while current_date <= fixture.end_date and current_date >= today:
-                date_str = current_date.strftime("%Y-%m-%d")
-                if date_str not in grouped:
-                    grouped[date_str] = []
-                fixture_dict = fixture.model_dump(by_alias=True)
-                fixture_dict["day"] = f"Day {day_number} of 4"
-                grouped[date_str].append(fixture_dict)
+            while current_date <= fixture.end_date:
+                # Days already played are skipped, but still counted
+                if current_date >= today:
+                    date_str = current_date.strftime("%Y-%m-%d")
+                    grouped.setdefault(date_str, []).append(
+                        {**fixture_data, "day": f"Day {day_number} of {match_days}"}
+                    )
                 current_date = current_date + timedelta(days=1)
                 day_number += 1
         else:
-            # For all other competitions (One Day Cup), they are single-day matches
-            if fixture.start_date >= today:
-                date_str = fixture.start_date.strftime("%Y-%m-%d")
-                if date_str not in grouped:
-                    grouped[date_str] = []
-                fixture_dict = fixture.model_dump(by_alias=True)
-                fixture_dict["day"] = "One Day Match"
-                grouped[date_str].append(fixture_dict)
+            # Single-day matches, like the One-Day Cup and the Blast
+            date_str = fixture.start_date.strftime("%Y-%m-%d")
+            grouped.setdefault(date_str, []).append({**fixture_data, "day": "One Day Match"})
     
     return grouped
 
@@ -46,26 +53,140 @@ def write_fixtures_to_json(grouped_fixtures: Dict[str, List[Dict]], output_dir:
     
     for date_str, fixtures in grouped_fixtures.items():
         output_file = os.path.join(output_dir, f"{date_str}.json")
-        # Convert date objects to strings before JSON serialization
-        serializable_fixtures = []
-        for fixture in fixtures:
-            # Convert dates to string format
-            fixture_copy = fixture.copy()
-            if "startDate" in fixture_copy:
-                fixture_copy["startDate"] = fixture_copy["startDate"].strftime("%Y-%m-%d") if isinstance(fixture_copy["startDate"], date) else fixture_copy["startDate"]
-            if "endDate" in fixture_copy:
-                fixture_copy["endDate"] = fixture_copy["endDate"].strftime("%Y-%m-%d") if isinstance(fixture_copy["endDate"], date) else fixture_copy["endDate"]
-            serializable_fixtures.append(fixture_copy)
-        
         with open(output_file, "w") as f:
-            json.dump(serializable_fixtures, f, indent=2)
+            json.dump(fixtures, f, indent=2)
+
+def load_stored_fixtures(output_dir: str) -> Dict[str, List[Dict]]:
+    """Load the fixture files from today on, keyed by date."""
+    today = clock.today().strftime("%Y-%m-%d")
+    stored = {}
+    if not os.path.isdir(output_dir):
+        return stored
+    for filename in sorted(os.listdir(output_dir)):
+        date_str, extension = os.path.splitext(filename)
+        if extension != ".json" or date_str < today:
+            continue
+        try:
+            with open(os.path.join(output_dir, filename)) as f:
+                stored[date_str] = json.load(f)
+        except json.JSONDecodeError:
+            # A corrupt file is rewritten
+            stored[date_str] = []
+    return stored
+
+def index_by_match(grouped_fixtures: Dict[str, List[Dict]]) -> Dict[str, tuple[Dict, set[str]]]:
+    """Get each match's fixture, without the day label, and the dates it's on."""
+    matches = {}
+    for date_str, fixtures in grouped_fixtures.items():
+        for fixture in fixtures:
+            fixture_data = {key: value for key, value in fixture.items() if key != "day"}
+            _, dates = matches.setdefault(fixture["matchId"], (fixture_data, set()))
+            dates.add(date_str)
+    return matches
+
+def describe_changes(stored: Dict, fresh: Dict, detected_at: str) -> List[Dict]:
+    """Describe how a match was rescheduled or moved, for the change log."""
+    changes = []
+    if any(stored.get(field) != fresh.get(field) for field in SCHEDULE_FIELDS):
+        changes.append({
+            "type": "rescheduled",
+            "matchId": fresh["matchId"],
+            "from": {field: stored.get(field) for field in SCHEDULE_FIELDS},
+            "to": {field: fresh.get(field) for field in SCHEDULE_FIELDS},
+            "detectedAt": detected_at,
+        })
+    if stored.get("venue") != fresh.get("venue"):
+        changes.append({
+            "type": "venue",
+            "matchId": fresh["matchId"],
+            "from": stored.get("venue"),
+            "to": fresh.get("venue"),
+            "detectedAt": detected_at,
+        })
+    return changes
 
-def extract_fixtures() -> Dict[str, List[Dict]]:
+def update_fixture_files(
+    fixtures: List[Fixture],
+    output_dir: str,
+    change_log_file: str = CHANGE_LOG_FILE,
+) -> Dict[str, List[str]]:
+    """Bring the fixture files in line with freshly fetched fixtures, touching as few as possible.
+
+    Fresh fixtures are diffed with the stored ones by match ID, and only the
+    dates of matches that were added, removed or changed are rewritten. Stored
+    matches of a competition with no fresh fixtures at all are kept, as its
+    series most likely failed to fetch. When nothing has changed, no files are
+    written.
+    """
+    grouped = group_fixtures_by_day(fixtures)
+    stored_grouped = load_stored_fixtures(output_dir)
+    fetched_competitions = {fixture.competition for fixture in fixtures}
+    for date_str, stored_fixtures in stored_grouped.items():
+        kept = [fixture for fixture in stored_fixtures if fixture.get("competition") not in fetched_competitions]
+        if kept:
+            grouped.setdefault(date_str, []).extend(kept)
+
+    fresh_matches = index_by_match(grouped)
+    stored_matches = index_by_match(stored_grouped)
+    added = sorted(fresh_matches.keys() - stored_matches.keys())
+    removed = sorted(stored_matches.keys() - fresh_matches.keys())
+    changed = sorted(
+        match_id for match_id in fresh_matches.keys() & stored_matches.keys()
+        if fresh_matches[match_id] != stored_matches[match_id]
+    )
+
+    touched = set()
+    for match_id in added:
+        touched |= fresh_matches[match_id][1]
+    for match_id in removed:
+        touched |= stored_matches[match_id][1]
+    for match_id in changed:
+        touched |= fresh_matches[match_id][1] | stored_matches[match_id][1]
+
+    written = []
+    deleted = []
+    for date_str in sorted(touched):
+        # Day labels and order can be unchanged when only another day of a match moved
+        if grouped.get(date_str, []) == stored_grouped.get(date_str):
+            continue
+        if grouped.get(date_str):
+            write_fixtures_to_json({date_str: grouped[date_str]}, output_dir)
+            written.append(date_str)
+        else:
+            os.remove(os.path.join(output_dir, f"{date_str}.json"))
+            deleted.append(date_str)
+
+    detected_at = clock.now().isoformat()
+    change_log = []
+    for match_id in changed:
+        change_log.extend(describe_changes(stored_matches[match_id][0], fresh_matches[match_id][0], detected_at))
+    if change_log:
+        with open(change_log_file, "a") as f:
+            for change in change_log:
+                f.write(json.dumps(change) + "\n")
+
+    return {
+        "added": added,
+        "removed": removed,
+        "changed": changed,
+        "written": written,
+        "deleted": deleted,
+    }
+
+def extract_fixtures(client: Optional[CricAPIClient] = None) -> List[Fixture]:
     """Extract fixtures using CricAPI."""
-    client = CricAPIClient()
+    client = client or CricAPIClient()
     fixtures = client.get_county_fixtures()
-    return group_fixtures_by_day(fixtures)
+    client.budget.report()
+    return fixtures
 
 if __name__ == "__main__":
-    grouped = extract_fixtures()
-    write_fixtures_to_json(grouped, output_dir="public/data/fixtures")
+    client = CricAPIClient()
+    summary = update_fixture_files(extract_fixtures(client), output_dir="public/data/fixtures")
+    print(
+        f"Fixtures: {len(summary['added'])} added, {len(summary['removed'])} removed, "
+        f"{len(summary['changed'])} changed; {len(summary['written'])} files written, "
+        f"{len(summary['deleted'])} deleted"
+    )
+    manifest = publish_indexes(Path("public/data/fixtures"), team_index=client.team_index)
+    print(f"Fixture indexes: {', '.join(manifest.values())}")
@@ -0,0 +1,121 @@
+import json
+import hashlib
+from pathlib import Path
+from typing import Iterable, Optional
+from pydantic import ValidationError
+from models import Fixture
+from team_index import TeamIndex
+
+INDEXES_DIR = Path("public/data/indexes")
+MANIFEST_FILE = "manifest.json"
+# Fields of each match in the match index, in the order they're listed
+MATCH_FIELDS = ["competition", "homeTeam", "awayTeam", "startDate", "endDate", "startTimeGmt", "venue"]
+
+
+def iter_fixture_files(fixtures_dir: Path) -> Iterable[dict]:
+    """Yield every match in the per-date files once, in date order.
+
+    Multi-day matches are listed in the file for each day they're played, and
+    only their first entry is yielded. Older files used other field names, so
+    their fixtures are read through the model, and ones that can't be are skipped.
+    """
+    seen = set()
+    for fixtures_file in sorted(fixtures_dir.glob("*.json")):
+        try:
+            with open(fixtures_file) as f:
+                records = json.load(f)
+        except json.JSONDecodeError:
+            print(f"Skipping {fixtures_file.name}, it isn't valid JSON")
+            continue
+        for record in records:
+            match_id = record.get("matchId", record.get("match_id"))
+            if match_id is None or match_id in seen:
+                continue
+            seen.add(match_id)
+            if "matchId" not in record:
+                try:
+                    record = Fixture(**record).model_dump(by_alias=True, mode="json")
+                except ValidationError:
+                    continue
+            yield record
+
+
+def build_indexes(fixtures: Iterable[dict], team_index: Optional[TeamIndex] = None) -> dict[str, dict]:
+    """Build the team, competition and match indexes in one pass over the fixtures.
+
+    Each match is indexed once, however many days it's listed on. Teams are keyed by their channels.json key where the team
+    index can resolve them, and by the name in the fixture otherwise.
+    """
+    teams: dict[str, list[list[str]]] = {}
+    competitions: dict[str, dict[str, list[str]]] = {}
+    matches: dict[str, list[str]] = {}
+
+    for fixture in fixtures:
+        match_id = fixture["matchId"]
+        if match_id in matches:
+            continue
+        matches[match_id] = [fixture.get(field) for field in MATCH_FIELDS]
+        start_date = fixture["startDate"]
+        for name in (fixture["homeTeam"], fixture["awayTeam"]):
+            team = (team_index.resolve(name) if team_index else None) or name
+            teams.setdefault(team, []).append([start_date, match_id])
+        competitions.setdefault(fixture["competition"], {}).setdefault(start_date, []).append(match_id)
+
+    # Each team's matches in date order, so the next one is the first on or after today
+    for team_matches in teams.values():
+        team_matches.sort()
+    return {
+        "teams": dict(sorted(teams.items())),
+        "competitions": {
+            competition: dict(sorted(calendar.items()))
+            for competition, calendar in sorted(competitions.items())
+        },
+        "matches": {"fields": MATCH_FIELDS, "matches": dict(sorted(matches.items()))},
+    }
+
+
+def content_hash(data: dict) -> str:
+    encoded = json.dumps(data, separators=(",", ":"), sort_keys=True).encode()
+    return hashlib.sha256(encoded).hexdigest()[:12]
+
+
+def write_indexes(indexes: dict[str, dict], output_dir: Path = INDEXES_DIR) -> dict[str, str]:
+    """Write each index to a content-hashed file, listed in a manifest.
+
+    The hashed files never change, so they can be cached for good; only the
+    manifest needs revalidating. Files and the manifest are only written when
+    their content has changed. The files of the manifest being replaced are
+    kept for clients still holding it, and older ones are removed.
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest_file = output_dir / MANIFEST_FILE
+    try:
+        with open(manifest_file) as f:
+            previous = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        previous = {}
+
+    manifest = {}
+    for name, data in indexes.items():
+        filename = f"{name}.{content_hash(data)}.json"
+        manifest[name] = filename
+        if not (output_dir / filename).exists():
+            with open(output_dir / filename, "w") as f:
+                json.dump(data, f, separators=(",", ":"))
+        for old_file in output_dir.glob(f"{name}.*.json"):
+            if old_file.name not in (filename, previous.get(name)):
+                old_file.unlink()
+
+    if previous != manifest:
+        with open(manifest_file, "w") as f:
+            json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def publish_indexes(
+    fixtures_dir: Path,
+    output_dir: Path = INDEXES_DIR,
+    team_index: Optional[TeamIndex] = None,
+) -> dict[str, str]:
+    """Build the indexes from the fixture files and write any that changed."""
+    return write_indexes(build_indexes(iter_fixture_files(fixtures_dir), team_index), output_dir)
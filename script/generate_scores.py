@@ -1,7 +1,53 @@
 import json
 from pathlib import Path
 from cricapi_client import CricAPIClient
-from models import StreamsData
+from models import MatchDetails, MatchesData, StreamsData
+from score_archive import ScoreArchive
+from standings import build_tables, load_matches_index, load_results, save_results, write_standings
+
+MATCHES_FILE = Path(__file__).parent.parent / 'public' / 'data' / 'matches.json'
+
+def write_matches_file(matches_data: MatchesData, matches_file: Path = MATCHES_FILE):
+    """Write matches data to matches.json."""
+    with open(matches_file, 'w', encoding='utf-8') as f:
+        json.dump(matches_data.model_dump(by_alias=True), f, indent=2, default=str)
+
+def archive_scores(matches_data: MatchesData) -> int:
+    """Append each match's changed innings scores to the score archive."""
+    scores = {
+        match.match_id: match.scores
+        for competition in matches_data.competitions.values()
+        for match in competition.matches_list
+        if match.scores
+    }
+    return ScoreArchive().record_many(scores, at=matches_data.last_updated)
+
+def update_standings(client: CricAPIClient, matches_data: MatchesData) -> int:
+    """Apply the results of matches that have just finished to the league tables, and publish them."""
+    results = load_results()
+    tables = build_tables(client.competitions, load_matches_index(), results, client.team_index.resolve)
+    changed = 0
+    for competition in matches_data.competitions.values():
+        for match in competition.matches_list:
+            if not match.match_ended:
+                continue
+            details = MatchDetails(
+                match_id=match.match_id,
+                status=match.status,
+                match_started=match.match_started,
+                match_ended=match.match_ended,
+                score=match.scores,
+            )
+            if results.get(match.match_id) == details:
+                continue
+            results[match.match_id] = details
+            changed += 1
+            for table in tables.values():
+                table.update_result(match.match_id, details)
+    if changed:
+        save_results(results)
+    write_standings(tables)
+    return changed
 
 def main():
     try:
@@ -17,10 +63,19 @@ def main():
         matches_data = client.generate_matches_data(streams_data)
 
         # Write matches.json
-        matches_file = Path(__file__).parent.parent / 'public' / 'data' / 'matches.json'
-        with open(matches_file, 'w', encoding='utf-8') as f:
-            json.dump(matches_data.model_dump(by_alias=True), f, indent=2, default=str)
+        write_matches_file(matches_data)
         print('Successfully generated matches.json')
+        client.budget.report()
+
+        # The archive is a record of progress, so failing to update it doesn't stop the deploy
+        try:
+            print(f'Archived {archive_scores(matches_data)} score changes')
+        except Exception as e:
+            print(f'Error archiving scores: {e}')
+        try:
+            print(f'Updated standings with {update_standings(client, matches_data)} new results')
+        except Exception as e:
+            print(f'Error updating standings: {e}')
 
     except Exception as e:
         print(f'Error generating matches.json: {e}')
@@ -1,19 +1,12 @@
 from datetime import date, datetime
-from enum import Enum
 from typing import Optional
 from pydantic import BaseModel, Field, ConfigDict
 
-class CompetitionType(str, Enum):
-    COUNTY_CHAMPIONSHIP_DIV_ONE = "County Championship Division One"
-    COUNTY_CHAMPIONSHIP_DIV_TWO = "County Championship Division Two"
-    ONE_DAY_CUP = "One-Day Cup"
-    BLAST = "T20 Blast"
-
 class Fixture(BaseModel):
     model_config = ConfigDict(populate_by_name=True)
     
     match_id: str = Field(description="Unique identifier for the match", alias="matchId")
-    competition: CompetitionType = Field(description="Type of competition")
+    competition: str = Field(description="Name of the competition, as listed in competitions.json")
     home_team: str = Field(description="Name of the home team", alias="homeTeam")
     home_bluesky_handle: str | None = Field(description="Bluesky handle of the home team", alias="homeTeamBlueskyHandle", default=None)
     away_team: str = Field(description="Name of the away team", alias="awayTeam")
@@ -23,6 +16,18 @@ class Fixture(BaseModel):
     start_time_gmt: str = Field(description="Start time in GMT (HH:MM format)", alias="startTimeGmt")
     venue: str = Field(description="Name of the venue where the match is played")
 
+class Competition(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+    
+    series_id: str = Field(description="CricAPI series ID", alias="seriesId")
+    competition: str = Field(description="Name the series' fixtures are listed under", min_length=1)
+    keywords: list[str] = Field(default_factory=list, description="Words in stream titles that point to the competition")
+    match_days: int = Field(1, description="How many days each match is scheduled over", alias="matchDays", ge=1)
+    overs: Optional[int] = Field(None, description="Overs each side faces in limited-overs matches")
+    points: dict[str, int] = Field(default_factory=dict, description="League points for a win, tie, draw or no result")
+    bonus_points: bool = Field(False, description="Whether Championship batting and bowling bonus points are awarded", alias="bonusPoints")
+    groups: dict[str, list[str]] = Field(default_factory=dict, description="Teams in each group, by channels.json key")
+
 class SeriesInfo(BaseModel):
     model_config = ConfigDict(populate_by_name=True)
     
@@ -43,21 +48,10 @@ class Channel(BaseModel):
     youtube_channel_id: str = Field(description="YouTube channel ID", alias="youtubeChannelId")
     nicknames: list[str] = Field(default_factory=list, description="Alternative names for the team")
     uploads_playlist_id: str = Field(description="YouTube uploads playlist ID", alias="uploadsPlaylistId")
+    abbr: Optional[str] = Field(None, description="Short name of the team, like Derbys")
+    abbr3: Optional[str] = Field(None, description="Three-letter abbreviation of the team, like DER")
     bluesky_handle: str | None = Field(description="Bluesky handle of the team", alias="blueskyHandle", default=None)
     
-class VideoStream(BaseModel):
-    model_config = ConfigDict(populate_by_name=True)
-    
-    video_id: Optional[str] = Field(None, description="YouTube video ID", alias="videoId")
-    title: str = Field(description="Title of the stream")
-    channel_name: str = Field(description="Name of the channel", alias="channelName")
-    channel_id: str = Field(description="YouTube channel ID", alias="channelId")
-    description: str = Field(description="Stream description")
-    published_at: Optional[datetime] = Field(None, description="When the stream was published", alias="publishedAt")
-    scheduled_start_time: Optional[datetime] = Field(None, description="When the stream is scheduled to start", alias="scheduledStartTime")
-    is_placeholder: bool = Field(default=False, description="Whether this is a placeholder for an expected stream", alias="isPlaceholder")
-    fixture: Fixture = Field(description="Associated fixture information")
-
 class StreamInfo(BaseModel):
     model_config = ConfigDict(populate_by_name=True)
     
@@ -72,6 +66,29 @@ class StreamsData(BaseModel):
     last_updated: datetime = Field(description="When the streams data was last updated", alias="lastUpdated")
     streams: dict[str, StreamInfo] = Field(description="Streams organized by match ID")
 
+class StreamsShard(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+    
+    shard_index: int = Field(description="Which shard polled these streams", alias="shardIndex")
+    shard_count: int = Field(description="How many shards the channels were split across", alias="shardCount")
+    last_updated: datetime = Field(description="When the shard was polled", alias="lastUpdated")
+    streams: dict[str, StreamInfo] = Field(description="The shard's streams organized by match ID")
+
+class ReplayInfo(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+    
+    match_date: date = Field(description="Day of the match the stream covers", alias="date")
+    video_id: str = Field(description="YouTube video ID", alias="videoId")
+    title: str = Field(description="Title of the stream")
+    channel_id: str = Field(description="YouTube channel ID", alias="channelId")
+    actual_start_time: datetime = Field(description="When the stream actually started", alias="actualStartTime")
+
+class ReplaysData(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+    
+    last_updated: datetime = Field(description="When the replays data was last updated", alias="lastUpdated")
+    replays: dict[str, list[ReplayInfo]] = Field(description="Replay streams organized by match ID")
+
 class InningsScore(BaseModel):
     model_config = ConfigDict(populate_by_name=True)
     
@@ -94,6 +111,26 @@ class MatchDetails(BaseModel):
     match_ended: Optional[bool] = Field(None, description="Whether the match has ended", alias="matchEnded")
     score: Optional[MatchScore] = Field(None, description="Current match score")
 
+class BatterScore(BaseModel):
+    name: str = Field(description="Name of the batter")
+    runs: int = Field(description="Runs scored")
+    balls: int = Field(description="Balls faced")
+
+class BowlerFigures(BaseModel):
+    name: str = Field(description="Name of the bowler")
+    overs: str = Field(description="Overs bowled, like 7.3")
+    runs: int = Field(description="Runs conceded")
+    wickets: int = Field(description="Wickets taken")
+
+class LiveSummary(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+    
+    batters: list[BatterScore] = Field(description="Batters at the crease")
+    bowler: Optional[BowlerFigures] = Field(None, description="The bowler of the latest delivery")
+    this_over: list[str] = Field(description="Each delivery of the over in progress", alias="thisOver")
+    last_over: list[str] = Field(description="Each delivery of the last completed over", alias="lastOver")
+    fall_of_wickets: list[str] = Field(description="Score at each wicket in the innings", alias="fallOfWickets")
+
 class MatchData(BaseModel):
     model_config = ConfigDict(populate_by_name=True)
     
@@ -107,6 +144,7 @@ class MatchData(BaseModel):
     stream: StreamInfo = Field(description="Stream information")
     match_started: Optional[bool] = Field(None, description="Whether the match has started", alias="matchStarted")
     match_ended: Optional[bool] = Field(None, description="Whether the match has ended", alias="matchEnded")
+    live: Optional[LiveSummary] = Field(None, description="Ball-by-ball summary while the match is in play")
 
 class CompetitionMatches(BaseModel):
     model_config = ConfigDict(populate_by_name=True)
@@ -114,8 +152,17 @@ class CompetitionMatches(BaseModel):
     competition_name: str = Field(description="Name of the competition", alias="name")
     matches_list: list[MatchData] = Field(description="List of matches in the competition", alias="matches")
 
+class RefreshHint(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+    
+    next_refresh: datetime = Field(description="When the matches data is next worth fetching", alias="nextRefresh")
+    max_age: int = Field(description="Seconds the matches data can be reused for", alias="maxAge")
+    cache_control: str = Field(description="Cache-Control header value for the matches data", alias="cacheControl")
+    reason: str = Field(description="What the refresh time was worked out from: live, start or idle")
+
 class MatchesData(BaseModel):
     model_config = ConfigDict(populate_by_name=True)
     
     last_updated: datetime = Field(description="When the matches data was last updated", alias="lastUpdated")
-    competitions: dict[str, CompetitionMatches] = Field(description="Matches organized by competition") 
\ No newline at end of file
+    competitions: dict[str, CompetitionMatches] = Field(description="Matches organized by competition") 
+    refresh: Optional[RefreshHint] = Field(None, description="When clients should next fetch the matches data")
\ No newline at end of file
@@ -0,0 +1,258 @@
+import os
+import json
+import fcntl
+import argparse
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Optional
+from dotenv import load_dotenv
+from models import Fixture
+import clock
+from state import STATE_DIR, load_json, save_json
+
+# Load environment variables
+load_dotenv()
+
+OUTBOX_FILE = STATE_DIR / "outbox.jsonl"
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+OUTBOX_RETRY_DELAY = timedelta(seconds=int(os.getenv("OUTBOX_RETRY_DELAY_SECONDS", "60")))
+# Events created within this long of each other go out in the same post
+OUTBOX_BATCH_WINDOW = timedelta(seconds=int(os.getenv("OUTBOX_BATCH_WINDOW_SECONDS", "300")))
+# How long a resident worker waits for stragglers before posting a batch
+OUTBOX_SETTLE_TIME = timedelta(seconds=int(os.getenv("OUTBOX_SETTLE_SECONDS", "30")))
+OUTBOX_RETENTION = timedelta(days=7)
+
+Sender = Callable[[list[Fixture], dict[str, Optional[str]]], bool]
+
+
+def event_key(match_id: str, video_id: str) -> str:
+    """Idempotency key for an event: a stream is only announced once per match."""
+    return f"{match_id}:{video_id}"
+
+
+def delivery_file(outbox_file: Path) -> Path:
+    return outbox_file.with_suffix(".state.json")
+
+
+@contextmanager
+def locked(outbox_file: Path, blocking: bool = True, suffix: str = ".lock"):
+    """Hold one of the outbox's locks, yielding whether it was acquired.
+
+    The ".lock" lock guards the outbox file itself and is only held briefly,
+    while ".drain.lock" is held by the one worker delivering events.
+    """
+    lock_file = outbox_file.with_suffix(suffix)
+    lock_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_file, "w") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def read_events(outbox_file: Path = OUTBOX_FILE) -> list[dict]:
+    """Read every event in the outbox, skipping any partially written line."""
+    events = []
+    try:
+        with open(outbox_file) as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return events
+
+
+def enqueue(
+    fixtures: list[Fixture],
+    video_ids: dict[str, Optional[str]],
+    outbox_file: Path = OUTBOX_FILE,
+) -> int:
+    """Durably append a new-stream event for each fixture.
+
+    Events whose idempotency key is already in the outbox are skipped. Returns
+    the number of events added.
+    """
+    created_at = clock.now().isoformat()
+    with locked(outbox_file):
+        existing_keys = {event["key"] for event in read_events(outbox_file)}
+        lines = []
+        for fixture in fixtures:
+            video_id = video_ids.get(fixture.match_id)
+            if not video_id:
+                continue
+            key = event_key(fixture.match_id, video_id)
+            if key in existing_keys:
+                continue
+            existing_keys.add(key)
+            lines.append(json.dumps({
+                "key": key,
+                "createdAt": created_at,
+                "matchId": fixture.match_id,
+                "videoId": video_id,
+                "fixture": fixture.model_dump(mode="json", by_alias=True),
+            }) + "\n")
+
+        if lines:
+            with open(outbox_file, "a") as f:
+                f.writelines(lines)
+                f.flush()
+                os.fsync(f.fileno())
+    if lines:
+        print(f"Queued {len(lines)} new stream notifications")
+    return len(lines)
+
+
+def pending_batches(
+    events: list[dict],
+    deliveries: dict[str, dict],
+    now: datetime,
+    settle_time: timedelta = timedelta(0),
+) -> list[list[dict]]:
+    """Group events that are due for delivery into batches of close arrivals."""
+    due = []
+    for event in events:
+        delivery = deliveries.get(event["key"], {})
+        if delivery.get("status") in ("sent", "failed"):
+            continue
+        next_attempt = delivery.get("nextAttemptAt")
+        if next_attempt and datetime.fromisoformat(next_attempt) > now:
+            continue
+        due.append(event)
+
+    batches = []
+    for event in sorted(due, key=lambda e: e["createdAt"]):
+        created_at = datetime.fromisoformat(event["createdAt"])
+        if batches and created_at - datetime.fromisoformat(batches[-1][-1]["createdAt"]) <= OUTBOX_BATCH_WINDOW:
+            batches[-1].append(event)
+        else:
+            batches.append([event])
+
+    # Hold back the latest batch while more events might still join it
+    if batches and now - datetime.fromisoformat(batches[-1][-1]["createdAt"]) < settle_time:
+        batches.pop()
+    return batches
+
+
+def compact(events: list[dict], deliveries: dict[str, dict], now: datetime, outbox_file: Path):
+    """Drop delivered events older than the retention period."""
+    cutoff = now - OUTBOX_RETENTION
+    kept = [
+        event for event in events
+        if deliveries.get(event["key"], {}).get("status") not in ("sent", "failed")
+        or datetime.fromisoformat(event["createdAt"]) > cutoff
+    ]
+    if len(kept) == len(events):
+        return
+    tmp_file = outbox_file.with_suffix(".tmp")
+    with open(tmp_file, "w") as f:
+        f.writelines(json.dumps(event) + "\n" for event in kept)
+    tmp_file.replace(outbox_file)
+    kept_keys = {event["key"] for event in kept}
+    for key in list(deliveries):
+        if key not in kept_keys:
+            del deliveries[key]
+
+
+def drain(
+    send: Optional[Sender] = None,
+    outbox_file: Path = OUTBOX_FILE,
+    settle_time: timedelta = timedelta(0),
+) -> int:
+    """Deliver pending events, one post per batch, retrying failures with backoff.
+
+    Only one drain runs at a time; a concurrent drain returns straight away.
+    Events can be queued while a batch is being sent. Returns the number of
+    events delivered.
+    """
+    if send is None:
+        from bluesky import post_to_bluesky
+        send = post_to_bluesky
+
+    delivered = 0
+    with locked(outbox_file, blocking=False, suffix=".drain.lock") as acquired:
+        if not acquired:
+            print("Outbox is being drained by another worker")
+            return 0
+
+        # Only the drainer touches the delivery state, but the outbox lock is
+        # taken to read the events, so enqueue() never waits on a send
+        deliveries_file = delivery_file(outbox_file)
+        deliveries = load_json(deliveries_file, {})
+        now = clock.now()
+        with locked(outbox_file):
+            events = read_events(outbox_file)
+
+        for batch in pending_batches(events, deliveries, now, settle_time):
+            fixtures = [Fixture(**event["fixture"]) for event in batch]
+            video_ids = {event["matchId"]: event["videoId"] for event in batch}
+            try:
+                sent = send(fixtures, video_ids)
+                error = None if sent else "Send was not completed"
+            except Exception as e:
+                sent = False
+                error = str(e)
+
+            for event in batch:
+                delivery = deliveries.setdefault(event["key"], {"attempts": 0})
+                delivery["attempts"] += 1
+                delivery["lastAttemptAt"] = now.isoformat()
+                if sent:
+                    delivery["status"] = "sent"
+                    delivered += 1
+                elif delivery["attempts"] >= OUTBOX_MAX_ATTEMPTS:
+                    delivery["status"] = "failed"
+                    delivery["lastError"] = error
+                    print(f"Giving up on notification {event['key']}: {error}")
+                else:
+                    delivery["status"] = "pending"
+                    delivery["lastError"] = error
+                    backoff = OUTBOX_RETRY_DELAY * 2 ** (delivery["attempts"] - 1)
+                    delivery["nextAttemptAt"] = (now + backoff).isoformat()
+            # Record each batch straight away so a crash can't cause a repeat post
+            save_json(deliveries_file, deliveries)
+
+            if not sent:
+                print(f"Failed to send {len(batch)} notifications: {error}")
+
+        with locked(outbox_file):
+            # Read again so events queued while sending aren't compacted away
+            compact(read_events(outbox_file), deliveries, now, outbox_file)
+            save_json(deliveries_file, deliveries)
+
+    if delivered:
+        print(f"Delivered {delivered} notifications")
+    return delivered
+
+
+def run_worker(stop: threading.Event, interval: float = 15, outbox_file: Path = OUTBOX_FILE):
+    """Keep draining the outbox until asked to stop."""
+    while not stop.is_set():
+        try:
+            drain(outbox_file=outbox_file, settle_time=OUTBOX_SETTLE_TIME)
+        except Exception as e:
+            print(f"Error draining outbox: {str(e)}")
+        stop.wait(interval)
+    # Send anything still queued before exiting
+    drain(outbox_file=outbox_file)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deliver queued new-stream notifications")
+    parser.add_argument(
+        "--outbox",
+        type=Path,
+        default=OUTBOX_FILE,
+        help="Outbox file to drain"
+    )
+    args = parser.parse_args()
+    drain(outbox_file=args.outbox)
@@ -0,0 +1,348 @@
+import json
+import mmap
+import struct
+import argparse
+from datetime import date, datetime, time, timezone
+from pathlib import Path
+from typing import Iterable, NamedTuple, Optional
+import clock
+from models import MatchScore
+from state import STATE_DIR, load_json
+
+SCORE_ARCHIVE_DIR = STATE_DIR / "score-archive"
+SNAPSHOTS_FILE = "snapshots.bin"
+INDEX_FILE = "index.json"
+
+MAGIC = b"CCSA"
+VERSION = 1
+HEADER = struct.Struct("<4sHH")
+# Timestamp, match number, innings number, wickets, runs and tenths of an over
+RECORD = struct.Struct("<IIBBHH")
+
+
+class ScoreSnapshot(NamedTuple):
+    timestamp: datetime
+    match_id: str
+    innings: str
+    runs: int
+    wickets: int
+    overs: float
+
+
+def pack_overs(overs: float) -> int:
+    """Store overs like 25.2 as 252, as the part after the point is balls, not a fraction."""
+    return round(overs * 10)
+
+
+def pack_runs(runs: list[list[int]]) -> str:
+    """Write runs of records as the gap before each and its length, which stay short as the archive grows."""
+    packed = []
+    end = 0
+    for first, next_end in runs:
+        packed += [first - end, next_end - first]
+        end = next_end
+    return ",".join(map(str, packed))
+
+
+def unpack_runs(packed: str) -> list[list[int]]:
+    numbers = [int(number) for number in packed.split(",")] if packed else []
+    runs = []
+    end = 0
+    for gap, length in zip(numbers[::2], numbers[1::2]):
+        runs.append([end + gap, end + gap + length])
+        end += gap + length
+    return runs
+
+
+class ScoreArchive:
+    """Append-only archive of every score change, one fixed-width record per innings update.
+
+    Records are appended to snapshots.bin in time order, 14 bytes each after a
+    short header, and read back through a memory map. index.json holds the
+    match IDs and innings names the records refer to by number, the range of
+    records each day falls in, and each match's runs of consecutive records,
+    so a query only unpacks its own records, not those of matches played
+    alongside it.
+
+    Matches are registered in the index before their records are written, and
+    the ranges are updated after, so a crash in between leaves records the
+    index doesn't cover yet; they're picked up again when the archive is next
+    opened.
+    """
+
+    def __init__(self, directory: Path = SCORE_ARCHIVE_DIR):
+        self.directory = directory
+        self.snapshots_file = directory / SNAPSHOTS_FILE
+        self.index_file = directory / INDEX_FILE
+        index = load_json(self.index_file, {})
+        # Match IDs by number, and each match's innings names by number
+        self.match_ids: list[str] = index.get("matchIds", [])
+        self.innings: dict[str, list[str]] = index.get("innings", {})
+        # First record and the record after the last, of each run of a match's
+        # records, and of each day
+        self.match_ranges: dict[str, list[list[int]]] = {
+            match_id: unpack_runs(packed) for match_id, packed in index.get("matches", {}).items()
+        }
+        # Packed runs are kept, so saving the index only packs the matches that changed
+        self.packed_runs: dict[str, str] = dict(index.get("matches", {}))
+        self.day_ranges: dict[str, list[int]] = index.get("days", {})
+        self.count: int = index.get("count", 0)
+        self.match_numbers = {match_id: number for number, match_id in enumerate(self.match_ids)}
+        self._check_header()
+        # A crash can leave records the index doesn't cover, or half a record
+        size = self._file_size()
+        if size != HEADER.size + self.count * RECORD.size and not (size == 0 and self.count == 0):
+            self._reindex()
+
+    def _check_header(self):
+        try:
+            with open(self.snapshots_file, "rb") as f:
+                header = f.read(HEADER.size)
+        except FileNotFoundError:
+            return
+        if len(header) == HEADER.size and HEADER.unpack(header) != (MAGIC, VERSION, RECORD.size):
+            raise ValueError(f"{self.snapshots_file} isn't a version {VERSION} score archive")
+
+    def _file_size(self) -> int:
+        try:
+            return self.snapshots_file.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def _records_in_file(self) -> int:
+        return max(self._file_size() - HEADER.size, 0) // RECORD.size
+
+    def _save_index(self):
+        # Written compactly, in one go, as it's rewritten on every append and grows over a season
+        for match_id, runs in self.match_ranges.items():
+            if match_id not in self.packed_runs:
+                self.packed_runs[match_id] = pack_runs(runs)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.index_file.with_suffix(".tmp")
+        with open(tmp_file, "w") as f:
+            f.write(json.dumps({
+                "version": VERSION,
+                "count": self.count,
+                "matchIds": self.match_ids,
+                "innings": self.innings,
+                "matches": {match_id: self.packed_runs[match_id] for match_id in self.match_ranges},
+                "days": self.day_ranges,
+            }, separators=(",", ":")))
+        tmp_file.replace(self.index_file)
+
+    def _extend_range(self, ranges: dict[str, list[int]], key: str, position: int):
+        if key in ranges:
+            ranges[key][1] = position + 1
+        else:
+            ranges[key] = [position, position + 1]
+
+    def _extend_runs(self, runs: dict[str, list[list[int]]], key: str, position: int):
+        """Add a record to a match's last run if it follows on from it, or start a new run."""
+        key_runs = runs.setdefault(key, [])
+        if key_runs and key_runs[-1][1] == position:
+            key_runs[-1][1] = position + 1
+        else:
+            key_runs.append([position, position + 1])
+
+    def _reindex(self):
+        """Rebuild the record ranges from the snapshots file, dropping any partly written record."""
+        count = self._records_in_file()
+        if self._file_size() < HEADER.size:
+            self.snapshots_file.unlink(missing_ok=True)
+        else:
+            with open(self.snapshots_file, "r+b") as f:
+                f.truncate(HEADER.size + count * RECORD.size)
+        self.match_ranges = {}
+        self.packed_runs = {}
+        self.day_ranges = {}
+        self.count = 0
+        known_matches = len(self.match_ids)
+        for position, (timestamp, number, innings, *_) in enumerate(self._read(0, count)):
+            self._name_lost_match(number, innings)
+            self._index_record(position, timestamp, number)
+        self.count = count
+        if len(self.match_ids) > known_matches:
+            print(f"Score archive index was missing {len(self.match_ids) - known_matches} matches, kept under placeholder IDs")
+        self._save_index()
+
+    def _name_lost_match(self, number: int, innings: int):
+        """Give a match or innings missing from the index a placeholder name, so its records can still be read.
+
+        Records only hold numbers, so if the index is lost or restored from an
+        older copy, the names it held can't be recovered from the snapshots file.
+        """
+        while len(self.match_ids) <= number:
+            match_id = f"unknown-{len(self.match_ids)}"
+            self.match_numbers[match_id] = len(self.match_ids)
+            self.match_ids.append(match_id)
+        innings_names = self.innings.setdefault(self.match_ids[number], [])
+        while len(innings_names) <= innings:
+            innings_names.append(f"Innings {len(innings_names) + 1}")
+
+    def _index_record(self, position: int, timestamp: int, number: int):
+        match_id = self.match_ids[number]
+        self._extend_runs(self.match_ranges, match_id, position)
+        self.packed_runs.pop(match_id, None)
+        day = datetime.fromtimestamp(timestamp, timezone.utc).date().isoformat()
+        self._extend_range(self.day_ranges, day, position)
+
+    def _read(self, first: int = 0, end: Optional[int] = None) -> list[tuple]:
+        """Unpack a range of records, mapping the file so only that range is read."""
+        end = self._records_in_file() if end is None else end
+        return self._read_runs([[first, end]])
+
+    def _read_runs(self, runs: Iterable[list[int]]) -> list[tuple]:
+        """Unpack several ranges of records through one mapping of the file."""
+        runs = [(first, end) for first, end in runs if end > first]
+        if not runs:
+            return []
+        records = []
+        with open(self.snapshots_file, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for first, end in runs:
+                records.extend(RECORD.iter_unpack(
+                    mapped[HEADER.size + first * RECORD.size:HEADER.size + end * RECORD.size]
+                ))
+        return records
+
+    def _snapshot(self, record: tuple) -> ScoreSnapshot:
+        timestamp, number, innings, wickets, runs, overs = record
+        match_id = self.match_ids[number]
+        return ScoreSnapshot(
+            timestamp=datetime.fromtimestamp(timestamp, timezone.utc),
+            match_id=match_id,
+            innings=self.innings[match_id][innings],
+            runs=runs,
+            wickets=wickets,
+            overs=overs / 10,
+        )
+
+    def latest(self, match_id: str) -> dict[str, tuple[int, int, int]]:
+        """Get the last recorded runs, wickets and overs of each of a match's innings."""
+        latest = {}
+        for _, _, innings, wickets, runs, overs in self._read_runs(self.match_ranges.get(match_id, [])):
+            latest[self.innings[match_id][innings]] = (runs, wickets, overs)
+        return latest
+
+    def record(self, match_id: str, score: MatchScore, at: Optional[datetime] = None) -> int:
+        """Append the innings of a match whose score has changed since it was last recorded.
+
+        Returns how many snapshots were appended.
+        """
+        return self.record_many({match_id: score}, at)
+
+    def record_many(self, scores: dict[str, MatchScore], at: Optional[datetime] = None) -> int:
+        """Append the changed innings of several matches in one write."""
+        timestamp = int((at or clock.now()).timestamp())
+        changed = []
+        for match_id, score in scores.items():
+            latest = self.latest(match_id)
+            for innings in score.innings_list:
+                values = (innings.runs_scored, innings.wickets_fallen, pack_overs(innings.overs_bowled))
+                if latest.get(innings.innings_name) != values:
+                    latest[innings.innings_name] = values
+                    changed.append((match_id, innings.innings_name, values))
+        if not changed:
+            return 0
+
+        # New matches and innings are registered before their records are written
+        registered = False
+        for match_id, name, _ in changed:
+            if match_id not in self.match_numbers:
+                self.match_numbers[match_id] = len(self.match_ids)
+                self.match_ids.append(match_id)
+            innings_names = self.innings.setdefault(match_id, [])
+            if name not in innings_names:
+                innings_names.append(name)
+                registered = True
+        if registered:
+            self._save_index()
+
+        records = bytearray()
+        for match_id, name, (runs, wickets, overs) in changed:
+            number = self.match_numbers[match_id]
+            records += RECORD.pack(timestamp, number, self.innings[match_id].index(name), wickets, runs, overs)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.snapshots_file, "ab") as f:
+            if f.tell() == 0:
+                f.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+            f.write(records)
+
+        for match_id, _, _ in changed:
+            self._index_record(self.count, timestamp, self.match_numbers[match_id])
+            self.count += 1
+        self._save_index()
+        return len(changed)
+
+    def match(self, match_id: str) -> list[ScoreSnapshot]:
+        """Get every recorded snapshot of a match, oldest first."""
+        return [self._snapshot(record) for record in self._read_runs(self.match_ranges.get(match_id, []))]
+
+    def day(self, day: date) -> list[ScoreSnapshot]:
+        """Get every snapshot recorded on a day, in UTC, oldest first."""
+        key = day.isoformat()
+        if key not in self.day_ranges:
+            return []
+        start = int(datetime.combine(day, time(0, 0), tzinfo=timezone.utc).timestamp())
+        return [
+            self._snapshot(record)
+            for record in self._read(*self.day_ranges[key])
+            if start <= record[0] < start + 86400
+        ]
+
+    def compact(self, before: Optional[date] = None) -> tuple[int, int]:
+        """Rewrite the archive without repeated snapshots, or ones from before a day.
+
+        Returns how many records were kept and how many dropped.
+        """
+        cutoff = int(datetime.combine(before, time(0, 0), tzinfo=timezone.utc).timestamp()) if before else 0
+        kept_records = []
+        latest = {}
+        for record in self._read():
+            timestamp, number, innings, wickets, runs, overs = record
+            if timestamp < cutoff or latest.get((number, innings)) == (wickets, runs, overs):
+                continue
+            latest[(number, innings)] = (wickets, runs, overs)
+            kept_records.append(record)
+        dropped = self.count - len(kept_records)
+
+        # Matches with nothing left are dropped, and the rest renumbered
+        numbers = {}
+        for record in kept_records:
+            numbers.setdefault(record[1], len(numbers))
+        old_match_ids = self.match_ids
+        self.match_ids = [old_match_ids[number] for number in numbers]
+        self.match_numbers = {match_id: number for number, match_id in enumerate(self.match_ids)}
+        self.innings = {match_id: self.innings[match_id] for match_id in self.match_ids}
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.snapshots_file.with_suffix(".tmp")
+        with open(tmp_file, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+            for timestamp, number, *values in kept_records:
+                f.write(RECORD.pack(timestamp, numbers[number], *values))
+        tmp_file.replace(self.snapshots_file)
+        self._reindex()
+        return len(kept_records), dropped
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query or compact the score snapshot archive")
+    parser.add_argument("--archive-dir", type=Path, default=SCORE_ARCHIVE_DIR, help="Archive directory")
+    parser.add_argument("--match", help="Print a match's snapshots")
+    parser.add_argument("--day", type=date.fromisoformat, help="Print a day's snapshots (YYYY-MM-DD)")
+    parser.add_argument("--compact", action="store_true", help="Drop repeated snapshots and rewrite the archive")
+    parser.add_argument("--before", type=date.fromisoformat, help="When compacting, also drop snapshots before this day")
+    args = parser.parse_args()
+
+    archive = ScoreArchive(args.archive_dir)
+    if args.compact:
+        kept, dropped = archive.compact(args.before)
+        print(f"Compacted score archive: kept {kept} snapshots, dropped {dropped}")
+    snapshots = archive.match(args.match) if args.match else archive.day(args.day) if args.day else []
+    for snapshot in snapshots:
+        print(
+            f"{snapshot.timestamp.isoformat()} {snapshot.match_id} {snapshot.innings}: "
+            f"{snapshot.runs}/{snapshot.wickets} ({snapshot.overs} ov)"
+        )
+    if not (args.compact or args.match or args.day):
+        print(f"{archive.count} snapshots of {len(archive.match_ids)} matches over {len(archive.day_ranges)} days")
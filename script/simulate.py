@@ -0,0 +1,447 @@
+"""Replay a season of polling on a virtual clock to size API plans.
+
+Streams are simulated for every fixture in public/data/fixtures, and the real
+discovery code polls them through stand-ins for YouTube and the channel feeds,
+counting the quota each poll would use.
+"""
+import io
+import json
+import bisect
+import random
+import argparse
+import contextlib
+import functools
+import statistics
+import tempfile
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta, timezone
+from pathlib import Path
+from typing import Optional
+from unittest.mock import patch
+from pydantic import ValidationError
+import clock
+import feeds
+from clock import VirtualClock
+import update_streams
+from feeds import FeedDiscovery, FeedError
+from competitions import competitions_by_name, load_competitions
+from models import Channel, Competition, Fixture
+from state import StateStore
+from team_index import TeamIndex
+from title_matcher import get_fixture_start_time
+
+# YouTube Data API cost of each call the pipeline makes
+QUOTA_COSTS = {"playlistItems.list": 1, "videos.list": 1}
+YOUTUBE_DAILY_QUOTA = 10000
+# series_info calls made by the daily fixture extraction
+FIXTURE_EXTRACTION_HITS = 4
+FEED_SIZE = 15
+
+# How long a day's broadcast of a multi-day match runs
+DAY_BROADCAST_DURATION = timedelta(hours=7)
+
+
+@functools.cache
+def registered_competitions() -> dict[str, Competition]:
+    return competitions_by_name(load_competitions())
+
+
+def broadcast_duration(competition: str) -> timedelta:
+    """How long each day's broadcast runs, from the competition's format in competitions.json."""
+    registered = registered_competitions().get(competition)
+    if registered is None or registered.match_days > 1 or not registered.overs:
+        return DAY_BROADCAST_DURATION
+    # Half an hour either side, and about four and a half minutes an over
+    return timedelta(minutes=30 + 9 * registered.overs)
+
+
+@dataclass
+class Policy:
+    """How often polls run and what the caches are assumed to do."""
+    scheduler: str = "cron"
+    interval: timedelta = timedelta(minutes=15)
+    first_hour: int = 8
+    last_hour: int = 20
+    discovery: str = "feeds"
+    # Share of feed fetches that fail and fall back to the uploads playlist
+    feed_failure_rate: float = 0.02
+    # How long before the start a channel schedules its broadcast, and goes live
+    schedule_lead: timedelta = timedelta(hours=12)
+    live_lead: timedelta = timedelta(minutes=15)
+    # Other uploads, like highlights and interviews, per channel per day
+    uploads_per_day: int = 2
+
+
+@dataclass
+class Video:
+    video_id: str
+    channel_id: str
+    title: str
+    published_at: datetime
+    scheduled_start: Optional[datetime] = None
+    actual_start: Optional[datetime] = None
+    actual_end: Optional[datetime] = None
+    match_id: Optional[str] = None
+
+
+@dataclass
+class DayStats:
+    day: date
+    polls: int = 0
+    youtube_units: int = 0
+    cricapi_hits: int = 0
+    broadcasts: int = 0
+    latencies: list[float] = field(default_factory=list)
+    peak_live: int = 0
+    peak_active_channels: int = 0
+
+    def summary(self) -> dict:
+        latencies = sorted(self.latencies)
+        return {
+            "date": self.day.isoformat(),
+            "polls": self.polls,
+            "youtubeUnits": self.youtube_units,
+            "cricapiHits": self.cricapi_hits,
+            "broadcasts": self.broadcasts,
+            "detected": len(latencies),
+            "meanLatencyMinutes": round(statistics.mean(latencies), 1) if latencies else None,
+            "maxLatencyMinutes": round(latencies[-1], 1) if latencies else None,
+            "peakLiveStreams": self.peak_live,
+            "peakActiveChannels": self.peak_active_channels,
+        }
+
+
+class Request:
+    def __init__(self, execute):
+        self._execute = execute
+
+    def execute(self, http=None):
+        return self._execute()
+
+
+class SerialExecutor:
+    """Stands in for the feed fetcher's thread pool, as the stand-in feeds answer instantly."""
+
+    def __init__(self, max_workers=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def map(self, fn, *iterables):
+        return map(fn, *iterables)
+
+
+class StandInYouTube:
+    """Answers the YouTube Data API calls the pipeline makes from simulated videos."""
+
+    def __init__(self, world: "World"):
+        self.world = world
+        self.units = 0
+
+    def playlistItems(self):
+        return self
+
+    def videos(self):
+        return self
+
+    def playlist_page(self, playlist_id: str, offset: int, page_size: int) -> dict:
+        self.units += QUOTA_COSTS["playlistItems.list"]
+        uploads = self.world.uploads(self.world.playlist_channels[playlist_id])
+        page = uploads[offset:offset + page_size]
+        response = {"items": [
+            {"contentDetails": {"videoId": video.video_id, "videoPublishedAt": video.published_at.isoformat()}}
+            for video in page
+        ]}
+        if offset + page_size < len(uploads):
+            response["nextPageToken"] = str(offset + page_size)
+        return response
+
+    def video_details(self, video_ids: list[str]) -> dict:
+        self.units += QUOTA_COSTS["videos.list"]
+        now = clock.now()
+        items = []
+        for video_id in video_ids:
+            video = self.world.videos[video_id]
+            item = {
+                "id": video.video_id,
+                "snippet": {
+                    "title": video.title,
+                    "channelId": video.channel_id,
+                    "description": "",
+                    "publishedAt": video.published_at.isoformat(),
+                },
+            }
+            if video.scheduled_start:
+                details = {"scheduledStartTime": video.scheduled_start.isoformat()}
+                if video.actual_start <= now:
+                    details["actualStartTime"] = video.actual_start.isoformat()
+                if video.actual_end <= now:
+                    details["actualEndTime"] = video.actual_end.isoformat()
+                item["liveStreamingDetails"] = details
+            items.append(item)
+        return {"items": items}
+
+    # Defined last, as it shadows the builtin list in the class body
+    def list(self, part, id=None, playlistId=None, maxResults=50, pageToken=None):
+        if playlistId is not None:
+            return Request(lambda: self.playlist_page(playlistId, int(pageToken or 0), maxResults))
+        return Request(lambda: self.video_details(id.split(",")))
+
+
+class World:
+    """The videos every channel publishes over the season."""
+
+    def __init__(self, channels: dict[str, Channel], policy: Policy, rng: random.Random):
+        self.policy = policy
+        self.rng = rng
+        self.videos: dict[str, Video] = {}
+        # Each channel's videos and their publish times, oldest first
+        self.by_channel: dict[str, list[Video]] = {channel.youtube_channel_id: [] for channel in channels.values()}
+        self.publish_times: dict[str, list[datetime]] = {channel_id: [] for channel_id in self.by_channel}
+        self.playlist_channels = {channel.uploads_playlist_id: channel.youtube_channel_id for channel in channels.values()}
+        self.team_index = TeamIndex(channels, cache_file=None)
+
+    def add(self, video: Video):
+        self.videos[video.video_id] = video
+        times = self.publish_times.setdefault(video.channel_id, [])
+        index = bisect.bisect_right(times, video.published_at)
+        times.insert(index, video.published_at)
+        self.by_channel.setdefault(video.channel_id, []).insert(index, video)
+
+    def add_day(self, day: date, fixtures: list[Fixture]) -> list[Video]:
+        """Publish a day's broadcasts and other uploads, returning the broadcasts."""
+        broadcasts = []
+        for fixture in fixtures:
+            channel = self.team_index.channel(fixture.home_team)
+            start = get_fixture_start_time(fixture, day)
+            if not channel or not start:
+                continue
+            video = Video(
+                video_id=f"{fixture.match_id}:{day.isoformat()}",
+                channel_id=channel.youtube_channel_id,
+                title=f"LIVE: {fixture.home_team} v {fixture.away_team} - {fixture.competition}",
+                published_at=start - self.policy.schedule_lead,
+                scheduled_start=start,
+                actual_start=start - self.policy.live_lead,
+                actual_end=start + broadcast_duration(fixture.competition),
+                match_id=fixture.match_id,
+            )
+            self.add(video)
+            broadcasts.append(video)
+
+        for channel_id in self.by_channel:
+            for i in range(self.policy.uploads_per_day):
+                published_at = datetime.combine(day, time(0, 0), tzinfo=timezone.utc) + timedelta(
+                    minutes=self.rng.randrange(24 * 60)
+                )
+                self.add(Video(
+                    video_id=f"{channel_id}:{day.isoformat()}:upload{i}",
+                    channel_id=channel_id,
+                    title="Highlights and interviews",
+                    published_at=published_at,
+                ))
+        return broadcasts
+
+    def uploads(self, channel_id: str, limit: Optional[int] = None) -> list[Video]:
+        """Videos published on a channel so far, newest first."""
+        published = bisect.bisect_right(self.publish_times.get(channel_id, []), clock.now())
+        oldest = max(published - limit, 0) if limit else 0
+        return self.by_channel.get(channel_id, [])[oldest:published][::-1]
+
+    def fetch_feed(self, channel_id: str, feed_state: dict) -> tuple[list[str], Optional[datetime], dict]:
+        """Stand-in for feeds.fetch_feed: the newest uploads, failing at the assumed rate."""
+        if self.rng.random() < self.policy.feed_failure_rate:
+            raise FeedError("Simulated feed failure")
+        entries = self.uploads(channel_id, FEED_SIZE)
+        video_ids = [video.video_id for video in entries]
+        new_state = {
+            "videoIds": video_ids,
+            "newestPublished": entries[0].published_at.isoformat() if entries else None,
+            "settled": [v for v in feed_state.get("settled", []) if v in video_ids],
+        }
+        return video_ids, entries[0].published_at if entries else None, new_state
+
+
+def live_count(broadcasts: list[Video]) -> int:
+    now = clock.now()
+    return sum(1 for video in broadcasts if video.actual_start <= now < video.actual_end)
+
+
+def poll_times(day: date, policy: Policy) -> list[datetime]:
+    """Times the cron schedule polls on a day."""
+    times = []
+    moment = datetime.combine(day, time(policy.first_hour, 0), tzinfo=timezone.utc)
+    last = datetime.combine(day, time(policy.last_hour, 0), tzinfo=timezone.utc)
+    while moment <= last:
+        times.append(moment)
+        moment += policy.interval
+    return times
+
+
+def simulate(
+    start: date,
+    end: date,
+    policy: Policy,
+    channels: dict[str, Channel],
+    seed: int = 0,
+) -> list[DayStats]:
+    """Replay every day from start to end, returning each day's stats."""
+    rng = random.Random(seed)
+    world = World(channels, policy, rng)
+    youtube = StandInYouTube(world)
+    virtual_clock = VirtualClock(datetime.combine(start, time(0, 0), tzinfo=timezone.utc))
+    days = []
+    previous_streams = {}
+
+    with tempfile.TemporaryDirectory() as state_dir, contextlib.ExitStack() as stack:
+        stack.enter_context(clock.use_clock(virtual_clock))
+        stack.enter_context(patch.object(update_streams, "youtube", youtube))
+        stack.enter_context(patch.object(update_streams, "DISCOVERY_BACKEND", policy.discovery))
+        stack.enter_context(patch.object(update_streams, "_team_index", world.team_index))
+        # Streams found in advance by a real look-ahead run mustn't leak into the simulation
+        stack.enter_context(patch.object(update_streams, "LOOKAHEAD_FILE", Path(state_dir) / "lookahead-streams.json"))
+        stack.enter_context(patch.object(feeds, "fetch_feed", world.fetch_feed))
+        stack.enter_context(patch.object(feeds, "ThreadPoolExecutor", SerialExecutor))
+        store = StateStore(Path(state_dir) / "state.db")
+        stack.callback(store.close)
+        feed_discovery = FeedDiscovery(store)
+        # Feed state carries over between polls in memory, without a write per poll
+        stack.enter_context(patch.object(feed_discovery, "save", lambda: None))
+
+        day = start
+        while day <= end:
+            stats = DayStats(day=day, cricapi_hits=FIXTURE_EXTRACTION_HITS)
+            try:
+                fixtures = update_streams.load_fixtures(day)
+            except ValidationError:
+                fixtures = []
+            broadcasts = world.add_day(day, fixtures)
+            stats.broadcasts = len(broadcasts)
+            detected_at: dict[str, datetime] = {}
+
+            if policy.scheduler == "daemon":
+                virtual_clock.set(datetime.combine(day, time(0, 0), tzinfo=timezone.utc))
+                moments = None
+            else:
+                moments = iter(poll_times(day, policy))
+
+            while True:
+                if moments is not None:
+                    moment = next(moments, None)
+                    if moment is None:
+                        break
+                    virtual_clock.set(moment)
+                elif virtual_clock().date() != day:
+                    break
+
+                units_before = youtube.units
+                live, upcoming = [], []
+                if fixtures:
+                    # Discovery is chatty, and a season prints thousands of polls
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        live, upcoming = update_streams.get_live_streams(fixtures, channels, feed_discovery)
+                        placeholders = update_streams.create_placeholder_streams(fixtures, channels, live, upcoming)
+                    output = update_streams.format_streams_for_output(live, upcoming, placeholders)
+                    streams = {match_id: stream.video_id for match_id, stream in output.streams.items()}
+                else:
+                    streams = {}
+
+                stats.polls += 1
+                stats.youtube_units += youtube.units - units_before
+                stats.peak_live = max(stats.peak_live, live_count(broadcasts))
+                stats.peak_active_channels = max(
+                    stats.peak_active_channels,
+                    len(update_streams.get_active_channel_ids(fixtures, channels))
+                )
+                for video_id in streams.values():
+                    if video_id and video_id not in detected_at:
+                        detected_at[video_id] = virtual_clock()
+                # Each change to streams.json deploys, and scores are fetched for every stream
+                if streams != previous_streams:
+                    stats.cricapi_hits += len(streams)
+                    previous_streams = streams
+
+                if moments is None:
+                    interval = update_streams.next_poll_interval(fixtures, live, upcoming, virtual_clock())
+                    virtual_clock.advance(timedelta(seconds=interval))
+
+            for video in broadcasts:
+                if video.video_id in detected_at:
+                    # Broadcasts are published hours before they start, so latency runs
+                    # from when the stream went live, and is nil if it was found first
+                    live_at = max(video.published_at, video.actual_start)
+                    latency = max(detected_at[video.video_id] - live_at, timedelta(0))
+                    stats.latencies.append(latency.total_seconds() / 60)
+            days.append(stats)
+            day += timedelta(days=1)
+
+    return days
+
+
+def fixture_dates(fixtures_dir: Path = Path("public/data/fixtures")) -> tuple[date, date]:
+    days = sorted(date.fromisoformat(path.stem) for path in fixtures_dir.glob("*.json"))
+    if not days:
+        raise ValueError(f"No fixture files in {fixtures_dir}")
+    return days[0], days[-1]
+
+
+def print_report(days: list[DayStats]):
+    print(f"{'date':<11} {'polls':>5} {'units':>6} {'cricapi':>7} {'streams':>7} {'found':>5} {'mean lat':>8} {'max lat':>7} {'peak live':>9}")
+    for stats in days:
+        row = stats.summary()
+        if not row["broadcasts"] and not row["youtubeUnits"]:
+            continue
+        mean = f"{row['meanLatencyMinutes']:.0f}m" if row["meanLatencyMinutes"] is not None else "-"
+        worst = f"{row['maxLatencyMinutes']:.0f}m" if row["maxLatencyMinutes"] is not None else "-"
+        print(
+            f"{row['date']:<11} {row['polls']:>5} {row['youtubeUnits']:>6} {row['cricapiHits']:>7} "
+            f"{row['broadcasts']:>7} {row['detected']:>5} {mean:>8} {worst:>7} {row['peakLiveStreams']:>9}"
+        )
+
+    units = [stats.youtube_units for stats in days]
+    latencies = [latency for stats in days for latency in stats.latencies]
+    broadcasts = sum(stats.broadcasts for stats in days)
+    print(f"\nDays simulated: {len(days)}")
+    print(f"YouTube units: {sum(units)} total, {max(units)} on the busiest day")
+    print(f"Days over the {YOUTUBE_DAILY_QUOTA} unit quota: {sum(1 for u in units if u > YOUTUBE_DAILY_QUOTA)}")
+    print(f"CricAPI hits: {sum(stats.cricapi_hits for stats in days)} total, {max(stats.cricapi_hits for stats in days)} on the busiest day")
+    print(f"Streams detected: {len(latencies)} of {broadcasts}")
+    if latencies:
+        print(f"Detection latency: {statistics.mean(latencies):.0f} minutes mean, {max(latencies):.0f} minutes worst")
+    print(f"Peak live streams: {max(stats.peak_live for stats in days)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate a season of polling to estimate API usage")
+    parser.add_argument("--start", type=date.fromisoformat, help="First day (YYYY-MM-DD), the first fixture day by default")
+    parser.add_argument("--end", type=date.fromisoformat, help="Last day (YYYY-MM-DD), the last fixture day by default")
+    parser.add_argument("--scheduler", choices=["cron", "daemon"], default="cron", help="Poll on a fixed schedule or the daemon's adaptive interval")
+    parser.add_argument("--interval", type=int, default=15, help="Minutes between cron polls")
+    parser.add_argument("--hours", default="8-20", help="Hours the cron polls between, in UTC")
+    parser.add_argument("--discovery", choices=["feeds", "playlist"], default="feeds", help="Discovery backend")
+    parser.add_argument("--feed-failure-rate", type=float, default=0.02, help="Share of feed fetches that fail")
+    parser.add_argument("--uploads-per-day", type=int, default=2, help="Other uploads per channel per day")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--output", type=Path, help="Also write the per-day results as JSON")
+    args = parser.parse_args()
+
+    first_hour, last_hour = (int(hour) for hour in args.hours.split("-"))
+    policy = Policy(
+        scheduler=args.scheduler,
+        interval=timedelta(minutes=args.interval),
+        first_hour=first_hour,
+        last_hour=last_hour,
+        discovery=args.discovery,
+        feed_failure_rate=args.feed_failure_rate,
+        uploads_per_day=args.uploads_per_day,
+    )
+    first_day, last_day = fixture_dates()
+    days = simulate(args.start or first_day, args.end or last_day, policy, update_streams.load_channels(), args.seed)
+    print_report(days)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump([stats.summary() for stats in days], f, indent=2)
@@ -0,0 +1,362 @@
+import os
+import re
+import json
+from datetime import date
+from pathlib import Path
+from typing import Callable, Optional
+import numpy as np
+import clock
+from cricapi_budget import Priority
+from cricapi_client import CricAPIClient
+from fixture_index import INDEXES_DIR, MANIFEST_FILE
+from models import Competition, MatchDetails
+from state import load_json, save_json
+
+# Committed with the fixtures, so results don't depend on the workflow cache
+RESULTS_FILE = Path("public/data/results.json")
+STANDINGS_FILE = Path("public/data/standings.json")
+# How many missing results are fetched in one run, oldest first
+RESULTS_BACKFILL_LIMIT = int(os.getenv("RESULTS_BACKFILL_LIMIT", "50"))
+
+# How a match finished, as stored in the outcome column
+PENDING, HOME_WIN, AWAY_WIN, TIE, DRAW, NO_RESULT = range(6)
+# Per-team totals, one row each
+STATS = [
+    "played", "won", "lost", "tied", "drawn", "noResult",
+    "bonusPoints", "runsFor", "ballsFaced", "runsAgainst", "ballsBowled",
+]
+(PLAYED, WON, LOST, TIED, DRAWN, NO_RESULTS,
+ BONUS, RUNS_FOR, BALLS_FACED, RUNS_AGAINST, BALLS_BOWLED) = range(len(STATS))
+
+_INNINGS_SUFFIX = re.compile(r"\s+inning(s)?\s*\d*$", re.IGNORECASE)
+
+
+def parse_outcome(status: str, home: str, away: str, resolve: Callable[[str], Optional[str]]) -> int:
+    """Read how a finished match ended from CricAPI's status text, like "Durham won by 6 wkts"."""
+    text = status.lower()
+    if " won" in text:
+        winner = resolve(status[:text.index(" won")].strip())
+        return HOME_WIN if winner == home else AWAY_WIN if winner == away else PENDING
+    if "tied" in text:
+        return TIE
+    if "drawn" in text or "draw" in text:
+        return DRAW
+    if "no result" in text or "abandoned" in text:
+        return NO_RESULT
+    return PENDING
+
+
+def batting_bonus(runs: int) -> int:
+    """Championship batting points: one for 250 runs and one more for every 50 after, up to five."""
+    return int(min(max((runs - 200) // 50, 0), 5))
+
+
+def bowling_bonus(wickets: int) -> int:
+    """Championship bowling points: one for every three wickets, up to three."""
+    return int(min(wickets // 3, 3))
+
+
+class LeagueTable:
+    """A competition's table, computed from its matches held as columns.
+
+    Each match is a row in a set of NumPy arrays: the home and away teams, how
+    it ended, each side's runs and balls for net run rate, and their bonus
+    points. Team totals are summed over every row at once with bincount, and a
+    changed result only subtracts its old row's contribution and adds its new
+    one, rather than going over the whole season again.
+    """
+
+    def __init__(
+        self,
+        competition: Competition,
+        matches: list[tuple[str, str, str]],
+        resolve: Callable[[str], Optional[str]],
+    ):
+        self.competition = competition
+        self.resolve = resolve
+        group_of = {team: name for name, teams in competition.groups.items() for team in teams}
+        rows = []
+        for match_id, home_team, away_team in matches:
+            home, away = resolve(home_team), resolve(away_team)
+            # Matches with teams still to be decided, or between groups like knockouts, aren't in the table
+            if not home or not away or (group_of and (home not in group_of or group_of[home] != group_of.get(away))):
+                continue
+            rows.append((match_id, home, away))
+
+        self.teams = sorted({team for _, home, away in rows for team in (home, away)} | set(group_of))
+        team_numbers = {team: number for number, team in enumerate(self.teams)}
+        group_names = list(competition.groups) or [competition.competition]
+        self.group_names = group_names
+        self.team_groups = np.array(
+            [group_names.index(group_of[team]) if group_of else 0 for team in self.teams],
+            dtype=np.int32,
+        )
+
+        self.match_ids = [match_id for match_id, _, _ in rows]
+        self.rows = {match_id: row for row, match_id in enumerate(self.match_ids)}
+        count = len(rows)
+        self.home = np.array([team_numbers[home] for _, home, _ in rows], dtype=np.int32)
+        self.away = np.array([team_numbers[away] for _, _, away in rows], dtype=np.int32)
+        self.outcome = np.zeros(count, dtype=np.int8)
+        self.home_runs = np.zeros(count, dtype=np.int32)
+        self.home_balls = np.zeros(count, dtype=np.int32)
+        self.away_runs = np.zeros(count, dtype=np.int32)
+        self.away_balls = np.zeros(count, dtype=np.int32)
+        self.home_bonus = np.zeros(count, dtype=np.int32)
+        self.away_bonus = np.zeros(count, dtype=np.int32)
+        self.totals = self._contributions(np.arange(count))
+
+    def _contributions(self, rows: np.ndarray) -> np.ndarray:
+        """Sum what the given matches add to each team's totals."""
+        teams = len(self.teams)
+        home, away, outcome = self.home[rows], self.away[rows], self.outcome[rows]
+
+        def per_team(home_values, away_values):
+            return (
+                np.bincount(home, weights=home_values, minlength=teams)
+                + np.bincount(away, weights=away_values, minlength=teams)
+            )
+
+        finished = outcome != PENDING
+        # Net run rate only counts matches with a result
+        rated = (outcome == HOME_WIN) | (outcome == AWAY_WIN) | (outcome == TIE)
+        home_runs, away_runs = self.home_runs[rows] * rated, self.away_runs[rows] * rated
+        home_balls, away_balls = self.home_balls[rows] * rated, self.away_balls[rows] * rated
+
+        totals = np.zeros((len(STATS), teams))
+        totals[PLAYED] = per_team(finished, finished)
+        totals[WON] = per_team(outcome == HOME_WIN, outcome == AWAY_WIN)
+        totals[LOST] = per_team(outcome == AWAY_WIN, outcome == HOME_WIN)
+        totals[TIED] = per_team(outcome == TIE, outcome == TIE)
+        totals[DRAWN] = per_team(outcome == DRAW, outcome == DRAW)
+        totals[NO_RESULTS] = per_team(outcome == NO_RESULT, outcome == NO_RESULT)
+        totals[BONUS] = per_team(self.home_bonus[rows], self.away_bonus[rows])
+        totals[RUNS_FOR] = per_team(home_runs, away_runs)
+        totals[BALLS_FACED] = per_team(home_balls, away_balls)
+        totals[RUNS_AGAINST] = per_team(away_runs, home_runs)
+        totals[BALLS_BOWLED] = per_team(away_balls, home_balls)
+        return totals
+
+    def _set_row(self, row: int, details: MatchDetails):
+        home, away = self.teams[self.home[row]], self.teams[self.away[row]]
+        outcome = parse_outcome(details.status, home, away, self.resolve) if details.match_ended else PENDING
+        self.outcome[row] = outcome
+
+        # Each side's first innings, and all its runs and balls
+        runs = {home: 0, away: 0}
+        balls = {home: 0, away: 0}
+        first_innings = {}
+        for innings in details.score.innings_list if details.score else []:
+            team = self.resolve(_INNINGS_SUFFIX.sub("", innings.innings_name))
+            if team not in runs:
+                continue
+            whole, part = divmod(round(innings.overs_bowled * 10), 10)
+            innings_balls = whole * 6 + part
+            # A side that's bowled out is taken to have faced its full overs
+            if self.competition.overs and innings.wickets_fallen >= 10:
+                innings_balls = self.competition.overs * 6
+            runs[team] += innings.runs_scored
+            balls[team] += innings_balls
+            first_innings.setdefault(team, innings)
+
+        self.home_runs[row], self.home_balls[row] = runs[home], balls[home]
+        self.away_runs[row], self.away_balls[row] = runs[away], balls[away]
+        if self.competition.bonus_points and outcome != PENDING:
+            for team, opponent, column in ((home, away, self.home_bonus), (away, home, self.away_bonus)):
+                batting = first_innings.get(team)
+                bowling = first_innings.get(opponent)
+                column[row] = (
+                    (batting_bonus(batting.runs_scored) if batting else 0)
+                    + (bowling_bonus(bowling.wickets_fallen) if bowling else 0)
+                )
+        else:
+            self.home_bonus[row] = self.away_bonus[row] = 0
+
+    def load_results(self, results: dict[str, MatchDetails]):
+        """Fill in every known result, and total the table from scratch."""
+        for match_id, details in results.items():
+            if match_id in self.rows:
+                self._set_row(self.rows[match_id], details)
+        self.totals = self._contributions(np.arange(len(self.match_ids)))
+
+    def update_result(self, match_id: str, details: MatchDetails) -> bool:
+        """Apply one match's latest result, returning whether it's in this table."""
+        if match_id not in self.rows:
+            return False
+        row = np.array([self.rows[match_id]])
+        self.totals -= self._contributions(row)
+        self._set_row(row[0], details)
+        self.totals += self._contributions(row)
+        return True
+
+    def points(self) -> np.ndarray:
+        rules = self.competition.points
+        return (
+            self.totals[WON] * rules.get("win", 0)
+            + self.totals[TIED] * rules.get("tie", 0)
+            + self.totals[DRAWN] * rules.get("draw", 0)
+            + self.totals[NO_RESULTS] * rules.get("noResult", 0)
+            + self.totals[BONUS]
+        )
+
+    def net_run_rate(self) -> np.ndarray:
+        """Runs scored per over less runs conceded per over, with balls counted in sixes."""
+        totals = self.totals
+        scored = np.divide(totals[RUNS_FOR] * 6, totals[BALLS_FACED], out=np.zeros(len(self.teams)), where=totals[BALLS_FACED] > 0)
+        conceded = np.divide(totals[RUNS_AGAINST] * 6, totals[BALLS_BOWLED], out=np.zeros(len(self.teams)), where=totals[BALLS_BOWLED] > 0)
+        return scored - conceded
+
+    def positions(self) -> np.ndarray:
+        """Rank the teams within their groups by points, then net run rate, then name."""
+        points, net_run_rate = self.points(), self.net_run_rate()
+        # lexsort sorts by the last key first
+        order = np.lexsort((np.arange(len(self.teams)), -net_run_rate, -points, self.team_groups))
+        groups = self.team_groups[order]
+        group_starts = np.searchsorted(groups, groups)
+        positions = np.empty(len(self.teams), dtype=np.int32)
+        positions[order] = np.arange(len(self.teams)) - group_starts + 1
+        return positions
+
+    def to_json(self) -> dict:
+        """The table in a compact form: field names once, then a row of values per team."""
+        fields = ["team", "played", "won", "lost"]
+        columns = [WON, LOST]
+        if self.competition.match_days > 1:
+            fields += ["drawn"]
+            columns += [DRAWN]
+        fields += ["tied", "noResult"]
+        columns += [TIED, NO_RESULTS]
+        if self.competition.bonus_points:
+            fields += ["bonusPoints"]
+            columns += [BONUS]
+        fields += ["points"]
+        if self.competition.overs:
+            fields += ["netRunRate"]
+
+        points, net_run_rate, positions = self.points(), self.net_run_rate(), self.positions()
+        groups = {}
+        for team_number in np.argsort(positions, kind="stable"):
+            row = [self.teams[team_number], int(self.totals[PLAYED, team_number])]
+            row += [int(self.totals[column, team_number]) for column in columns]
+            row += [int(points[team_number])]
+            if self.competition.overs:
+                row += [round(float(net_run_rate[team_number]), 3)]
+            groups.setdefault(self.group_names[self.team_groups[team_number]], []).append(row)
+        return {
+            "fields": fields,
+            "groups": {name: groups.get(name, []) for name in self.group_names},
+        }
+
+
+def read_matches_index(indexes_dir: Path = INDEXES_DIR) -> Optional[dict]:
+    manifest = load_json(indexes_dir / MANIFEST_FILE, {})
+    if "matches" not in manifest:
+        return None
+    with open(indexes_dir / manifest["matches"]) as f:
+        return json.load(f)
+
+
+def load_matches_index(indexes_dir: Path = INDEXES_DIR) -> dict[str, list[tuple[str, str, str]]]:
+    """Get each competition's matches, as match ID, home team and away team, from the fixture indexes."""
+    index = read_matches_index(indexes_dir)
+    if index is None:
+        return {}
+    fields = index["fields"]
+    competition, home_team, away_team = (fields.index(name) for name in ("competition", "homeTeam", "awayTeam"))
+    matches = {}
+    for match_id, values in index["matches"].items():
+        matches.setdefault(values[competition], []).append((match_id, values[home_team], values[away_team]))
+    return matches
+
+
+def load_results(results_file: Path = RESULTS_FILE) -> dict[str, MatchDetails]:
+    return {
+        match_id: MatchDetails(**details)
+        for match_id, details in load_json(results_file, {}).items()
+    }
+
+
+def save_results(results: dict[str, MatchDetails], results_file: Path = RESULTS_FILE):
+    save_json(results_file, {
+        match_id: details.model_dump(by_alias=True, mode="json")
+        for match_id, details in sorted(results.items())
+    })
+
+
+def missing_results(
+    competitions: list[Competition],
+    results: dict[str, MatchDetails],
+    today: date,
+    indexes_dir: Path = INDEXES_DIR,
+) -> list[str]:
+    """Matches in a table that were due to finish before today but have no result, oldest first."""
+    index = read_matches_index(indexes_dir)
+    if index is None:
+        return []
+    fields = index["fields"]
+    competition, end_date = fields.index("competition"), fields.index("endDate")
+    names = {c.competition for c in competitions if c.points}
+    missing = [
+        (values[end_date], match_id)
+        for match_id, values in index["matches"].items()
+        if values[competition] in names
+        and values[end_date] and values[end_date] < today.isoformat()
+        and not (match_id in results and results[match_id].match_ended)
+    ]
+    return [match_id for _, match_id in sorted(missing)]
+
+
+def backfill_results(
+    client: CricAPIClient,
+    results: dict[str, MatchDetails],
+    limit: int = RESULTS_BACKFILL_LIMIT,
+    indexes_dir: Path = INDEXES_DIR,
+) -> int:
+    """Fetch the results of finished matches that weren't recorded while they were being played.
+
+    Results are only added as matches end during a deploy, so this covers
+    matches from before then and any a deploy missed. They're fetched with
+    fixture priority, so live scores keep their share of the budget.
+    """
+    added = 0
+    for match_id in missing_results(client.competitions, results, clock.today(), indexes_dir)[:limit]:
+        details = client.get_match_details(match_id, Priority.FIXTURES)
+        if details.match_ended:
+            results[match_id] = details
+            added += 1
+    return added
+
+
+def build_tables(
+    competitions: list[Competition],
+    matches: dict[str, list[tuple[str, str, str]]],
+    results: dict[str, MatchDetails],
+    resolve: Callable[[str], Optional[str]],
+) -> dict[str, LeagueTable]:
+    """Build a table for each competition that awards points, with every known result."""
+    tables = {}
+    for competition in competitions:
+        name = competition.competition
+        if not competition.points or name in tables:
+            continue
+        table = LeagueTable(competition, matches.get(name, []), resolve)
+        table.load_results(results)
+        tables[name] = table
+    return tables
+
+
+def write_standings(tables: dict[str, LeagueTable], standings_file: Path = STANDINGS_FILE):
+    standings = {
+        "lastUpdated": clock.now().isoformat(),
+        "competitions": {name: table.to_json() for name, table in sorted(tables.items())},
+    }
+    with open(standings_file, "w") as f:
+        json.dump(standings, f, separators=(",", ":"))
+
+
+if __name__ == "__main__":
+    client = CricAPIClient()
+    results = load_results()
+    print(f"Backfilled {backfill_results(client, results)} match results")
+    save_results(results)
+    client.budget.report()
@@ -0,0 +1,197 @@
+import os
+import json
+import atexit
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Generic, Iterable, Iterator, Optional, TypeVar
+import clock
+
+# Directory for caches and run state that persist between runs but aren't published
+STATE_DIR = Path(os.getenv("STATE_DIR", ".state"))
+# Database holding the caches that are read and written an entry at a time
+STATE_DB = STATE_DIR / "state.db"
+
+T = TypeVar("T")
+
+
+def load_json(path: Path, default: Any = None) -> Any:
+    """Load a JSON state file, falling back to a default if it's missing or corrupt."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return default
+
+
+def save_json(path: Path, data: Any, mode: Optional[int] = None):
+    """Atomically write a JSON state file, so readers never see a partial write.
+
+    If a mode is given, the file is created with it before anything is written,
+    rather than having its permissions tightened afterwards.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = path.with_suffix(path.suffix + ".tmp")
+    if mode is None:
+        f = open(tmp_file, "w")
+    else:
+        # A leftover temporary file would keep its own permissions, so start afresh
+        tmp_file.unlink(missing_ok=True)
+        f = os.fdopen(os.open(tmp_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY, mode), "w")
+    with f:
+        json.dump(data, f, indent=2, sort_keys=True, default=str)
+    tmp_file.replace(path)
+
+
+class Namespace(Generic[T]):
+    """One namespace of a StateStore: a map of string keys to JSON values.
+
+    Entries can expire after a TTL, and a namespace can be capped at a number
+    of entries, in which case the ones written longest ago are evicted first.
+    """
+
+    def __init__(self, store: "StateStore", name: str, ttl: Optional[timedelta] = None, max_entries: Optional[int] = None):
+        self.store = store
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+    def get(self, key: str, default: Optional[T] = None) -> Optional[T]:
+        return self.get_many([key]).get(key, default)
+
+    def get_many(self, keys: Iterable[str]) -> dict[str, T]:
+        """Get the unexpired values of the keys that have one."""
+        keys = list(keys)
+        values = {}
+        # SQLite limits how many parameters a statement can have
+        for i in range(0, len(keys), 500):
+            batch = keys[i:i + 500]
+            rows = self.store.execute(
+                f"SELECT key, value FROM entries WHERE namespace = ? AND key IN ({','.join('?' * len(batch))})"
+                " AND (expires_at IS NULL OR expires_at > ?)",
+                (self.name, *batch, clock.now().timestamp()),
+            )
+            values.update((key, json.loads(value)) for key, value in rows)
+        return values
+
+    def items(self) -> dict[str, T]:
+        """Get every unexpired entry."""
+        rows = self.store.execute(
+            "SELECT key, value FROM entries WHERE namespace = ? AND (expires_at IS NULL OR expires_at > ?) ORDER BY key",
+            (self.name, clock.now().timestamp()),
+        )
+        return {key: json.loads(value) for key, value in rows}
+
+    def set(self, key: str, value: T, ttl: Optional[timedelta] = None):
+        self.set_many({key: value}, ttl)
+
+    def set_many(self, values: dict[str, T], ttl: Optional[timedelta] = None):
+        """Write several entries in one transaction, then drop expired and evicted ones."""
+        if not values:
+            return
+        now = clock.now().timestamp()
+        ttl = ttl or self.ttl
+        expires_at = now + ttl.total_seconds() if ttl else None
+        rows = [
+            (self.name, key, json.dumps(value, separators=(",", ":"), default=str), expires_at, now)
+            for key, value in values.items()
+        ]
+        with self.store.transaction() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO entries (namespace, key, value, expires_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            connection.execute(
+                "DELETE FROM entries WHERE namespace = ? AND expires_at <= ?", (self.name, now)
+            )
+            if self.max_entries is not None:
+                connection.execute(
+                    "DELETE FROM entries WHERE namespace = ? AND key IN ("
+                    " SELECT key FROM entries WHERE namespace = ? ORDER BY updated_at DESC, key LIMIT -1 OFFSET ?)",
+                    (self.name, self.name, self.max_entries),
+                )
+
+    def delete(self, key: str):
+        with self.store.transaction() as connection:
+            connection.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (self.name, key))
+
+    def clear(self):
+        with self.store.transaction() as connection:
+            connection.execute("DELETE FROM entries WHERE namespace = ?", (self.name,))
+
+
+class StateStore:
+    """Caches and run state in one SQLite database, shared by every script.
+
+    The database runs in WAL mode, so readers never block the writer, and
+    writes from overlapping runs wait their turn rather than failing. Entries
+    live in one table keyed by namespace and key, with values stored as JSON.
+    It's a single file once closed, so it can be carried between CI runs with
+    the rest of the state directory.
+    """
+
+    def __init__(self, path: Path = STATE_DB, timeout: float = 30):
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit, with transactions begun explicitly, and one connection shared by the threads
+        self.connection = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self.lock = threading.RLock()
+        with self.lock:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+                " expires_at REAL, updated_at REAL NOT NULL,"
+                " PRIMARY KEY (namespace, key)) WITHOUT ROWID"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS entries_by_age ON entries (namespace, updated_at)")
+
+    def namespace(self, name: str, ttl: Optional[timedelta] = None, max_entries: Optional[int] = None) -> Namespace:
+        return Namespace(self, name, ttl, max_entries)
+
+    def execute(self, sql: str, parameters: tuple = ()) -> list[tuple]:
+        with self.lock:
+            return self.connection.execute(sql, parameters).fetchall()
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Hold the write lock for a block of statements, committing them together."""
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.connection
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+            self.connection.execute("COMMIT")
+
+    def namespaces(self) -> dict[str, int]:
+        """Count the entries in each namespace, expired ones included."""
+        return dict(self.execute("SELECT namespace, COUNT(*) FROM entries GROUP BY namespace ORDER BY namespace"))
+
+    def close(self):
+        """Close the database, folding the write-ahead log back into it."""
+        with self.lock:
+            self.connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self.connection.close()
+
+
+_stores: dict[Path, StateStore] = {}
+
+
+def get_store(path: Optional[Path] = None) -> StateStore:
+    """Get the state store shared within this process, opening it on first use."""
+    path = path or STATE_DB
+    if path not in _stores:
+        _stores[path] = StateStore(path)
+    return _stores[path]
+
+
+@atexit.register
+def close_stores():
+    for store in _stores.values():
+        store.close()
+    _stores.clear()
@@ -0,0 +1,150 @@
+import os
+import re
+import json
+import hashlib
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+from models import Channel
+from state import STATE_DIR, load_json, save_json
+
+TEAM_INDEX_FILE = STATE_DIR / "team-names.json"
+# How similar a name's trigrams must be to an alias's to count as the same team
+TEAM_MATCH_THRESHOLD = float(os.getenv("TEAM_MATCH_THRESHOLD", "0.5"))
+
+_NON_ALPHANUMERIC = re.compile(r"[^a-z0-9]+")
+# Words that say which side or club it is, rather than which county
+NOISE_WORDS = {"the", "ccc", "cc", "county", "cricket", "club", "women", "womens", "2nd", "second", "xi"}
+
+
+def normalize_team_name(name: str) -> str:
+    """Reduce a team name to the words that identify the county."""
+    words = _NON_ALPHANUMERIC.sub(" ", name.lower()).split()
+    kept = [word for word in words if word not in NOISE_WORDS]
+    return " ".join(kept or words)
+
+
+def trigrams(text: str) -> set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(a: set[str], b: set[str]) -> float:
+    """Jaccard similarity of two trigram sets."""
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared) if shared else 0.0
+
+
+class TeamIndex:
+    """Resolves team names from CricAPI and elsewhere to channels.json entries.
+
+    Every name, nickname and abbreviation is indexed by its trigrams when the
+    index is built. A name that isn't an exact alias is compared only with the
+    aliases sharing a trigram with it, and resolves to the most similar one if
+    it's above the threshold and one of its words is close to a word that only
+    that channel's aliases use, so "Team C" doesn't become "Team A" on the
+    strength of "Team". Fuzzy results, including names that couldn't be
+    resolved, are memoized to disk until the aliases change.
+    """
+
+    def __init__(
+        self,
+        channels: dict[str, Channel],
+        cache_file: Optional[Path] = TEAM_INDEX_FILE,
+        threshold: float = TEAM_MATCH_THRESHOLD,
+    ):
+        self.channels = channels
+        self.cache_file = cache_file
+        self.threshold = threshold
+        self.aliases: dict[str, str] = {}
+        for key, channel in channels.items():
+            for name in (key, channel.name, *channel.nicknames, channel.abbr, channel.abbr3):
+                if name:
+                    self.aliases.setdefault(normalize_team_name(name), key)
+
+        self.alias_trigrams: dict[str, set[str]] = {}
+        self.trigram_index: dict[str, list[str]] = {}
+        for alias in self.aliases:
+            self.alias_trigrams[alias] = trigrams(alias)
+            for trigram in self.alias_trigrams[alias]:
+                self.trigram_index.setdefault(trigram, []).append(alias)
+
+        # Words used by only one channel's aliases, which tell the teams apart
+        word_keys: dict[str, set[str]] = {}
+        for alias, key in self.aliases.items():
+            for word in alias.split():
+                word_keys.setdefault(word, set()).add(key)
+        self.distinctive_words = {word: trigrams(word) for word, keys in word_keys.items() if len(keys) == 1}
+
+        self.fingerprint = hashlib.sha256(
+            json.dumps({"aliases": self.aliases, "threshold": threshold}, sort_keys=True).encode()
+        ).hexdigest()
+        cached = load_json(cache_file, {}) if cache_file else {}
+        self.resolved: dict[str, Optional[str]] = (
+            cached.get("resolved", {}) if cached.get("fingerprint") == self.fingerprint else {}
+        )
+        self.unresolved: set[str] = {name for name, key in self.resolved.items() if key is None}
+        # Every name looked up so far, as the same few names are resolved over and over
+        self.lookups: dict[str, Optional[str]] = dict(self.resolved)
+
+    def resolve(self, name: str) -> Optional[str]:
+        """Get the channels.json key for a team name, or None if nothing is close."""
+        if name in self.lookups:
+            return self.lookups[name]
+
+        normalized = normalize_team_name(name)
+        if normalized in self.aliases:
+            key = self.aliases[normalized]
+        else:
+            key = self.fuzzy_match(normalized)
+            if key:
+                print(f"Matched team name {name!r} to {key}")
+            else:
+                print(f"Could not match team name {name!r} to a channel")
+                self.unresolved.add(name)
+            self.resolved[name] = key
+            self.save()
+        self.lookups[name] = key
+        return key
+
+    def fuzzy_match(self, normalized: str) -> Optional[str]:
+        """Find the alias with the most similar trigrams that shares a distinctive word, if it's above the threshold."""
+        name_trigrams = trigrams(normalized)
+        word_trigrams = [trigrams(word) for word in normalized.split()]
+        shared = Counter()
+        for trigram in name_trigrams:
+            shared.update(self.trigram_index.get(trigram, ()))
+        best_alias = None
+        best_similarity = 0.0
+        for alias, count in sorted(shared.items()):
+            # Jaccard similarity of the two trigram sets
+            alias_similarity = count / (len(name_trigrams) + len(self.alias_trigrams[alias]) - count)
+            if alias_similarity > best_similarity and self.shares_distinctive_word(word_trigrams, alias):
+                best_alias, best_similarity = alias, alias_similarity
+        if best_alias is None or best_similarity < self.threshold:
+            return None
+        return self.aliases[best_alias]
+
+    def shares_distinctive_word(self, word_trigrams: list[set[str]], alias: str) -> bool:
+        """Whether one of a name's words is close to a word only this alias's channel uses."""
+        return any(
+            similarity(word, self.distinctive_words[alias_word]) >= self.threshold
+            for alias_word in alias.split()
+            if alias_word in self.distinctive_words
+            for word in word_trigrams
+        )
+
+    def channel(self, name: str) -> Optional[Channel]:
+        key = self.resolve(name)
+        return self.channels[key] if key else None
+
+    def report(self) -> dict:
+        """Summarize the names that were resolved fuzzily and the ones that weren't."""
+        return {
+            "resolved": {name: key for name, key in sorted(self.resolved.items()) if key},
+            "unresolved": sorted(self.unresolved),
+        }
+
+    def save(self):
+        if self.cache_file:
+            save_json(self.cache_file, {"fingerprint": self.fingerprint, "resolved": self.resolved})
@@ -1,7 +1,13 @@
 import pytest
 import os
 import sys
+import tempfile
 from pathlib import Path
+
+# The scripts read STATE_DIR when they're imported, so point it somewhere
+# disposable before any are, to keep their state files out of the working tree
+os.environ["STATE_DIR"] = tempfile.mkdtemp(prefix="cricket-state-")
+
 from .fixtures import (
     MOCK_EXISTING_STREAMS,
     MOCK_YOUTUBE_RESPONSE
@@ -9,7 +15,7 @@ from .fixtures import (
 from datetime import datetime, timezone, timedelta
 from unittest.mock import patch
 from script.models import (
-    Channel, Fixture, StreamInfo, StreamsData, CompetitionType,
+    Channel, Fixture, StreamInfo, StreamsData,
     MatchDetails, MatchScore, InningsScore
 )
 
@@ -40,6 +46,13 @@ def setup_test_environment():
     # Clean up after tests if needed
     pass
 
+@pytest.fixture(autouse=True)
+def isolated_team_index():
+    """Forget the team names one test memoized before the next one runs."""
+    yield
+    from script.team_index import TEAM_INDEX_FILE
+    TEAM_INDEX_FILE.unlink(missing_ok=True)
+
 @pytest.fixture
 def mock_env():
     with patch.dict('os.environ', {'CRICKET_API_KEY': 'test_key'}):
@@ -70,7 +83,7 @@ def mock_fixtures():
     return [
         Fixture(
             match_id="match1",
-            competition=CompetitionType.COUNTY_CHAMPIONSHIP_DIV_ONE,
+            competition="County Championship Division One",
             home_team="Team A",
             away_team="Team B",
             start_date=now.date(),
@@ -80,7 +93,7 @@ def mock_fixtures():
         ),
         Fixture(
             match_id="match2",
-            competition=CompetitionType.COUNTY_CHAMPIONSHIP_DIV_ONE,
+            competition="County Championship Division One",
             home_team="Team B",
             away_team="Team C",
             start_date=now.date(),
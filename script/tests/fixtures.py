@@ -1,7 +1,7 @@
 """Mock data fixtures for testing."""
 
 from datetime import datetime, timezone, timedelta
-from script.models import Channel, Fixture, StreamInfo, StreamsData, CompetitionType
+from script.models import Channel, Fixture, StreamInfo, StreamsData
 
 # Mock channel data
 MOCK_CHANNELS = {
@@ -24,7 +24,7 @@ today = datetime.now(timezone.utc).date()
 MOCK_FIXTURES = [
     Fixture(
         match_id="match1",
-        competition=CompetitionType.COUNTY_CHAMPIONSHIP_DIV_ONE,
+        competition="County Championship Division One",
         home_team="Team A",
         away_team="Team C",
         start_date=today,
@@ -34,7 +34,7 @@ MOCK_FIXTURES = [
     ),
     Fixture(
         match_id="match2",
-        competition=CompetitionType.COUNTY_CHAMPIONSHIP_DIV_ONE,
+        competition="County Championship Division One",
         home_team="Team B",
         away_team="Team D",
         start_date=today,
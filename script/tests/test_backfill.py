@@ -0,0 +1,80 @@
+from datetime import date, datetime, timezone
+from unittest.mock import patch
+from script.backfill import match_replays, merge_replays
+from script.models import Fixture
+from script.update_streams import iter_playlist_items
+
+def make_fixture(match_id, start_time_gmt="11:00"):
+    return Fixture(
+        match_id=match_id,
+        competition="One-Day Cup",
+        home_team="Team A",
+        away_team="Team B",
+        start_date=date(2025, 6, 1),
+        end_date=date(2025, 6, 1),
+        start_time_gmt=start_time_gmt,
+        venue="Ground 1"
+    )
+
+def make_video(video_id, actual_start):
+    return {
+        "id": video_id,
+        "snippet": {"title": f"Stream {video_id}", "channelId": "channel1"},
+        "liveStreamingDetails": {"actualStartTime": actual_start},
+    }
+
+@patch("script.update_streams.youtube")
+def test_iter_playlist_items_stops_at_cutoff(mock_youtube):
+    """Test that scanning follows pages but stops at the first page past the cutoff."""
+    def page(*items, token=None):
+        response = {"items": [
+            {"contentDetails": {"videoId": video_id, "videoPublishedAt": published}}
+            for video_id, published in items
+        ]}
+        if token:
+            response["nextPageToken"] = token
+        return response
+
+    list_call = mock_youtube.playlistItems.return_value.list
+    list_call.return_value.execute.side_effect = [
+        page(("video1", "2025-06-03T10:00:00Z"), token="page2"),
+        page(("video2", "2025-06-02T10:00:00Z"), ("video3", "2025-05-01T10:00:00Z"), token="page3"),
+        page(("video4", "2025-04-01T10:00:00Z")),
+    ]
+
+    items = list(iter_playlist_items("playlist1", datetime(2025, 6, 1, tzinfo=timezone.utc)))
+    assert [video_id for video_id, _ in items] == ["video1", "video2"]
+    assert list_call.call_count == 2
+    assert list_call.call_args.kwargs["pageToken"] == "page2"
+
+def test_match_replays_picks_nearest_stream_for_double_header():
+    """Test each fixture of a double-header gets the stream nearest its start."""
+    fixtures = [make_fixture("match1", "10:00"), make_fixture("match2", "15:00")]
+    items = [
+        make_video("video1", "2025-06-01T09:55:00Z"),
+        make_video("video2", "2025-06-01T14:58:00Z"),
+        make_video("video3", "2025-06-02T10:00:00Z"),  # Outside the range
+        {"id": "video4", "snippet": {"title": "Highlights", "channelId": "channel1"}},
+    ]
+
+    replays = match_replays(items, fixtures, date(2025, 6, 1), date(2025, 6, 1))
+    assert {match_id: [r.video_id for r in rs] for match_id, rs in replays.items()} == {
+        "match1": ["video1"],
+        "match2": ["video2"],
+    }
+    assert replays["match1"][0].match_date == date(2025, 6, 1)
+
+def test_merge_replays_keeps_days_from_earlier_ranges():
+    """Test that backfilling a multi-day match a day at a time keeps every day's replay."""
+    fixture = make_fixture("match1").model_copy(update={"end_date": date(2025, 6, 3)})
+    items = [
+        make_video("day1", "2025-06-01T11:00:00Z"),
+        make_video("day2", "2025-06-02T11:00:00Z"),
+        make_video("day2-restart", "2025-06-02T11:05:00Z"),
+    ]
+    replays = {}
+    merge_replays(replays, match_replays(items[1:2], [fixture], date(2025, 6, 2), date(2025, 6, 3)))
+    merge_replays(replays, match_replays(items[:1], [fixture], date(2025, 6, 1), date(2025, 6, 1)))
+    # An overlapping range replaces only the days it covers
+    merge_replays(replays, match_replays(items[2:], [fixture], date(2025, 6, 2), date(2025, 6, 2)))
+    assert [(r.match_date.day, r.video_id) for r in replays["match1"]] == [(1, "day1"), (2, "day2-restart")]
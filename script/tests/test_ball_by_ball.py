@@ -0,0 +1,91 @@
+import json
+import sys
+from datetime import date, datetime, timezone
+from unittest.mock import MagicMock, patch
+from script.state import StateStore
+# Models and the client come from cricapi_client so they're the same classes it builds
+from script.cricapi_client import BallByBall, CricAPIClient, Fixture, HitBudget, StreamsData, clock
+
+def delivery(n, over, ball, batter, bowler, runs=0, innings=0, **extra):
+    return {
+        "n": n, "inning": innings, "over": over, "ball": ball,
+        "batsman": {"name": batter}, "bowler": {"name": bowler}, "runs": runs, **extra,
+    }
+
+BALLS = [
+    delivery(1, 0, 1, "Crawley", "Archer", 4),
+    delivery(2, 0, 2, "Crawley", "Archer", 0, penalty="wide", extras=1),
+    delivery(3, 0, 2, "Crawley", "Archer", 1),
+    delivery(4, 0, 3, "Compton", "Archer", 0, dismissal="caught"),
+    delivery(5, 1, 1, "Bell-Drummond", "Jordan", 2),
+    delivery(6, 1, 2, "Crawley", "Jordan", 0, penalty="legbye", extras=1),
+    delivery(7, 1, 3, "Bell-Drummond", "Jordan", 0, dismissal="run out"),
+]
+
+def test_ingest_applies_only_new_deliveries(tmp_path):
+    """Test that each poll logs only the deliveries since the last, and keeps the same summary as a rebuild."""
+    ball_by_ball = BallByBall(tmp_path / "logs", StateStore(tmp_path / "state.db"))
+    ball_by_ball.ingest("m1", BALLS[:3], "a")
+    module = sys.modules[BallByBall.__module__]
+    with patch.object(module, "parse_delivery", wraps=module.parse_delivery) as parse:
+        summary = ball_by_ball.ingest("m1", BALLS, "b")
+        assert parse.call_count == 4
+    # The same payload again adds nothing
+    assert ball_by_ball.ingest("m1", BALLS, "b") == summary
+    assert len(ball_by_ball.log_file("m1").read_text().splitlines()) == 7
+    assert summary == ball_by_ball.rebuild("m1")
+
+    assert [(batter.name, batter.runs, batter.balls) for batter in summary.batters] == [("Crawley", 5, 3)]
+    assert (summary.bowler.name, summary.bowler.overs, summary.bowler.runs, summary.bowler.wickets) == ("Jordan", "0.3", 2, 0)
+    assert summary.last_over == ["4", "1wd", "1", "W"]
+    assert summary.this_over == ["2", "1lb", "W"]
+    assert summary.fall_of_wickets == ["6-1 (Compton, 0.3)", "9-2 (Bell-Drummond, 1.3)"]
+
+    # A new innings starts its summary afresh
+    summary = ball_by_ball.ingest("m1", BALLS + [delivery(8, 0, 1, "Pope", "Stevens", 6, innings=1)], "c")
+    assert [batter.name for batter in summary.batters] == ["Pope"]
+    assert summary.fall_of_wickets == [] and summary.last_over == []
+
+def test_only_live_matches_with_a_new_score_are_fetched(tmp_path, mock_env):
+    """Test that ball-by-ball is fetched for matches in play, and not again until their score moves."""
+    day = date(2025, 6, 1)
+    fixtures = [
+        Fixture(match_id=match_id, competition="T20 Blast", home_team="Kent", away_team="Surrey",
+                start_date=day, end_date=day, start_time_gmt="18:30", venue="Canterbury")
+        for match_id in ("live", "finished")
+    ]
+    fixtures_dir = tmp_path / "fixtures"
+    fixtures_dir.mkdir()
+    (fixtures_dir / "2025-06-01.json").write_text(json.dumps([fixture.model_dump(mode="json", by_alias=True) for fixture in fixtures]))
+    streams = StreamsData(lastUpdated=datetime(2025, 6, 1, tzinfo=timezone.utc), streams={
+        match_id: {"videoId": None, "title": "Kent vs Surrey", "channelId": "channel1", "standardTitle": "Kent vs Surrey"}
+        for match_id in ("live", "finished")
+    })
+    runs = {"value": 10}
+
+    def get(url, params, timeout):
+        if url.endswith("match_bbb"):
+            return MagicMock(json=lambda: {"status": "success", "data": {"bbb": BALLS}})
+        ended = params["id"] == "finished"
+        return MagicMock(json=lambda: {"status": "success", "data": {
+            "status": "Kent won" if ended else "In progress", "matchStarted": True, "matchEnded": ended,
+            "score": [{"inning": "Kent Inning 1", "r": runs["value"], "w": 2, "o": 1.3}],
+        }})
+
+    client = CricAPIClient(
+        budget=HitBudget(usage_file=None),
+        competitions=[],
+        ball_by_ball=BallByBall(tmp_path / "logs", StateStore(tmp_path / "state.db")),
+    )
+    with clock.use_clock(clock.VirtualClock(datetime(2025, 6, 1, 19, 0, tzinfo=timezone.utc))), \
+            patch("script.cricapi_client.requests.get", side_effect=get) as mock_get:
+        matches = client.generate_matches_data(streams, fixtures_dir)
+        client.generate_matches_data(streams, fixtures_dir)
+        runs["value"] = 14
+        client.generate_matches_data(streams, fixtures_dir)
+
+    bbb_calls = [call for call in mock_get.call_args_list if call.args[0].endswith("match_bbb")]
+    assert [call.kwargs["params"]["id"] for call in bbb_calls] == ["live", "live"]
+    by_id = {match.match_id: match for match in matches.competitions["T20 Blast"].matches_list}
+    assert by_id["finished"].live is None
+    assert by_id["live"].live.this_over == ["2", "1lb", "W"]
@@ -0,0 +1,66 @@
+import json
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch, MagicMock
+from script.bluesky import HandleCache, StateStore, clock, login, prewarm_handle_cache
+
+def test_handle_cache_resolves_misses_once(tmp_path):
+    """Test that resolved handles are persisted and reused."""
+    resolver = MagicMock(side_effect=lambda handle: f"did:plc:{handle.split('.')[0]}")
+    cache = HandleCache(StateStore(tmp_path / "state.db"), resolver=resolver)
+    assert cache.resolve_many(["a.bsky.social", "b.bsky.social", "a.bsky.social"]) == {
+        "a.bsky.social": "did:plc:a",
+        "b.bsky.social": "did:plc:b",
+    }
+    assert resolver.call_count == 2
+
+    cache = HandleCache(StateStore(tmp_path / "state.db"), resolver=resolver)
+    assert cache.resolve_many(["a.bsky.social"]) == {"a.bsky.social": "did:plc:a"}
+    assert resolver.call_count == 2
+
+def test_handle_cache_expires_entries(tmp_path):
+    """Test that entries older than the TTL are resolved again."""
+    virtual_clock = clock.VirtualClock(datetime(2025, 6, 1, tzinfo=timezone.utc))
+    with clock.use_clock(virtual_clock):
+        cache = HandleCache(StateStore(tmp_path / "state.db"), ttl=timedelta(days=1), resolver=lambda handle: "did:plc:old")
+        cache.resolve_many(["a.bsky.social"])
+
+        virtual_clock.advance(timedelta(days=2))
+        cache.resolver = lambda handle: "did:plc:new"
+        assert cache.get("a.bsky.social") is None
+        assert cache.resolve_many(["a.bsky.social"]) == {"a.bsky.social": "did:plc:new"}
+
+def test_prewarm_handle_cache(tmp_path):
+    """Test pre-warming the cache from channels.json, skipping unresolvable handles."""
+    channels_file = tmp_path / "channels.json"
+    channels_file.write_text(json.dumps({
+        "A": {"name": "A CCC", "blueskyHandle": "a.bsky.social"},
+        "B": {"name": "B CCC", "blueskyHandle": "b.bsky.social"},
+        "C": {"name": "C CCC"},
+    }))
+    resolver = lambda handle: "did:plc:a" if handle == "a.bsky.social" else None
+    cache = HandleCache(StateStore(tmp_path / "state.db"), resolver=resolver)
+    assert prewarm_handle_cache(channels_file, cache) == {"a.bsky.social": "did:plc:a"}
+
+@patch("script.bluesky.Client")
+def test_login_resumes_saved_session(mock_client_class, tmp_path):
+    """Test that a saved session is resumed instead of logging in again."""
+    session_file = tmp_path / "session.json"
+    session_file.write_text(json.dumps({"session": "saved"}))
+    client = mock_client_class.return_value
+
+    assert login("user", "pass", session_file) is client
+    client.login.assert_called_once_with(session_string="saved")
+
+@patch("script.bluesky.Client")
+def test_login_falls_back_to_password(mock_client_class, tmp_path):
+    """Test that an unusable session falls back to a full login and is replaced."""
+    session_file = tmp_path / "session.json"
+    session_file.write_text(json.dumps({"session": "expired"}))
+    client = mock_client_class.return_value
+    client.login.side_effect = [Exception("expired"), None]
+    client.export_session_string.return_value = "fresh"
+
+    assert login("user", "pass", session_file) is client
+    client.login.assert_called_with("user", "pass")
+    assert json.loads(session_file.read_text()) == {"session": "fresh"}
+    assert session_file.stat().st_mode & 0o777 == 0o600
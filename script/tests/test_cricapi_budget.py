@@ -0,0 +1,88 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch, MagicMock
+from script.clock import VirtualClock
+# The budget and clock come from cricapi_client so they're the same modules the client uses
+from script.cricapi_client import BudgetExhausted, CricAPIClient, HitBudget, Priority, clock
+
+START = datetime(2025, 6, 1, 12, 0, tzinfo=timezone.utc)
+
+@pytest.fixture
+def virtual_clock():
+    virtual_clock = VirtualClock(START)
+    with clock.use_clock(virtual_clock):
+        yield virtual_clock
+
+def make_budget(tmp_path, sleep=None, **kwargs):
+    return HitBudget(
+        usage_file=tmp_path / "usage.json",
+        sleep=sleep or (lambda seconds: None),
+        **kwargs
+    )
+
+def test_hits_are_read_from_responses_and_persisted(tmp_path, virtual_clock):
+    """Test that the hits reported by CricAPI carry over to the next run."""
+    budget = make_budget(tmp_path)
+    budget.acquire(Priority.SCORES)
+    budget.record({"hitsToday": 42, "hitsLimit": 500})
+
+    resumed = make_budget(tmp_path)
+    assert resumed.hits_today == 42
+    assert resumed.remaining() == 458
+
+    # The count starts afresh the next day
+    virtual_clock.advance(timedelta(days=1))
+    assert make_budget(tmp_path).hits_today == 0
+
+def test_low_priority_calls_are_shed_first(tmp_path, virtual_clock):
+    """Test that fixture refreshes and idle scores leave hits for live scores."""
+    budget = make_budget(tmp_path, daily_limit=100)
+    budget.record({"hitsToday": 80, "hitsLimit": 100})
+    with pytest.raises(BudgetExhausted):
+        budget.acquire(Priority.FIXTURES)
+    budget.acquire(Priority.SCORES)
+
+    budget.record({"hitsToday": 95, "hitsLimit": 100})
+    with pytest.raises(BudgetExhausted):
+        budget.acquire(Priority.SCORES)
+    budget.acquire(Priority.LIVE_SCORES)
+
+    assert budget.usage()["shed"] == {"FIXTURES": 1, "SCORES": 1}
+    assert budget.usage()["calls"] == {"LIVE_SCORES": 1, "SCORES": 1}
+
+def test_bucket_paces_calls(tmp_path, virtual_clock):
+    """Test that calls past the burst wait for the bucket to refill."""
+    def sleep(seconds):
+        waits.append(seconds)
+        virtual_clock.advance(timedelta(seconds=seconds))
+
+    waits = []
+    budget = make_budget(tmp_path, sleep=sleep, calls_per_minute=60, burst=2)
+    for _ in range(3):
+        budget.acquire(Priority.LIVE_SCORES)
+    assert waits == [1.0]
+
+    # Lower priorities leave tokens for live scores, and give up rather than wait too long
+    budget = make_budget(tmp_path, sleep=sleep, calls_per_minute=60, burst=2, max_wait=0)
+    with pytest.raises(BudgetExhausted):
+        budget.acquire(Priority.FIXTURES)
+    budget.acquire(Priority.LIVE_SCORES)
+
+@patch("script.cricapi_client.requests.get")
+def test_client_records_hits_from_response(mock_get, tmp_path, virtual_clock):
+    """Test that the client's calls go through the budget."""
+    mock_get.return_value = MagicMock(json=lambda: {
+        "status": "success",
+        "data": {"status": "Live", "matchStarted": True, "matchEnded": False},
+        "info": {"hitsToday": 7, "hitsLimit": 100},
+    })
+    with patch.dict("os.environ", {"CRICKET_API_KEY": "test_key"}):
+        client = CricAPIClient(budget=make_budget(tmp_path))
+
+    details = client.get_match_details("match1", Priority.LIVE_SCORES)
+    assert details.status == "Live"
+    assert client.budget.usage()["hitsToday"] == 7
+
+    client.budget.record({"hitsToday": 100, "hitsLimit": 100})
+    assert client.get_match_details("match1").status == "error"
+    assert mock_get.call_count == 1
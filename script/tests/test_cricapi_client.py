@@ -1,9 +1,11 @@
+import json
 import pytest
-from datetime import datetime, date
-from unittest.mock import patch
+import requests
+from datetime import datetime, date, timedelta, timezone
+from unittest.mock import patch, MagicMock
 from script.cricapi_client import CricAPIClient
 from script.models import (
-    Fixture, CompetitionType, StreamsData, StreamInfo
+    Fixture, StreamsData, StreamInfo
 )
 
 @pytest.fixture
@@ -19,7 +21,7 @@ def client(mock_env):
 def mock_fixture():
     return Fixture(
         match_id="test_match_1",
-        competition=CompetitionType.COUNTY_CHAMPIONSHIP_DIV_ONE,
+        competition="County Championship Division One",
         home_team="Team A",
         away_team="Team B",
         start_date=date(2024, 4, 7),
@@ -49,4 +51,130 @@ def test_client_initialization():
     with patch.dict('os.environ', {'CRICKET_API_KEY': 'test_key'}):
         client = CricAPIClient()
         assert client.api_key == 'test_key'
-        assert client.base_url == "https://api.cricapi.com/v1" 
\ No newline at end of file
+        assert client.base_url == "https://api.cricapi.com/v1" 
+
+# Series in the cache are refreshed until all their matches have finished
+NEXT_MONTH = datetime.now(timezone.utc).date() + timedelta(days=30)
+
+def make_series_response(series_id):
+    return {
+        "status": "success",
+        "data": {"matchList": [{
+            "id": f"{series_id}-match",
+            "dateTimeGMT": f"{NEXT_MONTH.isoformat()}T10:30:00",
+            "teams": ["Durham", "Essex"],
+            "venue": "Chester-le-Street",
+        }]},
+        "info": {"hitsToday": 1, "hitsLimit": 100},
+    }
+
+@pytest.fixture
+def registry_client(mock_env, tmp_path):
+    from script.cricapi_client import Competition, HitBudget
+    competitions = [
+        Competition(series_id="championship", competition="County Championship Division One", match_days=4),
+        Competition(series_id="broken", competition="One-Day Cup"),
+        Competition(series_id="blast", competition="T20 Blast"),
+    ]
+    return CricAPIClient(
+        budget=HitBudget(usage_file=None),
+        competitions=competitions,
+        series_cache_file=tmp_path / "series.json",
+    )
+
+@patch("script.cricapi_client.requests.get")
+def test_get_county_fixtures_isolates_failing_series(mock_get, registry_client):
+    """Test that every series is fetched, with its own match length, despite one failing."""
+    def get(url, params, timeout):
+        if params["id"] == "broken":
+            raise requests.exceptions.Timeout("timed out")
+        return MagicMock(json=lambda: make_series_response(params["id"]))
+    mock_get.side_effect = get
+
+    fixtures = registry_client.get_county_fixtures()
+    assert [fixture.match_id for fixture in fixtures] == ["championship-match", "blast-match"]
+    assert fixtures[0].end_date == NEXT_MONTH + timedelta(days=3)
+    assert fixtures[1].end_date == NEXT_MONTH
+
+@patch("script.cricapi_client.requests.get")
+def test_series_cache_is_reused(mock_get, registry_client):
+    """Test that fresh and finished series aren't fetched again, and stale ones are kept on failure."""
+    mock_get.side_effect = lambda url, params, timeout: MagicMock(json=lambda: make_series_response(params["id"]))
+    registry_client.get_county_fixtures()
+    assert mock_get.call_count == 3
+
+    # The cache is persisted for the next run
+    from script.cricapi_client import HitBudget, clock
+    client = CricAPIClient(
+        budget=HitBudget(usage_file=None),
+        competitions=registry_client.competitions,
+        series_cache_file=registry_client.series_cache_file,
+    )
+    assert len(client.get_county_fixtures()) == 3
+    assert mock_get.call_count == 3
+
+    # A day later the series are stale, and a failed refresh falls back to the cache
+    mock_get.side_effect = requests.exceptions.ConnectionError("offline")
+    with clock.use_clock(lambda: datetime.now(timezone.utc) + timedelta(days=1)):
+        assert len(client.get_county_fixtures()) == 3
+    assert mock_get.call_count == 6
+
+def test_registry_defines_competitions_by_name(tmp_path):
+    """Test that a new competition only needs a registry entry, and series sharing a name must agree."""
+    from script.cricapi_client import load_competitions
+    from script.title_matcher import TitleMatcher
+    registry = tmp_path / "competitions.json"
+    registry.write_text(json.dumps({
+        "women-north": {"competition": "Vitality Blast Women", "overs": 20, "keywords": ["Blast Women"]},
+        "women-south": {"competition": "Vitality Blast Women", "overs": 20, "keywords": ["Blast Women"]},
+    }))
+    competitions = load_competitions(registry)
+    assert [competition.competition for competition in competitions] == ["Vitality Blast Women"] * 2
+    matcher = TitleMatcher({}, competitions=competitions)
+    assert matcher.scan("LIVE: Blast Women - Kent v Surrey") == (set(), {"Vitality Blast Women"})
+
+    registry.write_text(json.dumps({
+        "north": {"competition": "Second XI Championship", "matchDays": 3},
+        "south": {"competition": "Second XI Championship", "matchDays": 4},
+    }))
+    with pytest.raises(ValueError, match="Second XI Championship"):
+        load_competitions(registry)
+    registry.write_text(json.dumps({"unnamed": {"competition": ""}}))
+    with pytest.raises(ValueError):
+        load_competitions(registry)
+
+def test_refresh_hint_follows_the_days_matches(mock_fixture, mock_stream_info):
+    """Test that clients wait for the first ball, poll during play, and back off once play is over."""
+    from script.cricapi_client import CompetitionMatches, MatchData, MatchesData, refresh_hint
+    def matches_data(**state):
+        match = MatchData(
+            match_id="test_match_1", venue="Test Ground", start_time="11:00", home_team="Team A",
+            away_team="Team B", stream=mock_stream_info.model_dump(), **{"status": "", **state},
+        )
+        return MatchesData(
+            last_updated=datetime(2024, 4, 7, tzinfo=timezone.utc),
+            competitions={"Championship": CompetitionMatches(competition_name="Championship", matches_list=[match])},
+        )
+
+    # Before the start, clients come back shortly before it, within the hour
+    early = refresh_hint(matches_data(), [mock_fixture], datetime(2024, 4, 7, 10, 0, tzinfo=timezone.utc))
+    assert (early.reason, early.max_age) == ("start", 50 * 60)
+    assert early.next_refresh == datetime(2024, 4, 7, 10, 50, tzinfo=timezone.utc)
+    assert early.cache_control == "public, max-age=3000"
+    assert refresh_hint(matches_data(), [mock_fixture], datetime(2024, 4, 7, 7, 0, tzinfo=timezone.utc)).max_age == 3600
+
+    playing = refresh_hint(matches_data(match_started=True), [mock_fixture], datetime(2024, 4, 7, 12, 0, tzinfo=timezone.utc))
+    assert (playing.reason, playing.max_age) == ("live", 120)
+
+    # A multi-day match backs off overnight, at stumps and after close of play
+    def at(hour, status=""):
+        return refresh_hint(matches_data(match_started=True, status=status), [mock_fixture], datetime(2024, 4, 8, hour, tzinfo=timezone.utc))
+    assert (at(3).reason, at(3).max_age) == ("idle", 3600)
+    assert (at(10).reason, at(10).max_age) == ("start", 50 * 60)
+    assert at(17, "Day 2: Stumps - Team A lead by 120 runs").reason == "idle"
+    assert at(17, "Day 2: Team A 250/4").reason == "live"
+    assert (at(19).reason, at(22).max_age) == ("idle", 3600)
+
+    # Once it has finished, nothing changes until the next day's fixtures
+    late = refresh_hint(matches_data(match_started=True, match_ended=True), [mock_fixture], datetime(2024, 4, 7, 23, 30, tzinfo=timezone.utc))
+    assert (late.reason, late.max_age) == ("idle", 1800)
@@ -0,0 +1,42 @@
+import os
+from dataclasses import replace
+from script.differential import BUILT_IN, REFERENCE, Variant, check, differences, generate_scenario, run
+
+# Enough scenarios to cover the edge cases; run script/differential.py for more
+CASES = int(os.getenv("DIFFERENTIAL_CASES", "15"))
+
+def test_scenarios_are_reproducible_and_cover_edge_cases():
+    """Test that a seed always gives the same scenario, and the seeds between them hit the edge cases."""
+    assert generate_scenario(7) == generate_scenario(7)
+    scenarios = [generate_scenario(seed) for seed in range(CASES)]
+    assert any(scenario.youtube_quota is not None for scenario in scenarios)
+    assert any(scenario.failing_feeds for scenario in scenarios)
+    assert any(not channel.nicknames for scenario in scenarios for channel in scenario.channels.values())
+    # Double-headers, and matches streamed on both teams' channels
+    assert any(
+        len({(f.home_team, f.start_date) for f in s.fixtures if f.start_time_gmt in ("14:00", "18:30")})
+        < len([f for f in s.fixtures if f.start_time_gmt in ("14:00", "18:30")])
+        for s in scenarios
+    )
+    assert any(
+        len([v for v in s.videos if v.match_id]) > len({v.match_id for v in s.videos if v.match_id})
+        for s in scenarios
+    )
+
+def test_alternatives_write_the_same_files_as_the_reference():
+    """Test that sharded polling, playlist discovery and incremental extraction match the reference byte for byte."""
+    for seed in range(CASES):
+        assert check(seed, BUILT_IN) == {}, f"Seed {seed} differs, rerun with script/differential.py --cases 1 --seed {seed}"
+
+def test_a_wrong_candidate_is_caught():
+    """Test that a candidate that drops placeholders is reported, with a diff of the files it changed."""
+    variant = Variant("no placeholders", candidates={
+        "update_streams.create_placeholder_streams": lambda fixtures, channels, live, upcoming: [],
+    })
+    scenario = generate_scenario(0)
+    found = differences(run(scenario, REFERENCE), run(scenario, variant))
+    assert found
+    assert any(difference.startswith(f"{scenario.poll_times[0]:%H:%M} streams.json") for difference in found)
+    assert all("fixtures/" not in difference for difference in found)
+    # Left alone, the same variant matches
+    assert differences(run(scenario, REFERENCE), run(scenario, replace(variant, candidates={}))) == []
@@ -0,0 +1,67 @@
+from datetime import datetime, timezone
+from unittest.mock import patch, MagicMock
+import requests
+from script.feeds import FeedDiscovery, StateStore, parse_feed
+
+def make_feed(*video_ids, published=None):
+    published = published or datetime.now(timezone.utc).isoformat()
+    entries = "".join(
+        f"<entry><yt:videoId>{video_id}</yt:videoId><published>{published}</published></entry>"
+        for video_id in video_ids
+    )
+    return (
+        '<feed xmlns:yt="http://www.youtube.com/xml/schemas/2015" '
+        f'xmlns="http://www.w3.org/2005/Atom">{entries}</feed>'
+    ).encode("utf-8")
+
+def make_response(status_code, body=b"", headers=None):
+    response = MagicMock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    response.iter_content.return_value = [body[i:i + 16] for i in range(0, len(body), 16)]
+    response.__enter__.return_value = response
+    if status_code >= 400:
+        response.raise_for_status.side_effect = requests.exceptions.HTTPError(str(status_code))
+    return response
+
+def test_parse_feed_in_chunks():
+    """Test the streaming parser handles entries split across chunks."""
+    body = make_feed("video1", "video2", published="2025-06-05T10:00:00+00:00")
+    entries = parse_feed(body[i:i + 7] for i in range(0, len(body), 7))
+    assert [video_id for video_id, _ in entries] == ["video1", "video2"]
+    assert entries[0][1] == datetime(2025, 6, 5, 10, tzinfo=timezone.utc)
+
+@patch("script.feeds.requests.get")
+def test_discover_uses_conditional_get_and_skips_settled(mock_get, tmp_path):
+    """Test that settled videos aren't looked up again and 304s reuse the last feed."""
+    mock_get.return_value = make_response(200, make_feed("video1", "video2"), {"ETag": "abc"})
+    discovery = FeedDiscovery(StateStore(tmp_path / "state.db"))
+    video_ids, fallback = discovery.discover({"channel1"})
+    assert video_ids == ["video1", "video2"]
+    assert fallback == set()
+
+    discovery.mark_settled({"video2"})
+    discovery.save()
+
+    mock_get.return_value = make_response(304)
+    discovery = FeedDiscovery(StateStore(tmp_path / "state.db"))
+    video_ids, fallback = discovery.discover({"channel1"})
+    assert video_ids == ["video1"]
+    assert mock_get.call_args.kwargs["headers"]["If-None-Match"] == "abc"
+    assert mock_get.return_value.__exit__.called
+
+@patch("script.feeds.requests.get")
+def test_discover_falls_back_only_on_failure(mock_get, tmp_path):
+    """Test that failed feeds fall back to the playlist, but quiet channels' feeds are used."""
+    def get(url, **kwargs):
+        if url.endswith("channel1"):
+            return make_response(500)
+        if url.endswith("channel2"):
+            return make_response(200, make_feed("video3", published="2020-01-01T00:00:00+00:00"))
+        return make_response(200, make_feed())
+
+    mock_get.side_effect = get
+    discovery = FeedDiscovery(StateStore(tmp_path / "state.db"))
+    video_ids, fallback = discovery.discover({"channel1", "channel2", "channel3"})
+    assert video_ids == ["video3"]
+    assert fallback == {"channel1"}
@@ -1,6 +1,7 @@
+import json
 from datetime import datetime, timezone, timedelta
-from script.fixture_extractor import group_fixtures_by_day
-from script.models import Fixture, CompetitionType
+from script.fixture_extractor import group_fixtures_by_day, update_fixture_files
+from script.models import Fixture
 
 def test_group_fixtures_by_day(mock_fixtures):
     """Test grouping fixtures by day."""
@@ -18,7 +19,7 @@ def test_group_fixtures_by_day_skips_past_matches(mock_fixtures):
     yesterday = datetime.now(timezone.utc).date() - timedelta(days=1)
     past_fixture = Fixture(
         match_id="past_match",
-        competition=CompetitionType.COUNTY_CHAMPIONSHIP_DIV_ONE,
+        competition="County Championship Division One",
         home_team="Team A",
         away_team="Team B",
         start_date=yesterday,
@@ -32,4 +33,54 @@ def test_group_fixtures_by_day_skips_past_matches(mock_fixtures):
     
     # Check that yesterday's fixture is not included
     yesterday_str = yesterday.strftime("%Y-%m-%d")
-    assert yesterday_str not in grouped 
\ No newline at end of file
+    assert yesterday_str not in grouped 
+
+def make_fixture(match_id, start, days=1, venue="Ground 1", competition="County Championship Division One"):
+    return Fixture(
+        match_id=match_id,
+        competition=competition,
+        home_team="Team A",
+        away_team="Team B",
+        start_date=start,
+        end_date=start + timedelta(days=days - 1),
+        start_time_gmt="11:00",
+        venue=venue
+    )
+
+def test_update_fixture_files_only_writes_changes(tmp_path):
+    """Test that only the dates of changed matches are rewritten, and reschedules are logged."""
+    today = datetime.now(timezone.utc).date()
+    output_dir = str(tmp_path / "fixtures")
+    change_log = tmp_path / "changes.jsonl"
+    fixtures = [
+        make_fixture("match1", today + timedelta(days=1), days=4),
+        make_fixture("match2", today + timedelta(days=10)),
+        make_fixture("match3", today + timedelta(days=20), competition="T20 Blast"),
+    ]
+    summary = update_fixture_files(fixtures, output_dir, str(change_log))
+    assert summary["added"] == ["match1", "match2", "match3"]
+    assert len(summary["written"]) == 6
+
+    # Nothing changed, so nothing is written
+    summary = update_fixture_files(fixtures, output_dir, str(change_log))
+    assert summary["written"] == summary["deleted"] == []
+    assert not change_log.exists()
+
+    # match2 moves a day later and to another ground
+    moved = make_fixture("match2", today + timedelta(days=11), venue="Ground 2")
+    summary = update_fixture_files([fixtures[0], moved, fixtures[2]], output_dir, str(change_log))
+    old_day = (today + timedelta(days=10)).strftime("%Y-%m-%d")
+    new_day = (today + timedelta(days=11)).strftime("%Y-%m-%d")
+    assert summary["changed"] == ["match2"]
+    assert summary["written"] == [new_day]
+    assert summary["deleted"] == [old_day]
+
+    changes = [json.loads(line) for line in change_log.read_text().splitlines()]
+    assert [change["type"] for change in changes] == ["rescheduled", "venue"]
+    assert changes[0]["to"]["startDate"] == new_day
+    assert changes[1] == {**changes[1], "from": "Ground 1", "to": "Ground 2"}
+
+    # A competition that returned nothing, like a failed series, keeps its stored fixtures
+    summary = update_fixture_files([fixtures[0], moved], output_dir, str(change_log))
+    assert summary["removed"] == []
+    assert summary["written"] == []
@@ -0,0 +1,73 @@
+import json
+from script.fixture_index import build_indexes, iter_fixture_files, publish_indexes
+
+def make_record(match_id, start_date, end_date=None, competition="T20 Blast", home="Surrey", away="Kent"):
+    return {
+        "matchId": match_id,
+        "competition": competition,
+        "homeTeam": home,
+        "awayTeam": away,
+        "startDate": start_date,
+        "endDate": end_date or start_date,
+        "startTimeGmt": "18:30",
+        "venue": f"{home} Ground",
+        "day": "One Day Match",
+    }
+
+def write_fixture_files(fixtures_dir, days):
+    fixtures_dir.mkdir(exist_ok=True)
+    for day, records in days.items():
+        (fixtures_dir / f"{day}.json").write_text(json.dumps(records))
+
+def test_build_indexes_indexes_each_match_once(tmp_path):
+    """Test that multi-day matches are indexed once, and older file formats are read."""
+    championship = make_record("match1", "2025-06-01", "2025-06-04", "County Championship Division One", "Kent", "Essex")
+    legacy = {
+        "match_id": "match3",
+        "competition": "One-Day Cup",
+        "home_team": "Essex",
+        "away_team": "Surrey",
+        "start_date": "2025-06-03",
+        "end_date": "2025-06-03",
+        "start_time_gmt": "10:00",
+        "venue": "Chelmsford",
+    }
+    write_fixture_files(tmp_path / "fixtures", {
+        "2025-06-01": [championship, make_record("match2", "2025-06-01")],
+        "2025-06-02": [championship],
+        "2025-06-03": [championship, legacy, {"home_team": "Essex", "match_url": "no match ID"}],
+    })
+
+    indexes = build_indexes(iter_fixture_files(tmp_path / "fixtures"))
+    assert indexes["teams"]["Kent"] == [["2025-06-01", "match1"], ["2025-06-01", "match2"]]
+    assert indexes["teams"]["Surrey"] == [["2025-06-01", "match2"], ["2025-06-03", "match3"]]
+    assert indexes["competitions"]["County Championship Division One"] == {"2025-06-01": ["match1"]}
+    assert indexes["competitions"]["One-Day Cup"] == {"2025-06-03": ["match3"]}
+
+    matches = indexes["matches"]
+    assert sorted(matches["matches"]) == ["match1", "match2", "match3"]
+    record = dict(zip(matches["fields"], matches["matches"]["match1"]))
+    assert record["endDate"] == "2025-06-04"
+
+def test_publish_indexes_writes_content_hashed_files(tmp_path):
+    """Test that index files are named by their content, and only rewritten when it changes."""
+    fixtures_dir = tmp_path / "fixtures"
+    output_dir = tmp_path / "indexes"
+    write_fixture_files(fixtures_dir, {"2025-06-01": [make_record("match1", "2025-06-01")]})
+
+    manifest = publish_indexes(fixtures_dir, output_dir)
+    assert json.loads((output_dir / "manifest.json").read_text()) == manifest
+    modified = {path.name: path.stat().st_mtime_ns for path in output_dir.iterdir()}
+    assert publish_indexes(fixtures_dir, output_dir) == manifest
+    assert {path.name: path.stat().st_mtime_ns for path in output_dir.iterdir()} == modified
+
+    # A new match changes every index, and the superseded files are kept for clients with the old manifest
+    write_fixture_files(fixtures_dir, {"2025-06-02": [make_record("match2", "2025-06-02")]})
+    updated = publish_indexes(fixtures_dir, output_dir)
+    assert all(updated[name] != manifest[name] for name in manifest)
+    assert sorted(path.name for path in output_dir.iterdir()) == sorted([*updated.values(), *manifest.values(), "manifest.json"])
+
+    # Only until the generation after
+    write_fixture_files(fixtures_dir, {"2025-06-03": [make_record("match3", "2025-06-03")]})
+    latest = publish_indexes(fixtures_dir, output_dir)
+    assert sorted(path.name for path in output_dir.iterdir()) == sorted([*latest.values(), *updated.values(), "manifest.json"])
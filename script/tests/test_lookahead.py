@@ -0,0 +1,121 @@
+from datetime import date, datetime, timezone
+from unittest.mock import patch
+from script.state import load_json, save_json
+# Models and the clock come from update_streams so they're the same objects it uses
+from script.update_streams import Channel, Fixture, clock, get_live_streams, look_ahead
+
+MATCH_DAY = date(2025, 6, 2)
+
+class FakeYouTube:
+    """Answers videos.list from a fixed set of videos, recording the IDs asked for."""
+
+    def __init__(self, videos):
+        self.videos_by_id = {video["id"]: video for video in videos}
+        self.requested = []
+
+    def videos(self):
+        return self
+
+    def list(self, part, id):
+        self.requested.append(id.split(","))
+        self.response = {"items": [self.videos_by_id[v] for v in id.split(",") if v in self.videos_by_id]}
+        return self
+
+    def execute(self, http=None):
+        return self.response
+
+def scheduled_video(video_id, title, channel_id, start):
+    return {
+        "id": video_id,
+        "snippet": {"title": title, "channelId": channel_id},
+        "liveStreamingDetails": {"scheduledStartTime": start},
+    }
+
+def make_fixture(match_id, home, away):
+    return Fixture(
+        match_id=match_id,
+        competition="County Championship Division One",
+        home_team=home,
+        away_team=away,
+        start_date=MATCH_DAY,
+        end_date=MATCH_DAY,
+        start_time_gmt="11:00",
+        venue="Ground",
+    )
+
+CHANNELS = {
+    f"team{i}": Channel(name=f"Team {letter}", youtubeChannelId=f"channel{i}", nicknames=[], uploadsPlaylistId=f"playlist{i}")
+    for i, letter in enumerate("ABC", start=1)
+}
+
+FIXTURES = [make_fixture("match1", "Team A", "Team B"), make_fixture("match2", "Team B", "Team C")]
+
+def test_look_ahead_caches_tomorrows_scheduled_streams(tmp_path):
+    """Test that streams scheduled for tomorrow are kept by day and match, and past days dropped."""
+    lookahead_file = tmp_path / "lookahead.json"
+    save_json(lookahead_file, {"2025-05-31": {"old": {"videoId": "old"}}})
+    youtube = FakeYouTube([
+        scheduled_video("vid1", "Team A v Team B Day 1", "channel1", "2025-06-02T10:30:00Z"),
+        # An upload that isn't a stream is ignored
+        {"id": "vid2", "snippet": {"title": "Highlights", "channelId": "channel2"}},
+    ])
+    with (
+        clock.use_clock(clock.VirtualClock(datetime(2025, 6, 1, 1, 0, tzinfo=timezone.utc))),
+        patch("script.update_streams.youtube", youtube),
+        patch("script.update_streams.discover_video_ids", return_value=(["vid1", "vid2"], None)),
+        patch("script.update_streams.load_fixtures", side_effect=lambda day: FIXTURES if day == MATCH_DAY else []),
+    ):
+        look_ahead(CHANNELS, days=2, lookahead_file=lookahead_file)
+
+    assert load_json(lookahead_file) == {
+        "2025-06-02": {
+            "match1": {
+                "videoId": "vid1",
+                "channelId": "channel1",
+                "title": "Team A v Team B Day 1",
+                "scheduledStartTime": "2025-06-02T10:30:00+00:00",
+            }
+        }
+    }
+
+def test_look_ahead_looks_videos_up_once_for_every_day(tmp_path):
+    """Test that the videos found are looked up once, however many days they're matched against."""
+    next_day = make_fixture("match3", "Team C", "Team A").model_copy(
+        update={"start_date": date(2025, 6, 3), "end_date": date(2025, 6, 3)}
+    )
+    youtube = FakeYouTube([
+        scheduled_video("vid1", "Team A v Team B Day 1", "channel1", "2025-06-02T10:30:00Z"),
+        scheduled_video("vid3", "Team C v Team A", "channel3", "2025-06-03T10:30:00Z"),
+    ])
+    with (
+        clock.use_clock(clock.VirtualClock(datetime(2025, 6, 1, 1, 0, tzinfo=timezone.utc))),
+        patch("script.update_streams.youtube", youtube),
+        patch("script.update_streams.discover_video_ids", return_value=(["vid1", "vid3"], None)),
+        patch("script.update_streams.load_fixtures", side_effect=lambda day: {
+            MATCH_DAY: FIXTURES, date(2025, 6, 3): [next_day],
+        }.get(day, [])),
+    ):
+        lookahead = look_ahead(CHANNELS, days=3, lookahead_file=tmp_path / "lookahead.json")
+
+    assert youtube.requested == [["vid1", "vid3"]]
+    assert {day: list(streams) for day, streams in lookahead.items()} == {
+        "2025-06-02": ["match1"], "2025-06-03": ["match3"],
+    }
+
+def test_known_streams_are_checked_by_id():
+    """Test that on the day, known streams are looked up directly and only other matches' channels searched."""
+    youtube = FakeYouTube([
+        scheduled_video("vid1", "Team A v Team B Day 1", "channel1", "2025-06-02T10:30:00Z"),
+        scheduled_video("vid3", "Team B v Team C", "channel2", "2025-06-02T11:00:00Z"),
+    ])
+    with (
+        clock.use_clock(clock.VirtualClock(datetime(2025, 6, 2, 8, 0, tzinfo=timezone.utc))),
+        patch("script.update_streams.youtube", youtube),
+        patch("script.update_streams.discover_video_ids", return_value=(["vid1", "vid3"], None)) as discover,
+    ):
+        live, upcoming = get_live_streams(FIXTURES, CHANNELS, known_streams={"match1": "vid1"})
+
+    assert youtube.requested == [["vid1"], ["vid3"]]
+    assert discover.call_args.args[0] == {"channel2", "channel3"}
+    assert not live
+    assert {stream.fixture.match_id: stream.video_id for stream in upcoming} == {"match1": "vid1", "match2": "vid3"}
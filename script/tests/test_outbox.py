@@ -0,0 +1,77 @@
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+from script.outbox import enqueue, drain, read_events, pending_batches, delivery_file
+
+def test_enqueue_is_idempotent(mock_fixtures, tmp_path):
+    """Test that the same stream is only queued once."""
+    outbox_file = tmp_path / "outbox.jsonl"
+    video_ids = {"match1": "video1", "match2": None}
+    assert enqueue(mock_fixtures, video_ids, outbox_file) == 1
+    assert enqueue(mock_fixtures, video_ids, outbox_file) == 0
+
+    events = read_events(outbox_file)
+    assert [event["key"] for event in events] == ["match1:video1"]
+    assert events[0]["fixture"]["homeTeam"] == "Team A"
+
+def test_drain_batches_events_into_one_post(mock_fixtures, tmp_path):
+    """Test that events queued close together go out in a single post, once."""
+    outbox_file = tmp_path / "outbox.jsonl"
+    enqueue(mock_fixtures[:1], {"match1": "video1"}, outbox_file)
+    enqueue(mock_fixtures[1:], {"match2": "video2"}, outbox_file)
+
+    send = MagicMock(return_value=True)
+    assert drain(send, outbox_file) == 2
+    send.assert_called_once()
+    fixtures, video_ids = send.call_args.args
+    assert [f.match_id for f in fixtures] == ["match1", "match2"]
+    assert video_ids == {"match1": "video1", "match2": "video2"}
+
+    # Delivered events are never sent again
+    assert drain(send, outbox_file) == 0
+    send.assert_called_once()
+
+def test_drain_retries_failures_with_backoff(mock_fixtures, tmp_path):
+    """Test that a failed send is scheduled for retry rather than lost."""
+    outbox_file = tmp_path / "outbox.jsonl"
+    enqueue(mock_fixtures[:1], {"match1": "video1"}, outbox_file)
+
+    send = MagicMock(side_effect=Exception("Bluesky is down"))
+    assert drain(send, outbox_file) == 0
+    deliveries = json.loads(delivery_file(outbox_file).read_text())
+    assert deliveries["match1:video1"]["status"] == "pending"
+    assert deliveries["match1:video1"]["lastError"] == "Bluesky is down"
+
+    # Not due again until the backoff has passed
+    send.side_effect = None
+    send.return_value = True
+    assert drain(send, outbox_file) == 0
+    assert send.call_count == 1
+
+def test_enqueue_does_not_wait_for_a_send(mock_fixtures, tmp_path):
+    """Test that events can be queued while a slow send is in progress, and are kept for the next drain."""
+    outbox_file = tmp_path / "outbox.jsonl"
+    enqueue(mock_fixtures[:1], {"match1": "video1"}, outbox_file)
+
+    def send(fixtures, video_ids):
+        if "match1" in video_ids:
+            queued = threading.Thread(target=enqueue, args=(mock_fixtures[1:], {"match2": "video2"}, outbox_file))
+            queued.start()
+            queued.join(timeout=5)
+            assert not queued.is_alive()
+        return True
+
+    assert drain(send, outbox_file) == 1
+    assert [event["key"] for event in read_events(outbox_file)] == ["match1:video1", "match2:video2"]
+    assert drain(send, outbox_file) == 1
+
+def test_pending_batches_holds_back_unsettled_events():
+    """Test that a resident worker waits for stragglers before posting."""
+    now = datetime.now(timezone.utc)
+    events = [
+        {"key": "a", "createdAt": (now - timedelta(hours=1)).isoformat()},
+        {"key": "b", "createdAt": (now - timedelta(seconds=5)).isoformat()},
+    ]
+    batches = pending_batches(events, {}, now, settle_time=timedelta(seconds=30))
+    assert [[event["key"] for event in batch] for batch in batches] == [["a"]]
@@ -0,0 +1,122 @@
+import json
+from datetime import date, datetime, timedelta, timezone
+from script.score_archive import ScoreArchive, HEADER, INDEX_FILE, RECORD, SNAPSHOTS_FILE
+# Models come from score_archive so they're the same classes it validates against
+from script.score_archive import MatchScore
+
+START = datetime(2025, 6, 1, 11, 0, tzinfo=timezone.utc)
+
+def make_score(*innings):
+    return MatchScore(innings=[
+        {"innings": name, "runs": runs, "wickets": wickets, "overs": overs}
+        for name, runs, wickets, overs in innings
+    ])
+
+def test_record_appends_only_changes(tmp_path):
+    """Test that each innings is recorded when its score changes, and read back by match and day."""
+    archive = ScoreArchive(tmp_path)
+    assert archive.record("match1", make_score(("Kent Inning 1", 50, 1, 10.2)), at=START) == 1
+    assert archive.record("match1", make_score(("Kent Inning 1", 50, 1, 10.2)), at=START + timedelta(minutes=5)) == 0
+    assert archive.record("match2", make_score(("Essex Inning 1", 12, 0, 3.0)), at=START + timedelta(minutes=5)) == 1
+    assert archive.record(
+        "match1",
+        make_score(("Kent Inning 1", 250, 10, 70.4), ("Surrey Inning 1", 4, 0, 1.1)),
+        at=START + timedelta(days=1),
+    ) == 2
+
+    # Reopened, the archive reads the same records
+    archive = ScoreArchive(tmp_path)
+    snapshots = archive.match("match1")
+    assert [(s.innings, s.runs, s.wickets, s.overs) for s in snapshots] == [
+        ("Kent Inning 1", 50, 1, 10.2),
+        ("Kent Inning 1", 250, 10, 70.4),
+        ("Surrey Inning 1", 4, 0, 1.1),
+    ]
+    assert snapshots[0].timestamp == START
+    assert [s.match_id for s in archive.day(date(2025, 6, 1))] == ["match1", "match2"]
+    assert archive.day(date(2025, 6, 3)) == []
+    assert (tmp_path / SNAPSHOTS_FILE).stat().st_size == HEADER.size + 4 * RECORD.size
+
+def test_match_reads_only_its_own_records(tmp_path):
+    """Test that a match played alongside others keeps runs of its own records to read."""
+    archive = ScoreArchive(tmp_path)
+    for day in range(2):
+        for poll in range(2):
+            at = START + timedelta(days=day, minutes=15 * poll)
+            archive.record_many({
+                "long": make_score(("Kent Inning 1", 100 * day + poll, 0, 1.0), ("Surrey Inning 1", poll, 0, 0.1)),
+                f"short{day}": make_score(("Essex Inning 1", 10 + poll, 0, 2.0)),
+            }, at=at)
+    archive.record("long", make_score(("Kent Inning 1", 300, 0, 1.0)), at=START + timedelta(days=2))
+
+    archive = ScoreArchive(tmp_path)
+    assert archive.match_ranges["long"] == [[0, 2], [3, 5], [6, 8], [9, 11], [12, 13]]
+    assert archive.match_ranges["short1"] == [[8, 9], [11, 12]]
+    assert [(s.innings, s.runs) for s in archive.match("long")] == [
+        ("Kent Inning 1", 0), ("Surrey Inning 1", 0),
+        ("Kent Inning 1", 1), ("Surrey Inning 1", 1),
+        ("Kent Inning 1", 100), ("Surrey Inning 1", 0),
+        ("Kent Inning 1", 101), ("Surrey Inning 1", 1),
+        ("Kent Inning 1", 300),
+    ]
+    assert archive.latest("short0") == {"Essex Inning 1": (11, 0, 20)}
+
+def test_partly_written_record_is_dropped(tmp_path):
+    """Test that records the index doesn't know about are indexed, and a torn one dropped."""
+    archive = ScoreArchive(tmp_path)
+    archive.record("match1", make_score(("Kent Inning 1", 50, 1, 10.2)), at=START)
+    archive.record("match1", make_score(("Kent Inning 1", 60, 1, 12.0)), at=START)
+    with open(tmp_path / SNAPSHOTS_FILE, "ab") as f:
+        f.write(b"\x01\x02\x03")
+
+    archive = ScoreArchive(tmp_path)
+    assert archive.count == 2
+    assert len(archive.match("match1")) == 2
+    assert (tmp_path / SNAPSHOTS_FILE).stat().st_size == HEADER.size + 2 * RECORD.size
+
+def test_lost_index_is_rebuilt_from_the_records(tmp_path):
+    """Test that a missing or truncated index is rebuilt, with placeholders for the names it held."""
+    archive = ScoreArchive(tmp_path)
+    archive.record("match1", make_score(("Kent Inning 1", 50, 1, 10.2)), at=START)
+    archive.record("match2", make_score(("Essex Inning 1", 12, 0, 3.0), ("Essex Inning 2", 7, 1, 2.0)), at=START)
+    index = (tmp_path / INDEX_FILE).read_text()
+
+    for damaged_index in [None, index[:len(index) // 2]]:
+        if damaged_index is None:
+            (tmp_path / INDEX_FILE).unlink()
+        else:
+            (tmp_path / INDEX_FILE).write_text(damaged_index)
+        archive = ScoreArchive(tmp_path)
+        assert archive.count == 3
+        assert archive.match_ids == ["unknown-0", "unknown-1"]
+        assert [(s.match_id, s.innings, s.runs) for s in archive.day(date(2025, 6, 1))] == [
+            ("unknown-0", "Innings 1", 50),
+            ("unknown-1", "Innings 1", 12),
+            ("unknown-1", "Innings 2", 7),
+        ]
+
+    # An index that knows fewer matches than the records refer to keeps the ones it knows
+    short_index = json.loads(index)
+    short_index.update(count=1, matchIds=["match1"], innings={"match1": ["Kent Inning 1"]})
+    (tmp_path / INDEX_FILE).write_text(json.dumps(short_index))
+    archive = ScoreArchive(tmp_path)
+    assert archive.match_ids == ["match1", "unknown-1"]
+    assert [s.innings for s in archive.match("match1")] == ["Kent Inning 1"]
+
+    assert archive.record("match3", make_score(("Kent Inning 1", 1, 0, 0.1)), at=START) == 1
+    assert ScoreArchive(tmp_path).match_ids == ["match1", "unknown-1", "match3"]
+
+def test_compact_drops_repeats_and_old_days(tmp_path):
+    """Test that compaction drops snapshots before a day and renumbers the matches left."""
+    archive = ScoreArchive(tmp_path)
+    archive.record("old", make_score(("Kent Inning 1", 50, 1, 10.2)), at=START - timedelta(days=30))
+    archive.record("match1", make_score(("Kent Inning 1", 50, 1, 10.2)), at=START)
+    archive.record("match1", make_score(("Kent Inning 1", 80, 2, 20.0)), at=START + timedelta(hours=1))
+
+    kept, dropped = archive.compact(before=date(2025, 6, 1))
+    assert (kept, dropped) == (2, 1)
+
+    archive = ScoreArchive(tmp_path)
+    assert archive.match_ids == ["match1"]
+    assert archive.match("old") == []
+    assert [s.runs for s in archive.match("match1")] == [50, 80]
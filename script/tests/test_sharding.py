@@ -0,0 +1,99 @@
+from datetime import datetime, timezone
+from unittest.mock import patch
+import pytest
+from script.state import save_json
+# Models come from update_streams so they're the same classes it validates against
+from script.update_streams import (
+    Channel,
+    Fixture,
+    StreamRecord,
+    StreamInfo,
+    StreamsShard,
+    shard_for_channel,
+    shard_file,
+    poll_shard,
+    merge_shards,
+    create_placeholder_streams,
+    format_streams_for_output,
+)
+
+CHANNELS = {
+    f"team{i}": Channel(
+        name=f"Team {i}",
+        youtubeChannelId=f"channel{i}",
+        nicknames=[],
+        uploadsPlaylistId=f"playlist{i}"
+    )
+    for i in range(8)
+}
+
+FIXTURES = [
+    Fixture(
+        match_id=f"match{i}",
+        competition="T20 Blast",
+        home_team=f"Team {i}",
+        away_team=f"Team {(i + 1) % 8}",
+        start_date=datetime.now(timezone.utc).date(),
+        end_date=datetime.now(timezone.utc).date(),
+        start_time_gmt="18:30",
+        venue=f"Ground {i}"
+    )
+    for i in range(8)
+]
+
+def fake_live_streams(fixtures, channels, feed_discovery=None, active_channels=None):
+    """Every even-numbered home team is streaming, the rest have no stream yet."""
+    live = [
+        StreamRecord(
+            fixture=fixture,
+            video_id=f"video-{fixture.match_id}",
+            title=f"{fixture.home_team} live",
+            channel_id=fixture.home_team.replace("Team ", "channel")
+        )
+        for fixture in fixtures
+        if int(fixture.match_id[-1]) % 2 == 0
+    ]
+    return live, []
+
+def test_shard_for_channel_is_stable_when_adding_a_shard():
+    """Test that adding a shard only moves channels onto the new shard."""
+    channel_ids = [f"channel{i}" for i in range(100)]
+    before = {c: shard_for_channel(c, 3) for c in channel_ids}
+    after = {c: shard_for_channel(c, 4) for c in channel_ids}
+    assert set(before.values()) == {0, 1, 2}
+    assert all(after[c] in (before[c], 3) for c in channel_ids)
+
+# Feed state isn't needed with the live streams faked, and mustn't touch the real state store
+@patch("script.update_streams.FeedDiscovery")
+@patch("script.update_streams.get_live_streams", side_effect=fake_live_streams)
+@patch("script.update_streams.load_fixtures", return_value=FIXTURES)
+def test_merged_shards_match_single_worker(mock_load_fixtures, mock_live, mock_feed_discovery, tmp_path):
+    """Test that merging every shard gives the same streams as one worker."""
+    live, upcoming = fake_live_streams(FIXTURES, CHANNELS)
+    placeholders = create_placeholder_streams(FIXTURES, CHANNELS, live, upcoming)
+    single = format_streams_for_output(live, upcoming, placeholders)
+
+    # Finish shards in reverse order to show it doesn't matter
+    for shard_index in reversed(range(3)):
+        poll_shard(CHANNELS, shard_index, 3, tmp_path)
+    merged = merge_shards(3, tmp_path)
+
+    assert merged.model_dump(by_alias=True)["streams"] == single.model_dump(by_alias=True)["streams"]
+    assert list(merged.streams) == list(single.streams)
+
+def test_merge_shards_conflicts_and_missing_shards(tmp_path):
+    """Test that real streams beat placeholders and missing shards are an error."""
+    placeholder = StreamInfo(video_id=None, title="A vs B", channel_id="channel1", standard_title="A vs B")
+    stream = StreamInfo(video_id="video1", title="A vs B", channel_id="channel1", standard_title="A vs B")
+    for shard_index, streams in enumerate([{"match1": stream}, {"match1": placeholder}]):
+        shard = StreamsShard(
+            shard_index=shard_index,
+            shard_count=2,
+            last_updated=datetime.now(timezone.utc),
+            streams=streams
+        )
+        save_json(shard_file(shard_index, 2, tmp_path), shard.model_dump(by_alias=True, mode="json"))
+
+    assert merge_shards(2, tmp_path).streams["match1"].video_id == "video1"
+    with pytest.raises(ValueError, match="Missing results"):
+        merge_shards(3, tmp_path)
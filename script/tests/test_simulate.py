@@ -0,0 +1,56 @@
+from datetime import date, datetime, timedelta, timezone
+from unittest.mock import patch
+from script import clock
+from script.clock import VirtualClock
+# Models come from simulate so they're the same classes update_streams validates against
+from script.simulate import Channel, Fixture, Policy, simulate, update_streams
+
+CHANNELS = {
+    "Durham": Channel(
+        name="Durham CCC",
+        nicknames=["Durham"],
+        youtubeChannelId="channel1",
+        uploadsPlaylistId="playlist1",
+    ),
+    "Essex": Channel(
+        name="Essex CCC",
+        nicknames=["Essex"],
+        youtubeChannelId="channel2",
+        uploadsPlaylistId="playlist2",
+    ),
+}
+
+def make_fixture(day):
+    return Fixture(
+        match_id=f"match-{day.isoformat()}",
+        competition="T20 Blast",
+        home_team="Durham",
+        away_team="Essex",
+        start_date=day,
+        end_date=day,
+        start_time_gmt="18:30",
+        venue="Chester-le-Street"
+    )
+
+def test_virtual_clock_is_used_inside_block():
+    """Test that the scripts read the virtual clock only while it's in use."""
+    moment = datetime(2025, 6, 1, 12, 0, tzinfo=timezone.utc)
+    virtual_clock = VirtualClock(moment)
+    with clock.use_clock(virtual_clock):
+        assert clock.now() == moment
+        virtual_clock.advance(timedelta(days=1))
+        assert clock.today() == date(2025, 6, 2)
+    assert clock.now() != virtual_clock()
+
+def test_simulate_detects_every_broadcast():
+    """Test that a simulated fixture is found and its polls are counted."""
+    with patch.object(update_streams, "load_fixtures", lambda day: [make_fixture(day)] if day.day == 1 else []):
+        days = simulate(date(2025, 6, 1), date(2025, 6, 2), Policy(feed_failure_rate=0), CHANNELS)
+
+    match_day, rest_day = days
+    assert match_day.broadcasts == 1
+    assert match_day.summary()["detected"] == 1
+    assert match_day.youtube_units > 0
+    # With no fixtures, polls make no YouTube calls
+    assert rest_day.polls > 0
+    assert rest_day.youtube_units == 0
@@ -0,0 +1,156 @@
+import json
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+import numpy as np
+from script.fixture_index import build_indexes, write_indexes
+from script.standings import LeagueTable, backfill_results, build_tables, write_standings, parse_outcome, HOME_WIN, AWAY_WIN, NO_RESULT
+from script.standings import Priority, clock
+# Models come from standings so they're the same classes it validates against
+from script.standings import Competition, MatchDetails
+
+TEAMS = {"Kent", "Surrey", "Essex", "Sussex", "Durham", "Yorkshire"}
+
+def resolve(name):
+    name = name.replace(" CCC", "")
+    return name if name in TEAMS else None
+
+BLAST = Competition(
+    seriesId="blast",
+    competition="T20 Blast",
+    overs=20,
+    points={"win": 4, "tie": 2, "noResult": 2},
+    groups={"South Group": ["Essex", "Kent", "Surrey", "Sussex"], "North Group": ["Durham", "Yorkshire"]},
+)
+CHAMPIONSHIP = Competition(
+    seriesId="championship",
+    competition="County Championship Division One",
+    matchDays=4,
+    points={"win": 16, "draw": 8, "tie": 8},
+    bonusPoints=True,
+)
+
+def result(match_id, status, *innings, ended=True):
+    return MatchDetails(
+        id=match_id,
+        status=status,
+        matchStarted=True,
+        matchEnded=ended,
+        score={"innings": [
+            {"innings": name, "runs": runs, "wickets": wickets, "overs": overs}
+            for name, runs, wickets, overs in innings
+        ]},
+    )
+
+def table_rows(table, group):
+    fields = table.to_json()["fields"]
+    return [dict(zip(fields, row)) for row in table.to_json()["groups"][group]]
+
+def test_parse_outcome():
+    """Test that the winner is read from the status, whatever form their name takes."""
+    assert parse_outcome("Surrey CCC won by 6 wkts", "Kent", "Surrey", resolve) == AWAY_WIN
+    assert parse_outcome("Kent won by 20 runs", "Kent", "Surrey", resolve) == HOME_WIN
+    assert parse_outcome("No result due to rain", "Kent", "Surrey", resolve) == NO_RESULT
+
+def test_blast_table_ranks_by_points_then_net_run_rate():
+    """Test that groups are ranked separately, and cross-group matches left out."""
+    matches = [
+        ("m1", "Kent", "Surrey"),
+        ("m2", "Essex", "Sussex"),
+        ("m3", "Durham", "Yorkshire"),
+        ("m4", "Kent", "Durham"),
+    ]
+    table = LeagueTable(BLAST, matches, resolve)
+    table.load_results({
+        # Surrey are bowled out, so they're taken to have faced all 20 overs
+        "m1": result("m1", "Kent won by 80 runs", ("Kent Inning 1", 200, 5, 20), ("Surrey Inning 1", 120, 10, 15.3)),
+        "m2": result("m2", "Essex won by 10 runs", ("Essex Inning 1", 150, 8, 20), ("Sussex Inning 1", 140, 7, 20)),
+        "m3": result("m3", "No result", ("Durham Inning 1", 40, 1, 5)),
+    })
+    assert "m4" not in table.rows
+
+    south = table_rows(table, "South Group")
+    assert [row["team"] for row in south] == ["Kent", "Essex", "Sussex", "Surrey"]
+    assert south[0] == {
+        "team": "Kent", "played": 1, "won": 1, "lost": 0, "tied": 0, "noResult": 0,
+        "points": 4, "netRunRate": 4.0,
+    }
+    assert south[1]["netRunRate"] == 0.5
+    north = table_rows(table, "North Group")
+    assert [(row["team"], row["points"], row["netRunRate"]) for row in north] == [
+        ("Durham", 2, 0.0), ("Yorkshire", 2, 0.0),
+    ]
+
+def test_update_result_matches_full_recompute():
+    """Test that changing one result incrementally gives the same totals as starting again."""
+    matches = [(f"m{i}", home, away) for i, (home, away) in enumerate(
+        [("Kent", "Surrey"), ("Essex", "Sussex"), ("Surrey", "Essex"), ("Sussex", "Kent")]
+    )]
+    results = {
+        "m0": result("m0", "Surrey won by 4 wkts", ("Kent Inning 1", 160, 6, 20), ("Surrey Inning 1", 161, 6, 19.2)),
+        "m1": result("m1", "Match tied", ("Essex Inning 1", 170, 9, 20), ("Sussex Inning 1", 170, 8, 20)),
+    }
+    table = LeagueTable(BLAST, matches, resolve)
+    table.load_results(results)
+
+    results["m2"] = result("m2", "Essex won by 2 runs", ("Surrey Inning 1", 130, 10, 18.4), ("Essex Inning 1", 131, 3, 15))
+    results["m0"] = result("m0", "Kent won by 1 run", ("Kent Inning 1", 160, 6, 20), ("Surrey Inning 1", 159, 6, 20))
+    assert table.update_result("m2", results["m2"])
+    assert table.update_result("m0", results["m0"])
+    assert not table.update_result("unknown", results["m0"])
+
+    recomputed = LeagueTable(BLAST, matches, resolve)
+    recomputed.load_results(results)
+    np.testing.assert_allclose(table.totals, recomputed.totals)
+    assert table.to_json() == recomputed.to_json()
+
+def test_championship_bonus_points(tmp_path):
+    """Test that bonus points come from first innings, and draws and bonus points are published."""
+    tables = build_tables(
+        [CHAMPIONSHIP, BLAST],
+        {"County Championship Division One": [("c1", "Kent", "Essex")]},
+        {"c1": result(
+            "c1", "Match drawn",
+            ("Kent Inning 1", 412, 10, 120), ("Essex Inning 1", 260, 6, 95.1), ("Kent Inning 2", 90, 2, 30),
+        )},
+        resolve,
+    )
+    rows = table_rows(tables["County Championship Division One"], "County Championship Division One")
+    # Kent: 8 for the draw, 4 batting points and 2 for Essex's six wickets; Essex: 8, 1 and 3
+    assert [(row["team"], row["drawn"], row["bonusPoints"], row["points"]) for row in rows] == [
+        ("Kent", 1, 6, 14), ("Essex", 1, 4, 12),
+    ]
+    assert "netRunRate" not in rows[0]
+
+    standings_file = tmp_path / "standings.json"
+    write_standings(tables, standings_file)
+    standings = json.loads(standings_file.read_text())
+    assert sorted(standings["competitions"]) == ["County Championship Division One", "T20 Blast"]
+
+def test_backfill_fetches_results_that_were_missed(tmp_path):
+    """Test that matches which finished without a result being recorded are fetched, oldest first."""
+    fixtures = [
+        {"matchId": match_id, "competition": competition, "homeTeam": "Kent", "awayTeam": "Surrey",
+         "startDate": day, "endDate": day}
+        for match_id, competition, day in [
+            ("recorded", "T20 Blast", "2025-06-01"),
+            ("missed", "T20 Blast", "2025-06-03"),
+            ("abandoned", "T20 Blast", "2025-06-02"),
+            ("cup", "One-Day Cup", "2025-06-02"),
+            ("today", "T20 Blast", "2025-06-10"),
+        ]
+    ]
+    write_indexes(build_indexes(fixtures), tmp_path)
+    results = {"recorded": result("recorded", "Kent won by 1 run")}
+    details = {
+        "missed": result("missed", "Surrey won by 4 wkts"),
+        "abandoned": result("abandoned", "Match abandoned", ended=False),
+    }
+    client = MagicMock(competitions=[BLAST, CHAMPIONSHIP])
+    client.get_match_details.side_effect = lambda match_id, priority: details[match_id]
+
+    with clock.use_clock(clock.VirtualClock(datetime(2025, 6, 10, 12, tzinfo=timezone.utc))):
+        assert backfill_results(client, results, indexes_dir=tmp_path) == 1
+    assert [call.args for call in client.get_match_details.call_args_list] == [
+        ("abandoned", Priority.FIXTURES), ("missed", Priority.FIXTURES),
+    ]
+    assert sorted(results) == ["missed", "recorded"]
@@ -0,0 +1,56 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from script.state import StateStore, clock, save_json
+
+START = datetime(2025, 6, 1, tzinfo=timezone.utc)
+
+def test_namespaces_expire_and_evict(tmp_path):
+    """Test that entries expire after their TTL, and the oldest are evicted over the cap."""
+    virtual_clock = clock.VirtualClock(START)
+    with clock.use_clock(virtual_clock):
+        store = StateStore(tmp_path / "state.db")
+        handles = store.namespace("handles", ttl=timedelta(hours=1))
+        feeds = store.namespace("feeds", max_entries=2)
+
+        handles.set("a", "did:plc:a")
+        handles.set("b", "did:plc:b", ttl=timedelta(days=1))
+        for i, channel in enumerate(["c1", "c2", "c3"]):
+            feeds.set(channel, {"etag": str(i)})
+            virtual_clock.advance(timedelta(minutes=1))
+
+        assert feeds.items() == {"c2": {"etag": "1"}, "c3": {"etag": "2"}}
+        assert handles.get_many(["a", "b", "missing"]) == {"a": "did:plc:a", "b": "did:plc:b"}
+        virtual_clock.advance(timedelta(hours=2))
+        assert handles.get("a") is None
+        assert handles.items() == {"b": "did:plc:b"}
+        store.close()
+
+        # Closed, the store is a single file, and reopens with the same entries
+        assert sorted(path.name for path in tmp_path.iterdir()) == ["state.db"]
+        store = StateStore(tmp_path / "state.db")
+        assert store.namespaces() == {"feeds": 2, "handles": 2}
+        assert store.namespace("feeds").get("c3") == {"etag": "2"}
+
+def test_overlapping_writers_keep_every_entry(tmp_path):
+    """Test that several connections writing at once all land, without lock errors."""
+    def write(worker):
+        store = StateStore(tmp_path / "state.db")
+        namespace = store.namespace("runs")
+        for i in range(50):
+            namespace.set(f"{worker}-{i}", i)
+        store.close()
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(write, range(4)))
+    assert len(StateStore(tmp_path / "state.db").namespace("runs").items()) == 200
+
+def test_save_json_creates_private_files_private(tmp_path):
+    """Test that a file saved with a mode never has looser permissions, even over a leftover temporary file."""
+    path = tmp_path / "session.json"
+    (tmp_path / "session.json.tmp").write_text("{}")
+    (tmp_path / "session.json.tmp").chmod(0o644)
+    save_json(path, {"session": "secret"}, mode=0o600)
+    assert path.stat().st_mode & 0o777 == 0o600
+    assert json.loads(path.read_text()) == {"session": "secret"}
+    assert not (tmp_path / "session.json.tmp").exists()
@@ -0,0 +1,59 @@
+from script.models import Channel
+from script.team_index import TeamIndex, normalize_team_name
+
+CHANNELS = {
+    "Gloucestershire": Channel(
+        name="Gloucestershire CCC",
+        youtubeChannelId="glos",
+        nicknames=["Gloucestershire", "The Shire"],
+        uploadsPlaylistId="playlist1",
+        abbr="Gloucs",
+        abbr3="GLO"
+    ),
+    "Nottinghamshire": Channel(
+        name="Nottinghamshire CCC",
+        youtubeChannelId="notts",
+        nicknames=["Nottinghamshire", "The Outlaws"],
+        uploadsPlaylistId="playlist2",
+        abbr="Notts",
+        abbr3="NOT"
+    ),
+}
+
+def test_normalize_team_name_drops_side_suffixes():
+    """Test that suffixes naming the side rather than the county are ignored."""
+    assert normalize_team_name("Nottinghamshire Women") == "nottinghamshire"
+    assert normalize_team_name("Notts 2nd XI") == "notts"
+    assert normalize_team_name("Gloucestershire CCC") == "gloucestershire"
+
+def test_resolves_variants_and_memoizes_to_disk(tmp_path):
+    """Test fuzzy matches are memoized and unmatched names are reported."""
+    cache_file = tmp_path / "team-names.json"
+    index = TeamIndex(CHANNELS, cache_file)
+    assert index.resolve("Nottinghamshire Women") == "Nottinghamshire"
+    assert index.resolve("Glouchestershire") == "Gloucestershire"
+    assert index.resolve("Tbc") is None
+    assert index.report() == {
+        "resolved": {"Glouchestershire": "Gloucestershire"},
+        "unresolved": ["Tbc"],
+    }
+
+    # A new index reuses the memoized results without matching again
+    reloaded = TeamIndex(CHANNELS, cache_file)
+    reloaded.fuzzy_match = None
+    assert reloaded.resolve("Glouchestershire") == "Gloucestershire"
+    assert reloaded.unresolved == {"Tbc"}
+
+def test_memo_is_dropped_when_aliases_change(tmp_path):
+    """Test that memoized results don't outlive the channels they were made from."""
+    cache_file = tmp_path / "team-names.json"
+    TeamIndex(CHANNELS, cache_file).resolve("Glouchestershire")
+    changed = {"Nottinghamshire": CHANNELS["Nottinghamshire"]}
+    assert TeamIndex(changed, cache_file).resolve("Glouchestershire") is None
+
+def test_unknown_team_sharing_a_common_word_stays_unresolved(mock_channels):
+    """Test that a name is only matched on a word that tells the teams apart."""
+    index = TeamIndex(mock_channels, cache_file=None)
+    assert index.resolve("Team C") is None
+    assert index.resolve("Team A Nicknam") == "team1"
+    assert index.report()["unresolved"] == ["Team C"]
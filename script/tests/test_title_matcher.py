@@ -0,0 +1,76 @@
+from datetime import date, datetime, timezone
+# Models come from title_matcher so they're the same classes it validates against
+from script.title_matcher import Automaton, Channel, Fixture, TitleMatcher, normalize
+
+CHANNELS = {
+    "Derbyshire": Channel(
+        name="Derbyshire CCC",
+        youtubeChannelId="derbys",
+        nicknames=["Derbyshire", "The Falcons"],
+        uploadsPlaylistId="playlist1",
+        abbr="Derbys",
+        abbr3="DER"
+    ),
+    "Nottinghamshire": Channel(
+        name="Nottinghamshire CCC",
+        youtubeChannelId="notts",
+        nicknames=["Nottinghamshire", "The Outlaws"],
+        uploadsPlaylistId="playlist2",
+        abbr="Notts",
+        abbr3="NOT"
+    ),
+    "Yorkshire": Channel(
+        name="Yorkshire CCC",
+        youtubeChannelId="yorks",
+        nicknames=["Yorkshire"],
+        uploadsPlaylistId="playlist3",
+        abbr="Yorks",
+        abbr3="YOR"
+    ),
+}
+
+def make_fixture(match_id, home_team, away_team, competition="T20 Blast", start_time_gmt="18:30"):
+    return Fixture(
+        match_id=match_id,
+        competition=competition,
+        home_team=home_team,
+        away_team=away_team,
+        start_date=date(2025, 6, 1),
+        end_date=date(2025, 6, 1),
+        start_time_gmt=start_time_gmt,
+        venue="Ground"
+    )
+
+def test_automaton_finds_overlapping_patterns():
+    """Test that every pattern is found in one pass, including overlapping ones."""
+    automaton = Automaton([("he", 1), ("she", 2), ("his", 3), ("hers", 4)])
+    assert sorted(automaton.search("ushers")) == [1, 2, 4]
+
+def test_normalize_only_matches_whole_words_and_capital_abbreviations():
+    """Test that abbreviations don't match inside words or as ordinary words."""
+    matcher = TitleMatcher(CHANNELS)
+    assert matcher.scan("DER v NOT - Vitality Blast") == ({"derbys", "notts"}, {"T20 Blast"})
+    assert matcher.scan("Not out! Under the lights") == (set(), set())
+    assert normalize("The Falcons: LIVE!") == " the falcons live "
+
+def test_matches_away_team_channel():
+    """Test that a stream on the away team's channel is matched if it names a team."""
+    matcher = TitleMatcher(CHANNELS)
+    fixtures = [make_fixture("match1", "Yorkshire", "Nottinghamshire")]
+    assert matcher.match("LIVE: Yorkshire v Notts Outlaws", "notts", fixtures).match_id == "match1"
+    assert matcher.match("Members' forum", "notts", fixtures) is None
+
+def test_matches_double_header_by_teams_and_time():
+    """Test that a channel streaming two fixtures in a day gets each one right."""
+    matcher = TitleMatcher(CHANNELS)
+    fixtures = [
+        make_fixture("match1", "Derbyshire", "Yorkshire", start_time_gmt="14:30"),
+        make_fixture("match2", "Derbyshire", "Nottinghamshire", start_time_gmt="18:30"),
+    ]
+    afternoon = datetime(2025, 6, 1, 14, 15, tzinfo=timezone.utc)
+    evening = datetime(2025, 6, 1, 18, 15, tzinfo=timezone.utc)
+    assert matcher.match("Derbyshire v Yorkshire", "derbys", fixtures, evening).match_id == "match1"
+    assert matcher.match("Derbyshire v Notts", "derbys", fixtures, afternoon).match_id == "match2"
+    # With nothing in the title, the start time decides
+    assert matcher.match("Falcons TV live", "derbys", fixtures, afternoon).match_id == "match1"
+    assert matcher.match("Falcons TV live", "derbys", fixtures, evening).match_id == "match2"
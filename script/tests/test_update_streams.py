@@ -1,9 +1,20 @@
 from unittest.mock import patch
 import json
+from datetime import datetime, time, timedelta, timezone
 from script.update_streams import (
     load_channels,
     get_channel_id_for_team,
-    get_new_streams
+    get_new_streams,
+    next_poll_interval,
+    write_health_file,
+    create_placeholder_streams,
+    format_streams_for_output,
+    StreamRecord,
+    Fixture,
+    Channel,
+    DAEMON_MIN_INTERVAL,
+    DAEMON_MAX_INTERVAL,
+    DAEMON_START_WINDOW
 )
 
 @patch('builtins.open')
@@ -78,4 +89,41 @@ def test_load_channels_error(mock_json_load, mock_open):
     mock_open.side_effect = None
     mock_json_load.side_effect = json.JSONDecodeError("", "", 0)
     channels = load_channels()
-    assert channels == {} 
\ No newline at end of file
+    assert channels == {} 
+
+def test_next_poll_interval_tight_around_start(mock_fixtures):
+    """Test the daemon polls tightly when a fixture is about to start without a stream."""
+    now = datetime.combine(mock_fixtures[0].start_date, time(10, 45), tzinfo=timezone.utc)
+    assert next_poll_interval(mock_fixtures, [], [], now) == DAEMON_MIN_INTERVAL
+
+def test_next_poll_interval_relaxed_before_window(mock_fixtures):
+    """Test the daemon sleeps until the start window opens."""
+    now = datetime.combine(mock_fixtures[0].start_date, time(10, 0), tzinfo=timezone.utc)
+    interval = next_poll_interval(mock_fixtures, [], [], now)
+    assert interval == (timedelta(hours=1) - DAEMON_START_WINDOW).total_seconds()
+
+def test_next_poll_interval_no_fixtures():
+    """Test the daemon relaxes when there is nothing to find today."""
+    now = datetime(2024, 4, 7, 12, 0, tzinfo=timezone.utc)
+    assert next_poll_interval([], [], [], now) == DAEMON_MAX_INTERVAL
+
+def test_write_health_file(tmp_path):
+    """Test the health file is written as JSON."""
+    health_file = tmp_path / "health.json"
+    write_health_file(health_file, {"status": "ok", "consecutiveFailures": 0})
+    assert json.loads(health_file.read_text()) == {"status": "ok", "consecutiveFailures": 0}
+
+def test_placeholders_and_output_from_stream_records(mock_fixtures, mock_channels):
+    """Test placeholders are only made for fixtures without a stream from either channel."""
+    # Models come from update_streams so they're the same classes it validates against
+    fixtures = [Fixture(**f.model_dump()) for f in mock_fixtures]
+    channels = {key: Channel(**c.model_dump()) for key, c in mock_channels.items()}
+    # match1 is being streamed by the away team's channel
+    live = [StreamRecord(fixture=fixtures[0], video_id="video1", title="Live", channel_id="channel2")]
+    placeholders = create_placeholder_streams(fixtures, channels, live, [])
+    assert [p.fixture.match_id for p in placeholders] == ["match2"]
+
+    output = format_streams_for_output(live, [], placeholders)
+    assert output.streams["match1"].video_id == "video1"
+    assert output.streams["match2"].video_id is None
+    assert output.streams["match2"].standard_title == "Team B vs Team C"
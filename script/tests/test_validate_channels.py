@@ -0,0 +1,82 @@
+import json
+from unittest.mock import patch, MagicMock
+import pytest
+from script import validate_channels as vc
+
+def channel_item(channel_id, title, uploads):
+    return {
+        "id": channel_id,
+        "snippet": {"title": title},
+        "contentDetails": {"relatedPlaylists": {"uploads": uploads}},
+    }
+
+@pytest.fixture
+def channels_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    channels = {
+        f"County{i}": {
+            "name": f"County {i} CCC",
+            "youtubeChannelId": f"UC{i}",
+            "uploadsPlaylistId": f"UU{i}",
+        }
+        for i in range(60)
+    }
+    (tmp_path / "channels.json").write_text(json.dumps(channels))
+    return tmp_path / "channels.json"
+
+def test_channels_are_looked_up_in_batches(channels_file, tmp_path):
+    """Test that 60 channels take two channels.list calls and nothing is rewritten."""
+    mock_youtube = MagicMock()
+    mock_youtube.channels().list().execute.side_effect = [
+        {"items": [channel_item(f"UC{i}", f"County {i} CCC", f"UU{i}") for i in range(50)]},
+        {"items": [channel_item(f"UC{i}", f"County {i} CCC", f"UU{i}") for i in range(50, 60)]},
+    ]
+    before = channels_file.read_text()
+    searcher = vc.ChannelSearcher(store=vc.StateStore(tmp_path / "state.db"))
+
+    with patch.object(vc, "youtube", mock_youtube):
+        report = vc.validate_channels(searcher)
+
+    assert mock_youtube.channels().list().execute.call_count == 2
+    assert report["changed"] is False
+    assert report["missing"] == [] and report["mismatches"] == []
+    assert channels_file.read_text() == before
+
+def test_report_is_written_when_the_lookup_fails(channels_file, tmp_path, monkeypatch):
+    """Test that the report and workflow output are written when channels can't be looked up."""
+    monkeypatch.setenv("GITHUB_OUTPUT", str(tmp_path / "output"))
+    mock_youtube = MagicMock()
+    mock_youtube.channels().list().execute.side_effect = TimeoutError("timed out")
+    searcher = vc.ChannelSearcher(store=vc.StateStore(tmp_path / "state.db"))
+
+    with patch.object(vc, "youtube", mock_youtube):
+        report = vc.validate_channels(searcher, report_file=tmp_path / "report.json")
+
+    assert report["error"] == "timed out"
+    assert json.loads((tmp_path / "report.json").read_text()) == report
+    assert (tmp_path / "output").read_text() == "changed=false\n"
+
+def test_searches_are_cached_and_capped(tmp_path):
+    """Test the search fallback reuses cached results and respects the quota cap."""
+    mock_youtube = MagicMock()
+    mock_youtube.search().list().execute.return_value = {
+        "items": [{"snippet": {"channelId": "UCnew", "title": "Found"}}]
+    }
+    store = vc.StateStore(tmp_path / "state.db")
+
+    with patch.object(vc, "youtube", mock_youtube):
+        # A search that times out is reported like an API error, not raised
+        mock_youtube.search().list().execute.side_effect = TimeoutError("timed out")
+        searcher = vc.ChannelSearcher(quota_cap=vc.SEARCH_COST, store=store)
+        assert searcher.search_all(["Alpha"]) == {"Alpha": None}
+        mock_youtube.search().list().execute.side_effect = None
+
+        searcher = vc.ChannelSearcher(quota_cap=vc.SEARCH_COST, store=store)
+        results = searcher.search_all(["Alpha", "Beta"])
+        assert results["Alpha"][0]["snippet"]["channelId"] == "UCnew"
+        assert results["Beta"] is None
+        assert searcher.skipped == ["Beta"]
+
+        searcher = vc.ChannelSearcher(quota_cap=0, store=store)
+        assert searcher.search_all(["Alpha"])["Alpha"][0]["snippet"]["title"] == "Found"
+        assert searcher.quota_used == 0
@@ -0,0 +1,128 @@
+import time
+import threading
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+from script.websub import (
+    WebSubReceiver,
+    LocalHub,
+    WEBSUB_LEASE_SECONDS,
+    parse_notification,
+    build_notification,
+    load_leases,
+    load_pending,
+    renew_leases,
+    subscribe,
+    topic_for_channel,
+)
+# The clock comes from websub so it's the same module the receiver reads
+from script.websub import clock
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+def test_parse_notification():
+    """Test parsing video and channel IDs from an Atom notification."""
+    body = build_notification("video1", "channel1", "Team A vs Team B")
+    assert parse_notification(body) == [("video1", "channel1")]
+
+def test_parse_notification_ignores_invalid_xml():
+    """Test that malformed notifications are ignored."""
+    assert parse_notification(b"<feed") == []
+
+def test_verify_rejects_unknown_topic(mock_channels, tmp_path):
+    """Test that verification is refused for topics we didn't subscribe to."""
+    receiver = WebSubReceiver(mock_channels, host="127.0.0.1", port=0, leases_file=tmp_path / "leases.json")
+    try:
+        status, _ = receiver.verify({
+            "hub.mode": "subscribe",
+            "hub.topic": topic_for_channel("unknown"),
+            "hub.challenge": "abc",
+        })
+        assert status == 404
+    finally:
+        receiver.server.server_close()
+
+def test_verify_only_confirms_requests_we_sent(mock_channels, tmp_path):
+    """Test that forged verifications are refused, and a lease is capped at the one requested."""
+    leases_file = tmp_path / "leases.json"
+    pending_file = tmp_path / "pending.json"
+    topic = topic_for_channel("channel1")
+    receiver = WebSubReceiver(
+        mock_channels, host="127.0.0.1", port=0, leases_file=leases_file, pending_file=pending_file
+    )
+    start = datetime(2025, 6, 1, 12, 0, tzinfo=timezone.utc)
+    try:
+        with clock.use_clock(clock.VirtualClock(start)):
+            def verify(mode, lease_seconds="999999999"):
+                return receiver.verify({
+                    "hub.mode": mode,
+                    "hub.topic": topic,
+                    "hub.challenge": "abc",
+                    "hub.lease_seconds": lease_seconds,
+                })
+
+            assert verify("subscribe")[0] == 404
+            assert load_leases(leases_file) == {}
+
+            with patch("script.websub.requests.post"):
+                assert subscribe("channel1", "http://callback/", pending_file=pending_file)
+            assert verify("subscribe", "soon") == (400, "")
+            assert verify("unsubscribe")[0] == 404
+            assert verify("subscribe") == (200, "abc")
+            assert load_leases(leases_file) == {
+                topic: (start + timedelta(seconds=WEBSUB_LEASE_SECONDS)).isoformat()
+            }
+            assert load_pending(pending_file) == {}
+
+            # Each request is confirmed once, and unsubscribes we didn't send never are
+            assert verify("subscribe")[0] == 404
+            assert verify("unsubscribe")[0] == 404
+            assert topic in load_leases(leases_file)
+    finally:
+        receiver.server.server_close()
+
+def test_local_hub_round_trip(mock_channels, tmp_path):
+    """Test subscribing through the local hub and receiving a signed notification."""
+    announced = []
+    received = threading.Event()
+
+    def on_videos(video_ids):
+        announced.extend(video_ids)
+        received.set()
+
+    leases_file = tmp_path / "leases.json"
+    receiver = WebSubReceiver(
+        mock_channels,
+        host="127.0.0.1",
+        port=0,
+        secret="s3cret",
+        on_videos=on_videos,
+        leases_file=leases_file,
+        coalesce_seconds=0.1,
+        pending_file=tmp_path / "pending.json",
+    )
+    hub = LocalHub()
+    receiver.start()
+    hub.start()
+    try:
+        callback_url = f"http://127.0.0.1:{receiver.port}/"
+        renewed = renew_leases(
+            mock_channels, callback_url, hub.url, leases_file, secret="s3cret", pending_file=tmp_path / "pending.json"
+        )
+        assert sorted(renewed) == ["channel1", "channel2"]
+        assert wait_for(lambda: len(load_leases(leases_file)) == 2)
+
+        # Fresh leases don't need renewing
+        assert renew_leases(mock_channels, callback_url, hub.url, leases_file, secret="s3cret") == []
+
+        assert wait_for(lambda: hub.publish("channel1", build_notification("video1", "channel1")) == 1)
+        assert received.wait(5)
+        assert announced == ["video1"]
+    finally:
+        hub.stop()
+        receiver.stop()
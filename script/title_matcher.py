@@ -0,0 +1,197 @@
+import re
+from collections import deque
+from datetime import date, datetime, time, timezone
+from typing import Hashable, Iterable, Iterator, Optional
+from competitions import load_competitions
+from models import Channel, Competition, Fixture
+from team_index import TeamIndex
+
+# Candidate fixtures are scored by how much of the title points to them
+TEAM_SCORE = 10
+COMPETITION_SCORE = 3
+HOME_CHANNEL_SCORE = 1
+# A stream starting on time scores this much, dropping by one per hour out
+MAX_TIME_SCORE = 4
+
+_NON_ALPHANUMERIC = re.compile(r"[^A-Za-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    """Normalize text for matching, so patterns only match whole words.
+
+    Text is lowercased, runs of punctuation and spaces become one space, and
+    the result is padded with spaces. Three-letter words in capitals are marked
+    with a "*", so abbreviations like "NOT" and "WAR" don't match ordinary words.
+    """
+    words = []
+    for word in _NON_ALPHANUMERIC.split(text):
+        if not word:
+            continue
+        if len(word) == 3 and word.isupper() and word.isalpha():
+            words.append(f"*{word.lower()}")
+        else:
+            words.append(word.lower())
+    return f" {' '.join(words)} "
+
+
+def get_fixture_start_time(fixture: Fixture, day: date) -> Optional[datetime]:
+    """Get the scheduled start of a fixture on the given day, in UTC."""
+    try:
+        hours, minutes = (int(part) for part in fixture.start_time_gmt.split(":")[:2])
+    except ValueError:
+        return None
+    return datetime.combine(day, time(hours, minutes), tzinfo=timezone.utc)
+
+
+class Automaton:
+    """Aho-Corasick automaton that finds every pattern in a text in one pass.
+
+    Building it is linear in the total length of the patterns, and a search is
+    linear in the length of the text plus the number of matches, however many
+    patterns there are.
+    """
+
+    def __init__(self, patterns: Iterable[tuple[str, Hashable]]):
+        self.goto: list[dict[str, int]] = [{}]
+        self.fail: list[int] = [0]
+        self.output: list[set[Hashable]] = [set()]
+
+        for pattern, value in patterns:
+            state = 0
+            for char in pattern:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(set())
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.output[state].add(value)
+
+        # Breadth-first, so each state's fail link is set before its children's
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.output[child] |= self.output[self.fail[child]]
+
+    def search(self, text: str) -> Iterator[Hashable]:
+        """Yield the value of every pattern found in the text."""
+        state = 0
+        for char in text:
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            yield from self.output[state]
+
+
+class TitleMatcher:
+    """Maps stream titles to fixtures.
+
+    Every team name, nickname and abbreviation in channels.json, and every
+    competition keyword in competitions.json, is compiled into one automaton. A title is scanned once,
+    and the fixtures the stream's channel is playing in are scored by the teams
+    and competition found and how close the stream starts to the fixture.
+    """
+
+    def __init__(
+        self,
+        channels: dict[str, Channel],
+        team_index: Optional[TeamIndex] = None,
+        competitions: Optional[list[Competition]] = None,
+    ):
+        self.channels = channels
+        # Fixture team names are resolved through the team index, without memoizing by default
+        self.team_index = team_index or TeamIndex(channels, cache_file=None)
+        patterns = []
+        for channel in channels.values():
+            names = [channel.name, *channel.nicknames, channel.abbr, channel.abbr3]
+            for name in names:
+                if not name:
+                    continue
+                patterns.append((normalize(name), ("team", channel.youtube_channel_id)))
+        for competition in competitions if competitions is not None else load_competitions():
+            for keyword in competition.keywords:
+                patterns.append((normalize(keyword), ("competition", competition.competition)))
+        self.automaton = Automaton(patterns)
+
+    def channel_id_for_team(self, team_name: str) -> Optional[str]:
+        channel = self.team_index.channel(team_name)
+        return channel.youtube_channel_id if channel else None
+
+    def scan(self, title: str) -> tuple[set[str], set[str]]:
+        """Find the channels of the teams and the competitions named in a title."""
+        teams = set()
+        competitions = set()
+        for kind, value in self.automaton.search(normalize(title)):
+            if kind == "team":
+                teams.add(value)
+            else:
+                competitions.add(value)
+        return teams, competitions
+
+    def score(
+        self,
+        fixture: Fixture,
+        channel_id: str,
+        teams: set[str],
+        competitions: set[str],
+        start_time: Optional[datetime] = None,
+    ) -> Optional[int]:
+        """Score how well a stream fits a fixture, or None if it can't be for it.
+
+        A stream on the home team's channel can be for any of the channel's
+        fixtures. A stream on the away team's channel must name one of the teams,
+        as away channels stream other things on match days too.
+        """
+        home_channel_id = self.channel_id_for_team(fixture.home_team)
+        away_channel_id = self.channel_id_for_team(fixture.away_team)
+        if channel_id not in (home_channel_id, away_channel_id):
+            return None
+
+        teams_found = sum(
+            1 for team_channel_id in {home_channel_id, away_channel_id}
+            if team_channel_id and team_channel_id in teams
+        )
+        is_home = channel_id == home_channel_id
+        if not is_home and not teams_found:
+            return None
+
+        score = TEAM_SCORE * teams_found
+        if fixture.competition in competitions:
+            score += COMPETITION_SCORE
+        if is_home:
+            score += HOME_CHANNEL_SCORE
+        if start_time:
+            day = start_time.astimezone(timezone.utc).date()
+            if fixture.start_date <= day <= fixture.end_date:
+                scheduled = get_fixture_start_time(fixture, day)
+                if scheduled:
+                    hours_out = abs((start_time - scheduled).total_seconds()) / 3600
+                    score += max(0, MAX_TIME_SCORE - int(hours_out))
+        return score
+
+    def match(
+        self,
+        title: str,
+        channel_id: str,
+        fixtures: list[Fixture],
+        start_time: Optional[datetime] = None,
+    ) -> Optional[Fixture]:
+        """Find the fixture a stream on a channel is most likely for.
+
+        Ties go to the fixture with the lowest match ID, so the result doesn't
+        depend on the order of the fixtures.
+        """
+        teams, competitions = self.scan(title)
+        best = None
+        best_score = None
+        for fixture in sorted(fixtures, key=lambda f: f.match_id):
+            score = self.score(fixture, channel_id, teams, competitions, start_time)
+            if score is not None and (best_score is None or score > best_score):
+                best, best_score = fixture, score
+        return best
@@ -1,12 +1,24 @@
 import os
 import json
+import sys
+import hashlib
+import signal
+import argparse
+import threading
+from dataclasses import dataclass
 from pathlib import Path
-from datetime import datetime, timezone
+from datetime import date, datetime, time, timedelta, timezone
 from googleapiclient.discovery import build
-from atproto import Client, client_utils
+import bluesky
+import outbox
 from dotenv import load_dotenv
-from models import Channel, VideoStream, StreamsData, Fixture, StreamInfo
-from typing import Optional
+from models import Channel, StreamsData, StreamsShard, Fixture, StreamInfo
+import clock
+from state import STATE_DIR, load_json, save_json
+from feeds import FeedDiscovery
+from title_matcher import TitleMatcher, get_fixture_start_time
+from team_index import TeamIndex
+from typing import Iterator, Optional
 
 # Load environment variables
 load_dotenv()
@@ -15,9 +27,43 @@ load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 youtube = build("youtube", "v3", developerKey=GOOGLE_API_KEY)
 
-# Bluesky setup
-BLUESKY_USERNAME = os.getenv("BLUESKY_USERNAME")
-BLUESKY_PASSWORD = os.getenv("BLUESKY_PASSWORD")
+# Discovery backend: "feeds" uses the quota-free Atom feeds, "playlist" the uploads playlists
+DISCOVERY_BACKEND = os.getenv("DISCOVERY_BACKEND", "feeds")
+# How far back to page through uploads playlists for scheduled and live streams
+PLAYLIST_LOOKBACK = timedelta(days=int(os.getenv("PLAYLIST_LOOKBACK_DAYS", "7")))
+
+# Daemon setup
+HEALTH_FILE = STATE_DIR / "daemon-health.json"
+DAEMON_MIN_INTERVAL = int(os.getenv("DAEMON_MIN_INTERVAL", "60"))
+DAEMON_LATE_INTERVAL = int(os.getenv("DAEMON_LATE_INTERVAL", "300"))
+DAEMON_MAX_INTERVAL = int(os.getenv("DAEMON_MAX_INTERVAL", "1800"))
+DAEMON_START_WINDOW = timedelta(minutes=int(os.getenv("DAEMON_START_WINDOW_MINUTES", "45")))
+
+# Sharded polling: each worker writes its partial streams here for the merge step
+SHARDS_DIR = STATE_DIR / "shards"
+
+# Look-ahead: streams scheduled for the coming days, found off-peak and checked by ID on the day
+LOOKAHEAD_FILE = STATE_DIR / "lookahead-streams.json"
+LOOKAHEAD_DAYS = int(os.getenv("LOOKAHEAD_DAYS", "2"))
+
+# Clients and caches kept between polls so a resident process stays warm
+_feed_discovery: Optional[FeedDiscovery] = None
+_title_matcher: Optional[TitleMatcher] = None
+_team_index: Optional[TeamIndex] = None
+
+@dataclass(slots=True)
+class StreamRecord:
+    """A stream, or a placeholder for one, found for one of today's fixtures.
+
+    Discovery passes these compact records around instead of Pydantic models,
+    which are only used for the fixtures read in and the streams written out.
+    Records point at their fixture rather than copying it.
+    """
+    fixture: Fixture
+    video_id: Optional[str]
+    title: str
+    channel_id: str
+    scheduled_start_time: Optional[datetime] = None
 
 def load_channels() -> dict[str, Channel]:
     """Load channels from channels.json file."""
@@ -28,14 +74,14 @@ def load_channels() -> dict[str, Channel]:
     except (FileNotFoundError, json.JSONDecodeError):
         return {}
 
-def load_fixtures() -> list[Fixture]:
-    """Load fixtures from today's fixtures file."""
+def load_fixtures(day: Optional[date] = None) -> list[Fixture]:
+    """Load fixtures from a day's fixtures file, today's by default."""
     fixtures_dir = Path("public/data/fixtures")
     if not fixtures_dir.exists():
         return []
         
-    today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-    fixtures_file = fixtures_dir / f"{today}.json"
+    day = day or clock.today()
+    fixtures_file = fixtures_dir / f"{day.strftime('%Y-%m-%d')}.json"
     
     if not fixtures_file.exists():
         return []
@@ -52,7 +98,7 @@ def load_existing_streams() -> StreamsData:
     streams_file = Path("public/data/streams.json")
     if not streams_file.exists():
         return StreamsData(
-            last_updated=datetime.now(timezone.utc),
+            last_updated=clock.now(),
             streams={}
         )
         
@@ -62,34 +108,73 @@ def load_existing_streams() -> StreamsData:
             return StreamsData(**data)
     except json.JSONDecodeError:
         return StreamsData(
-            last_updated=datetime.now(timezone.utc),
+            last_updated=clock.now(),
             streams={}
         )
 
+def get_team_index(channels: dict[str, Channel]) -> TeamIndex:
+    """Get the team name index for the channels, only rebuilding it when they change."""
+    global _team_index
+    if _team_index is None or _team_index.channels is not channels:
+        _team_index = TeamIndex(channels)
+    return _team_index
+
 def get_channel_id_for_team(team_name: str, channels: dict[str, Channel]) -> Optional[str]:
-    for channel in channels.values():
-        if team_name == channel.name or team_name in channel.nicknames:
-            return channel.youtube_channel_id
-    return None
-
-def get_live_streams(fixtures: list[Fixture], channels: dict[str, Channel]) -> tuple[list[VideoStream], list[VideoStream]]:
-    live_streams = []
-    upcoming_matches = []
-    all_video_ids = []
-    current_time = datetime.now(timezone.utc)
-    
-    # Create a set of channels that are actually playing today
+    channel = get_team_index(channels).channel(team_name)
+    return channel.youtube_channel_id if channel else None
+
+def get_active_channel_ids(fixtures: list[Fixture], channels: dict[str, Channel]) -> set[str]:
+    """Get the set of channels that are actually playing today, home or away."""
     active_channels = set()
     for fixture in fixtures:
-        channel_id = get_channel_id_for_team(fixture.home_team, channels)
-        if channel_id:
-            active_channels.add(channel_id)
-    
-    # Keep track of matches we've already processed
-    processed_match_ids = set()
-    
+        for team in (fixture.home_team, fixture.away_team):
+            channel_id = get_channel_id_for_team(team, channels)
+            if channel_id:
+                active_channels.add(channel_id)
+    return active_channels
+
+def iter_playlist_items(
+    playlist_id: str,
+    published_after: Optional[datetime] = None,
+    http=None
+) -> Iterator[tuple[str, Optional[datetime]]]:
+    """Yield (video_id, published_at) from a playlist, newest first, across pages.
+
+    Uploads playlists are ordered newest first, so scanning stops at the first
+    page that reaches videos published before the cutoff. Those older videos
+    aren't yielded. Pass an http object to run requests on their own connection
+    when scanning from several threads.
+    """
+    page_token = None
+    while True:
+        playlist_request = youtube.playlistItems().list(
+            part="contentDetails",
+            playlistId=playlist_id,
+            maxResults=50,  # Maximum allowed
+            pageToken=page_token
+        )
+        playlist_response = playlist_request.execute(http=http)
+
+        reached_cutoff = False
+        for item in playlist_response.get("items", []):
+            published = item["contentDetails"].get("videoPublishedAt")
+            published_at = datetime.fromisoformat(published.replace("Z", "+00:00")) if published else None
+            if published_after and published_at and published_at < published_after:
+                reached_cutoff = True
+                continue
+            yield item["contentDetails"]["videoId"], published_at
+
+        page_token = playlist_response.get("nextPageToken")
+        if reached_cutoff or not page_token:
+            return
+
+def get_uploads_video_ids(channel_ids: set[str], channels: dict[str, Channel]) -> list[str]:
+    """Get the recent video IDs from each channel's uploads playlist."""
+    all_video_ids = []
+    published_after = clock.now() - PLAYLIST_LOOKBACK
+
     # For each active channel, get their uploads playlist
-    for channel_id in active_channels:
+    for channel_id in channel_ids:
         try:
             # Get the channel's uploads playlist ID from the channel data
             channel = next((ch for ch in channels.values() if ch.youtube_channel_id == channel_id), None)
@@ -99,137 +184,284 @@ def get_live_streams(fixtures: list[Fixture], channels: dict[str, Channel]) -> t
                 
             uploads_playlist_id = channel.uploads_playlist_id
             
-            # Get videos from uploads playlist
-            playlist_request = youtube.playlistItems().list(
-                part="contentDetails",
-                playlistId=uploads_playlist_id,
-                maxResults=50  # Maximum allowed
-            )
-            playlist_response = playlist_request.execute()
-            
-            for item in playlist_response.get("items", []):
-                all_video_ids.append(item["contentDetails"]["videoId"])
+            # Get videos from uploads playlist, paging back until the lookback cutoff
+            for video_id, _ in iter_playlist_items(uploads_playlist_id, published_after):
+                all_video_ids.append(video_id)
                 
         except Exception as e:
             print(f"Error getting playlist for channel {channel_id}: {str(e)}")
             if "quotaExceeded" in str(e):
                 print("YouTube API quota exceeded. Some streams may be missing.")
                 break
-    
-    # Get video details in batches of 50 (YouTube API limit)
-    for i in range(0, len(all_video_ids), 50):
-        batch = all_video_ids[i:i + 50]
+
+    return all_video_ids
+
+def fetch_video_details(video_ids: list[str]) -> list[dict]:
+    """Look up the snippet and live streaming details of each video, 50 at a time."""
+    items = []
+    for i in range(0, len(video_ids), 50):
+        batch = video_ids[i:i + 50]
         try:
             video_request = youtube.videos().list(
                 part="snippet,liveStreamingDetails",
                 id=",".join(batch)
             )
-            video_response = video_request.execute()
-            
-            for item in video_response.get("items", []):
-                video_id = item["id"]
-                snippet = item["snippet"]
-                live_details = item.get("liveStreamingDetails", {})
-                
-                # Find the matching fixture for this channel
-                matching_fixture = next(
-                    (f for f in fixtures if get_channel_id_for_team(f.home_team, channels) == snippet["channelId"]),
-                    None
-                )
-                
-                if not matching_fixture:
-                    continue
-
-                # Skip if we've already processed this match
-                match_id = matching_fixture.match_id
-                if match_id in processed_match_ids:
-                    continue
-                
-                # Check for live stream (must have actualStartTime but no actualEndTime)
-                if live_details.get("actualStartTime") and not live_details.get("actualEndTime"):
-                    stream_data = VideoStream(
-                        video_id=video_id,
-                        title=snippet["title"],
-                        channel_name=next(
-                            ch.name
-                            for ch in channels.values()
-                            if ch.youtube_channel_id == snippet["channelId"]
-                        ),
-                        channel_id=snippet["channelId"],
-                        description=snippet["description"],
-                        published_at=snippet["publishedAt"],
-                        fixture=matching_fixture
-                    )
-                    live_streams.append(stream_data)
-                    processed_match_ids.add(match_id)
-                
-                # Only check for upcoming if not already live
-                elif match_id not in processed_match_ids and live_details.get("scheduledStartTime"):
-                    scheduled_time = datetime.fromisoformat(
-                        live_details["scheduledStartTime"].replace("Z", "+00:00")
-                    )
-                    if scheduled_time > current_time:
-                        match_data = VideoStream(
-                            video_id=video_id,
-                            title=snippet["title"],
-                            channel_name=next(
-                                ch.name
-                                for ch in channels.values()
-                                if ch.youtube_channel_id == snippet["channelId"]
-                            ),
-                            channel_id=snippet["channelId"],
-                            description=snippet["description"],
-                            scheduled_start_time=live_details["scheduledStartTime"],
-                            fixture=matching_fixture
-                        )
-                        upcoming_matches.append(match_data)
-                        processed_match_ids.add(match_id)
-                            
+            items.extend(video_request.execute().get("items", []))
         except Exception as e:
             print(f"Error fetching video details: {str(e)}")
             if "quotaExceeded" in str(e):
                 print("YouTube API quota exceeded. Some streams may be missing.")
                 break
+    return items
+
+def match_video_streams(
+    items: list[dict],
+    fixtures: list[Fixture],
+    channels: dict[str, Channel],
+    settled_video_ids: Optional[set[str]] = None
+) -> tuple[list[StreamRecord], list[StreamRecord]]:
+    """Match videos' details to fixtures, as live and upcoming streams.
+
+    If settled_video_ids is given, it's filled with the videos that can never
+    become a live stream: plain uploads and broadcasts that have ended.
+    """
+    current_time = clock.now()
+    title_matcher = get_title_matcher(channels)
+    
+    # The stream chosen for each match so far, with its rank and whether it's live
+    chosen: dict[str, tuple[tuple, StreamRecord, bool]] = {}
+    
+    for item in items:
+        video_id = item["id"]
+        snippet = item["snippet"]
+        live_details = item.get("liveStreamingDetails", {})
+
+        if settled_video_ids is not None and (
+            not live_details or live_details.get("actualEndTime")
+        ):
+            settled_video_ids.add(video_id)
+        
+        # Only live streams and streams scheduled for later can be shown
+        is_live = bool(live_details.get("actualStartTime")) and not live_details.get("actualEndTime")
+        scheduled_time = None
+        if not is_live and live_details.get("scheduledStartTime"):
+            scheduled_time = datetime.fromisoformat(
+                live_details["scheduledStartTime"].replace("Z", "+00:00")
+            )
+            if scheduled_time <= current_time:
+                continue
+        elif not is_live:
+            continue
+
+        # Find the fixture this stream is for from its title, channel and start time
+        start_time = live_details.get("actualStartTime") or live_details.get("scheduledStartTime")
+        matching_fixture = title_matcher.match(
+            snippet["title"],
+            snippet["channelId"],
+            fixtures,
+            datetime.fromisoformat(start_time.replace("Z", "+00:00")) if start_time else None
+        )
+        
+        if not matching_fixture:
+            continue
+
+        # A match streamed more than once, like on both teams' channels, gets
+        # the same stream whatever order the videos were found in: a live one,
+        # then the home channel's, then the lowest video ID
+        match_id = matching_fixture.match_id
+        home_channel_id = get_channel_id_for_team(matching_fixture.home_team, channels)
+        rank = (not is_live, snippet["channelId"] != home_channel_id, video_id)
+        if match_id in chosen and chosen[match_id][0] <= rank:
+            continue
+        
+        stream = StreamRecord(
+            fixture=matching_fixture,
+            video_id=video_id,
+            title=snippet["title"],
+            channel_id=sys.intern(snippet["channelId"]),
+            scheduled_start_time=scheduled_time
+        )
+        chosen[match_id] = (rank, stream, is_live)
             
+    live_streams = [stream for _, stream, is_live in chosen.values() if is_live]
+    upcoming_matches = [stream for _, stream, is_live in chosen.values() if not is_live]
     return live_streams, upcoming_matches
 
+def get_video_streams(
+    video_ids: list[str],
+    fixtures: list[Fixture],
+    channels: dict[str, Channel],
+    settled_video_ids: Optional[set[str]] = None
+) -> tuple[list[StreamRecord], list[StreamRecord]]:
+    """Look up video details and match live and upcoming streams to fixtures."""
+    return match_video_streams(fetch_video_details(video_ids), fixtures, channels, settled_video_ids)
+
+def get_title_matcher(channels: dict[str, Channel]) -> TitleMatcher:
+    """Get the title matcher for the channels, only rebuilding it when they change."""
+    global _title_matcher
+    if _title_matcher is None or _title_matcher.channels is not channels:
+        _title_matcher = TitleMatcher(channels, get_team_index(channels))
+    return _title_matcher
+
+def get_feed_discovery() -> FeedDiscovery:
+    """Get the feed discovery backend, keeping its state in memory between polls."""
+    global _feed_discovery
+    if _feed_discovery is None:
+        _feed_discovery = FeedDiscovery()
+    return _feed_discovery
+
+def discover_video_ids(
+    channel_ids: set[str],
+    channels: dict[str, Channel],
+    feed_discovery: Optional[FeedDiscovery] = None
+) -> tuple[list[str], Optional[FeedDiscovery]]:
+    """Get the recent video IDs on the channels from the configured discovery backend.
+
+    Returns the feed discovery used, if any, so the videos that turn out to be
+    settled can be marked on it.
+    """
+    if DISCOVERY_BACKEND != "feeds":
+        return get_uploads_video_ids(channel_ids, channels), None
+
+    # Discover from the quota-free feeds, falling back to the uploads playlist
+    # for channels whose feed failed
+    feed_discovery = feed_discovery or get_feed_discovery()
+    video_ids, fallback_channels = feed_discovery.discover(channel_ids)
+    if fallback_channels:
+        video_ids += get_uploads_video_ids(fallback_channels, channels)
+    return video_ids, feed_discovery
+
+def load_lookahead_streams(day: date, lookahead_file: Optional[Path] = None) -> dict[str, str]:
+    """Get the video IDs of the streams found in advance for a day's matches, by match ID."""
+    lookahead = load_json(lookahead_file or LOOKAHEAD_FILE, {})
+    return {
+        match_id: stream["videoId"]
+        for match_id, stream in lookahead.get(day.isoformat(), {}).items()
+    }
+
+def get_live_streams(
+    fixtures: list[Fixture],
+    channels: dict[str, Channel],
+    feed_discovery: Optional[FeedDiscovery] = None,
+    active_channels: Optional[set[str]] = None,
+    known_streams: Optional[dict[str, str]] = None
+) -> tuple[list[StreamRecord], list[StreamRecord]]:
+    """Find live and upcoming streams for the fixtures.
+
+    Only active_channels are polled if given, otherwise every channel playing
+    in the fixtures. Streams already known for the matches, by default the ones
+    the look-ahead found for today, are checked directly by video ID, and the
+    channels are only searched for the matches they don't cover.
+    """
+    if active_channels is None:
+        active_channels = get_active_channel_ids(fixtures, channels)
+    if known_streams is None:
+        known_streams = load_lookahead_streams(clock.today())
+    match_ids = {fixture.match_id for fixture in fixtures}
+    known_video_ids = sorted({video_id for match_id, video_id in known_streams.items() if match_id in match_ids})
+
+    known_live, known_upcoming = [], []
+    if known_video_ids:
+        known_live, known_upcoming = get_video_streams(known_video_ids, fixtures, channels)
+        covered = {stream.fixture.match_id for stream in known_live + known_upcoming}
+        uncovered_fixtures = [fixture for fixture in fixtures if fixture.match_id not in covered]
+        active_channels = active_channels & get_active_channel_ids(uncovered_fixtures, channels)
+        print(f"{len(covered)} of {len(fixtures)} fixtures have a stream found in advance")
+    if not active_channels:
+        return known_live, known_upcoming
+
+    video_ids, discovery = discover_video_ids(active_channels, channels, feed_discovery)
+    video_ids = [video_id for video_id in video_ids if video_id not in known_video_ids]
+    settled_video_ids = set()
+    live_streams, upcoming_matches = get_video_streams(
+        video_ids, fixtures, channels, settled_video_ids if discovery else None
+    )
+    if discovery:
+        discovery.mark_settled(settled_video_ids)
+        discovery.save()
+
+    # Streams checked by ID come first, and discovery only adds the matches they don't cover
+    covered = {stream.fixture.match_id for stream in known_live + known_upcoming}
+    return (
+        known_live + [stream for stream in live_streams if stream.fixture.match_id not in covered],
+        known_upcoming + [stream for stream in upcoming_matches if stream.fixture.match_id not in covered],
+    )
+
+def look_ahead(
+    channels: dict[str, Channel],
+    days: int = LOOKAHEAD_DAYS,
+    lookahead_file: Optional[Path] = None
+) -> dict[str, dict]:
+    """Find the streams already scheduled for the next few days' fixtures.
+
+    Meant for an off-peak run. The streams found are kept by day and match, so
+    on the day they only need checking by video ID. Days that have passed are
+    dropped, and a day's streams are replaced each time it's looked at again.
+    """
+    lookahead_file = lookahead_file or LOOKAHEAD_FILE
+    today = clock.today()
+    lookahead = {
+        day: streams for day, streams in load_json(lookahead_file, {}).items()
+        if day >= today.isoformat()
+    }
+
+    fixtures_by_day = {today + timedelta(days=offset): load_fixtures(today + timedelta(days=offset)) for offset in range(1, days + 1)}
+    all_fixtures = [fixture for fixtures in fixtures_by_day.values() for fixture in fixtures]
+    if all_fixtures:
+        # Every channel is searched and its videos looked up once, then matched against each day's fixtures in turn
+        video_ids, discovery = discover_video_ids(get_active_channel_ids(all_fixtures, channels), channels)
+        items = fetch_video_details(video_ids)
+        settled_video_ids = set()
+        for day, fixtures in fixtures_by_day.items():
+            if not fixtures:
+                lookahead.pop(day.isoformat(), None)
+                continue
+            _, upcoming_matches = match_video_streams(items, fixtures, channels, settled_video_ids)
+            lookahead[day.isoformat()] = {
+                stream.fixture.match_id: {
+                    "videoId": stream.video_id,
+                    "channelId": stream.channel_id,
+                    "title": stream.title,
+                    "scheduledStartTime": stream.scheduled_start_time.isoformat(),
+                }
+                for stream in upcoming_matches
+                if stream.scheduled_start_time.date() == day
+            }
+            print(f"Found {len(lookahead[day.isoformat()])} of {len(fixtures)} streams for {day.isoformat()} in advance")
+        if discovery:
+            discovery.mark_settled(settled_video_ids)
+            discovery.save()
+
+    save_json(lookahead_file, lookahead)
+    return lookahead
+
 def create_placeholder_streams(
     fixtures: list[Fixture],
     channels: dict[str, Channel],
-    live_streams: list[VideoStream],
-    upcoming_matches: list[VideoStream]
-) -> list[VideoStream]:
+    live_streams: list[StreamRecord],
+    upcoming_matches: list[StreamRecord]
+) -> list[StreamRecord]:
     """Create placeholder streams for fixtures without actual streams."""
     placeholders = []
+
+    # Fixtures that already have a stream, from either team's channel
+    streamed_match_ids = {stream.fixture.match_id for stream in live_streams}
+    streamed_match_ids.update(stream.fixture.match_id for stream in upcoming_matches)
     
     for fixture in fixtures:
+        if fixture.match_id in streamed_match_ids:
+            continue
+
         channel_id = get_channel_id_for_team(fixture.home_team, channels)
         if not channel_id:
             continue
             
-        # Check if we already have a stream for this fixture
-        has_stream = False
-        for stream in live_streams + upcoming_matches:
-            if stream.channel_id == channel_id:
-                has_stream = True
-                break
-                
-        if not has_stream:
-            # Create a placeholder
-            placeholder = VideoStream(
-                video_id=None,
-                title=f"{fixture.home_team} vs {fixture.away_team}",
-                channel_name=next(
-                    ch.name
-                    for ch in channels.values()
-                    if ch.youtube_channel_id == channel_id
-                ),
-                channel_id=channel_id,
-                description=f"{fixture.competition} - {fixture.venue}",
-                is_placeholder=True,
-                fixture=fixture
-            )
-            placeholders.append(placeholder)
+        placeholders.append(StreamRecord(
+            fixture=fixture,
+            video_id=None,
+            title=f"{fixture.home_team} vs {fixture.away_team}",
+            channel_id=sys.intern(channel_id)
+        ))
             
     return placeholders
 
@@ -257,137 +489,27 @@ def get_new_streams(existing_streams, new_streams):
             
     return new_fixture_streams
 
-def post_to_bluesky(match_ids: list[str], output_data: StreamsData):
-    """Post to Bluesky about newly added streams."""
-    
-    # Skip posting if SKIP_BLUESKY_POSTING is set
-    if os.getenv("SKIP_BLUESKY_POSTING", "false").lower() == "true":
-        print("Skipping Bluesky post due to SKIP_BLUESKY_POSTING environment variable")
-        return
-    
-    # Verify Bluesky credentials are set
-    if not BLUESKY_USERNAME or not BLUESKY_PASSWORD:
-        print("ERROR: Bluesky credentials not properly set")
-        return
-        
-    print(f"Attempting to post about {len(match_ids)} new streams to Bluesky")
-    
-    client = Client()
-    try:
-        print("Attempting to login to Bluesky...")
-        client.login(BLUESKY_USERNAME, BLUESKY_PASSWORD)
-        print("Successfully logged in to Bluesky")
-    except Exception as e:
-        print(f"ERROR: Failed to login to Bluesky: {str(e)}")
-        return
-    
-    # Create the post text using TextBuilder
-    text_builder = client_utils.TextBuilder()
-    text_builder.text(f"📺 New stream{ 's' if len(match_ids) > 1 else '' } posted:\n\n")
-
-    # Retrieve a list of fixture objects for the given match_ids, using the dict of match_id to fixture
-    fixtures = load_fixtures()
-    fixtures_dict = {fixture.match_id: fixture for fixture in fixtures}
-
-    fixtures_list = [fixtures_dict[match_id] for match_id in match_ids]
-
-    # Group fixtures by competition from the fixtures list
-    fixtures_by_comp = {}
-    for fixture in fixtures_list:
-        if fixture.competition not in fixtures_by_comp:
-            fixtures_by_comp[fixture.competition] = []
-        fixtures_by_comp[fixture.competition].append(fixture)
-
-    # Cache for resolved handles to avoid multiple API calls
-    resolved_handles = {}
-    
-    def resolve_handle(handle: str) -> str | None:
-        """Resolve a handle to a DID, using cache if available."""
-        if handle in resolved_handles:
-            return resolved_handles[handle]
-        try:
-            response = client.resolve_handle(handle)
-            did = response.did
-            resolved_handles[handle] = did
-            print(f"Resolved handle {handle} to {did}")
-            return did
-        except Exception as e:
-            print(f"Error resolving handle {handle}: {str(e)}")
-            return None
-    
-    # Add stream details in alphabetical order by competition
-    for comp_name in sorted(fixtures_by_comp.keys()):
-        streams = fixtures_by_comp[comp_name]
-        # Shorten competition name if needed
-        comp_short = comp_name.replace("County Championship ", "")
-        text_builder.text(f"🏏 {comp_short}\n")
-        # Sort streams by home team name
-        for stream_data in sorted(streams, key=lambda x: x.home_team):
-            text_builder.text("• ")
-            # Add home team with handle if it exists
-            if stream_data.home_bluesky_handle:
-                did = resolve_handle(stream_data.home_bluesky_handle)
-                if did:
-                    text_builder.mention(stream_data.home_team, did)
-                else:
-                    text_builder.text(stream_data.home_team)
-            else:
-                text_builder.text(stream_data.home_team)
-            text_builder.text(" vs ")
-            # Add away team with handle if it exists
-            if stream_data.away_bluesky_handle:
-                did = resolve_handle(stream_data.away_bluesky_handle)
-                if did:
-                    text_builder.mention(stream_data.away_team, did)
-                else:
-                    text_builder.text(stream_data.away_team)
-            else:
-                text_builder.text(stream_data.away_team)
-            text_builder.text(" - ")
-            video_id = output_data.streams[stream_data.match_id].video_id
-            if video_id:
-                text_builder.link("YT", f"https://youtube.com/watch?v={video_id}")
-            else:
-                text_builder.text("No stream available")
-            text_builder.text("\n")
-        text_builder.text("\n")
-    
-    # Add link at the end
-    text_builder.text("\n🔗 Watch all streams at ")
-    text_builder.link("countycricket.live", "https://countycricket.live")
-
-    if len(match_ids) > 0:
-        client.send_post(text=text_builder)
-
 def format_streams_for_output(
-    live_streams: list[VideoStream],
-    upcoming_matches: list[VideoStream],
-    placeholders: list[VideoStream]
+    live_streams: list[StreamRecord],
+    upcoming_matches: list[StreamRecord],
+    placeholders: list[StreamRecord]
 ) -> StreamsData:
     """Format streams into the final output structure."""
     output = StreamsData(
-        last_updated=datetime.now(timezone.utc),
+        last_updated=clock.now(),
         streams={}
     )
     
-    # Process all streams and add them to the streams object with match_id as key
-    for stream in live_streams + upcoming_matches:
-        if stream.fixture and stream.fixture.match_id:
-            output.streams[stream.fixture.match_id] = StreamInfo(
+    # Process all streams and add them to the streams object with match_id as key.
+    # Placeholders go last, and only have a null videoId
+    for stream in (*live_streams, *upcoming_matches, *placeholders):
+        fixture = stream.fixture
+        if fixture and fixture.match_id:
+            output.streams[fixture.match_id] = StreamInfo(
                 video_id=stream.video_id,
                 title=stream.title,
                 channel_id=stream.channel_id,
-                standard_title=f"{stream.fixture.home_team} vs {stream.fixture.away_team}"
-            )
-    
-    # Add placeholders with null videoId
-    for placeholder in placeholders:
-        if placeholder.fixture and placeholder.fixture.match_id:
-            output.streams[placeholder.fixture.match_id] = StreamInfo(
-                video_id=None,
-                title=placeholder.title,
-                channel_id=placeholder.channel_id,
-                standard_title=f"{placeholder.fixture.home_team} vs {placeholder.fixture.away_team}"
+                standard_title=f"{fixture.home_team} vs {fixture.away_team}"
             )
     
     # Sort streams by match_id
@@ -395,80 +517,438 @@ def format_streams_for_output(
     
     return output
 
-def main():
+def write_streams_file(output_data: StreamsData):
+    """Write streams data to streams.json."""
+    with open("public/data/streams.json", "w") as f:
+        # Convert datetime to ISO format string for JSON serialization
+        data = output_data.model_dump(by_alias=True)
+        data["lastUpdated"] = data["lastUpdated"].isoformat()
+        json.dump(data, f, indent=2)
+
+def publish_streams(output_data: StreamsData, existing_data: StreamsData, fixtures: list[Fixture]) -> bool:
+    """Write streams.json and queue notifications for new streams if anything changed.
+
+    Returns whether streams.json was written.
+    """
+    # Compare streams data (excluding last_updated)
+    output_streams = output_data.streams
+    existing_streams = existing_data.streams
+
+    if output_streams != existing_streams or not Path("public/data/streams.json").exists():
+        # Only write if there are actual changes to the streams, or none have been written yet
+        write_streams_file(output_data)
+        print("Successfully updated streams.json with changes")
+
+        # Queue notifications for new streams, to be posted by the outbox worker
+        # Get list of match IDs with new or changed video IDs
+        new_or_changed_stream_match_ids = [
+            match_id for match_id, stream in output_data.streams.items()
+            if stream.video_id and (
+                match_id not in existing_data.streams or
+                existing_data.streams[match_id].video_id != stream.video_id
+            )]
+        # Get list of match IDs with new or changed video IDs
+        if len(new_or_changed_stream_match_ids) > 0:
+            outbox.enqueue(
+                [f for f in fixtures if f.match_id in new_or_changed_stream_match_ids],
+                {match_id: output_data.streams[match_id].video_id for match_id in new_or_changed_stream_match_ids}
+            )
+        return True
+
+    print("No changes detected in streams data, skipping write")
+    return False
+
+def merge_streams(
+    existing_data: StreamsData,
+    live_streams: list[StreamRecord],
+    upcoming_matches: list[StreamRecord]
+) -> StreamsData:
+    """Merge streams found for a subset of videos into the existing streams data.
+
+    Live streams always replace what we had for their match, while upcoming
+    streams only fill in placeholders.
+    """
+    output = StreamsData(
+        last_updated=clock.now(),
+        streams=dict(existing_data.streams)
+    )
+    announced = format_streams_for_output(live_streams, upcoming_matches, [])
+
+    live_match_ids = {stream.fixture.match_id for stream in live_streams}
+    for match_id, stream in announced.streams.items():
+        existing_stream = output.streams.get(match_id)
+        is_live = match_id in live_match_ids
+        if is_live or not existing_stream or not existing_stream.video_id:
+            output.streams[match_id] = stream
+
+    output.streams = dict(sorted(output.streams.items()))
+    return output
+
+def poll_streams(channels: dict[str, Channel]) -> tuple[list[Fixture], list[StreamRecord], list[StreamRecord]]:
+    """Run a single polling cycle, writing streams.json and posting if anything changed.
+
+    Returns today's fixtures along with the live and upcoming streams found, so
+    callers can decide when the next cycle is due.
+    """
+    fixtures = load_fixtures()
+
+    if not fixtures:
+        print("No fixtures found for today")
+        # Check if streams.json exists and is empty
+        streams_file = Path("public/data/streams.json")
+        if streams_file.exists():
+            try:
+                with open(streams_file) as f:
+                    data = json.load(f)
+                    if not data.get("streams"):  # Check if streams is empty
+                        print("Empty streams.json already exists, skipping write")
+                        return fixtures, [], []
+            except json.JSONDecodeError:
+                pass  # If file is invalid JSON, we'll overwrite it
+
+        # Write empty streams.json
+        empty_data = StreamsData(
+            last_updated=clock.now(),
+            streams={}
+        )
+        write_streams_file(empty_data)
+        print("Successfully wrote empty streams.json")
+        return fixtures, [], []
+
+    # Get live and upcoming streams
+    live_streams, upcoming_matches = get_live_streams(fixtures, channels)
+
+    # Create placeholders for matches without streams
+    placeholders = create_placeholder_streams(fixtures, channels, live_streams, upcoming_matches)
+
+    # Format streams data for output
+    output_data = format_streams_for_output(live_streams, upcoming_matches, placeholders)
+
+    publish_streams(output_data, load_existing_streams(), fixtures)
+
+    return fixtures, live_streams, upcoming_matches
+
+def shard_for_channel(channel_id: str, shard_count: int) -> int:
+    """Assign a channel to a shard by rendezvous hashing.
+
+    Each shard scores the channel and the highest score wins, so changing the
+    shard count only moves the channels whose winning shard was added or removed.
+    """
+    return max(
+        range(shard_count),
+        key=lambda shard: hashlib.sha256(f"{shard}:{channel_id}".encode()).digest()
+    )
+
+def shard_fixtures(
+    fixtures: list[Fixture],
+    channels: dict[str, Channel],
+    shard_index: int,
+    shard_count: int
+) -> list[Fixture]:
+    """Get the fixtures whose home channel, or away channel if the home team has none, belongs to the given shard."""
+    sharded = []
+    for fixture in fixtures:
+        channel_id = (
+            get_channel_id_for_team(fixture.home_team, channels)
+            or get_channel_id_for_team(fixture.away_team, channels)
+        )
+        if channel_id and shard_for_channel(channel_id, shard_count) == shard_index:
+            sharded.append(fixture)
+    return sharded
+
+def shard_file(shard_index: int, shard_count: int, shards_dir: Path = SHARDS_DIR) -> Path:
+    return shards_dir / f"streams-{shard_index}-of-{shard_count}.json"
+
+def poll_shard(
+    channels: dict[str, Channel],
+    shard_index: int,
+    shard_count: int,
+    shards_dir: Path = SHARDS_DIR
+) -> StreamsShard:
+    """Poll one shard's share of today's channels and write its partial streams.
+
+    A shard polls both teams' channels for the fixtures it owns, but matches
+    streams against all of today's fixtures before keeping its own, so the
+    shards' streams together are exactly what a single worker would find.
+    """
+    all_fixtures = load_fixtures()
+    fixtures = shard_fixtures(all_fixtures, channels, shard_index, shard_count)
+    print(f"Shard {shard_index} of {shard_count} is polling {len(fixtures)} fixtures")
+
+    live_streams, upcoming_matches = [], []
+    if fixtures:
+        # Each shard keeps its own feed state, so workers sharing a state directory don't clobber it
+        feed_discovery = FeedDiscovery(namespace=f"feeds-{shard_index}-of-{shard_count}")
+        live_streams, upcoming_matches = get_live_streams(
+            all_fixtures, channels, feed_discovery, get_active_channel_ids(fixtures, channels)
+        )
+        match_ids = {fixture.match_id for fixture in fixtures}
+        live_streams = [stream for stream in live_streams if stream.fixture.match_id in match_ids]
+        upcoming_matches = [stream for stream in upcoming_matches if stream.fixture.match_id in match_ids]
+    placeholders = create_placeholder_streams(fixtures, channels, live_streams, upcoming_matches)
+    output_data = format_streams_for_output(live_streams, upcoming_matches, placeholders)
+
+    shard = StreamsShard(
+        shard_index=shard_index,
+        shard_count=shard_count,
+        last_updated=output_data.last_updated,
+        streams=output_data.streams
+    )
+    save_json(
+        shard_file(shard_index, shard_count, shards_dir),
+        shard.model_dump(by_alias=True, mode="json")
+    )
+    return shard
+
+def merge_shards(shard_count: int, shards_dir: Path = SHARDS_DIR) -> StreamsData:
+    """Combine every shard's partial streams into one streams data.
+
+    All shards must be present. If more than one shard has a stream for the
+    same match, a real stream beats a placeholder, then the shard that owns the
+    stream's channel wins, then the lowest shard index, so the result never
+    depends on the order the shards finished in.
+    """
+    shards = []
+    missing = []
+    for shard_index in range(shard_count):
+        data = load_json(shard_file(shard_index, shard_count, shards_dir))
+        if data is None:
+            missing.append(shard_index)
+            continue
+        shard = StreamsShard(**data)
+        if shard.shard_index != shard_index or shard.shard_count != shard_count:
+            raise ValueError(f"Shard file for {shard_index} of {shard_count} holds shard {shard.shard_index} of {shard.shard_count}")
+        shards.append(shard)
+    if missing:
+        raise ValueError(f"Missing results for shards {missing} of {shard_count}")
+
+    def precedence(shard: StreamsShard, stream: StreamInfo):
+        owns_channel = shard_for_channel(stream.channel_id, shard_count) == shard.shard_index
+        return (stream.video_id is not None, owns_channel, -shard.shard_index)
+
+    chosen: dict[str, tuple[tuple, StreamInfo]] = {}
+    for shard in shards:
+        for match_id, stream in shard.streams.items():
+            rank = precedence(shard, stream)
+            if match_id in chosen and chosen[match_id][0] >= rank:
+                continue
+            chosen[match_id] = (rank, stream)
+
+    return StreamsData(
+        last_updated=clock.now(),
+        streams={match_id: stream for match_id, (_, stream) in sorted(chosen.items())}
+    )
+
+def publish_merged_shards(shard_count: int, shards_dir: Path = SHARDS_DIR) -> bool:
+    """Merge the shards' results and publish them as streams.json."""
+    output_data = merge_shards(shard_count, shards_dir)
+    print(f"Merged {len(output_data.streams)} streams from {shard_count} shards")
+    return publish_streams(output_data, load_existing_streams(), load_fixtures())
+
+def next_poll_interval(
+    fixtures: list[Fixture],
+    live_streams: list[StreamRecord],
+    upcoming_matches: list[StreamRecord],
+    now: datetime
+) -> float:
+    """Work out how many seconds to wait before the next daemon poll.
+
+    Polls tightly around scheduled start times while a fixture is still waiting
+    for its stream, and relaxes once every fixture is covered or there is
+    nothing left to find today.
+    """
+    # Never sleep past midnight, so the next day's fixtures are picked up promptly
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), time(0, 0), tzinfo=timezone.utc)
+    seconds_to_midnight = max((tomorrow - now).total_seconds(), DAEMON_MIN_INTERVAL)
+    interval = min(DAEMON_MAX_INTERVAL, seconds_to_midnight)
+
+    # Streams due to go live soon should be picked up as they start
+    for stream in upcoming_matches:
+        if stream.scheduled_start_time:
+            until_start = (stream.scheduled_start_time - now).total_seconds()
+            if until_start <= DAEMON_START_WINDOW.total_seconds():
+                return DAEMON_MIN_INTERVAL
+            interval = min(interval, until_start - DAEMON_START_WINDOW.total_seconds())
+
+    streamed_match_ids = {
+        stream.fixture.match_id for stream in live_streams + upcoming_matches
+    }
+    for fixture in fixtures:
+        if fixture.match_id in streamed_match_ids:
+            continue
+        start_time = get_fixture_start_time(fixture, now.date())
+        if not start_time:
+            continue
+        window_start = start_time - DAEMON_START_WINDOW
+        window_end = start_time + DAEMON_START_WINDOW
+        if window_start <= now <= window_end:
+            # A stream is expected any minute now
+            return DAEMON_MIN_INTERVAL
+        if now < window_start:
+            interval = min(interval, (window_start - now).total_seconds())
+        else:
+            # Past the start without a stream: keep looking, but less often
+            interval = min(interval, DAEMON_LATE_INTERVAL)
+
+    # Live streams still need checking to see when they end
+    if live_streams:
+        interval = min(interval, DAEMON_LATE_INTERVAL)
+
+    return max(interval, DAEMON_MIN_INTERVAL)
+
+def write_health_file(health_file: Path, health: dict):
+    """Atomically write the daemon's health status to disk."""
+    save_json(health_file, health)
+
+def run_daemon(health_file: Path = HEALTH_FILE):
+    """Poll continuously, keeping API clients and channel data warm between cycles."""
+    stop = threading.Event()
+
+    def request_stop(signum, frame):
+        print(f"Received signal {signum}, shutting down after the current cycle")
+        stop.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    channels = load_channels()
     try:
-        # Load required data
-        channels = load_channels()
-        fixtures = load_fixtures()
-        
-        if not fixtures:
-            print("No fixtures found for today")
-            # Check if streams.json exists and is empty
-            streams_file = Path("public/data/streams.json")
-            if streams_file.exists():
-                try:
-                    with open(streams_file) as f:
-                        data = json.load(f)
-                        if not data.get("streams"):  # Check if streams is empty
-                            print("Empty streams.json already exists, skipping write")
-                            return
-                except json.JSONDecodeError:
-                    pass  # If file is invalid JSON, we'll overwrite it
-            
-            # Write empty streams.json
-            empty_data = StreamsData(
-                last_updated=datetime.now(timezone.utc),
-                streams={}
+        bluesky.prewarm_handle_cache(cache=bluesky.get_handle_cache())
+    except Exception as e:
+        print(f"Error pre-warming Bluesky handle cache: {str(e)}")
+
+    health = {
+        "status": "starting",
+        "pid": os.getpid(),
+        "startedAt": clock.now().isoformat(),
+        "lastPollAt": None,
+        "lastSuccessAt": None,
+        "nextPollAt": None,
+        "intervalSeconds": None,
+        "consecutiveFailures": 0,
+        "lastError": None,
+    }
+    write_health_file(health_file, health)
+    print(f"Daemon started with pid {health['pid']}")
+
+    # Notifications go out from their own thread, so a slow post never delays a poll
+    notifier = threading.Thread(target=outbox.run_worker, args=(stop,), daemon=True)
+    notifier.start()
+
+    looked_ahead_on = None
+    while not stop.is_set():
+        # Look ahead once a day, on the first poll after midnight
+        if looked_ahead_on != clock.today():
+            looked_ahead_on = clock.today()
+            try:
+                look_ahead(channels)
+            except Exception as e:
+                print(f"Error looking ahead: {str(e)}")
+
+        health["lastPollAt"] = clock.now().isoformat()
+        try:
+            fixtures, live_streams, upcoming_matches = poll_streams(channels)
+            health["status"] = "ok"
+            health["lastSuccessAt"] = clock.now().isoformat()
+            health["consecutiveFailures"] = 0
+            health["lastError"] = None
+            interval = next_poll_interval(
+                fixtures, live_streams, upcoming_matches, clock.now()
             )
-            with open("public/data/streams.json", "w") as f:
-                data = empty_data.model_dump(by_alias=True)
-                data["lastUpdated"] = data["lastUpdated"].isoformat()
-                json.dump(data, f, indent=2)
-            print("Successfully wrote empty streams.json")
-            return
-            
-        # Get live and upcoming streams
-        live_streams, upcoming_matches = get_live_streams(fixtures, channels)
-        
-        # Create placeholders for matches without streams
-        placeholders = create_placeholder_streams(fixtures, channels, live_streams, upcoming_matches)
-        
-        # Format streams data for output
-        output_data = format_streams_for_output(live_streams, upcoming_matches, placeholders)
-        
-        # Load existing streams data
-        existing_data = load_existing_streams()
-        
-        # Compare streams data (excluding last_updated)
-        output_streams = output_data.streams
-        existing_streams = existing_data.streams
-        
-        if output_streams != existing_streams:
-            # Only write if there are actual changes to the streams
-            with open("public/data/streams.json", "w") as f:
-                # Convert datetime to ISO format string for JSON serialization
-                data = output_data.model_dump(by_alias=True)
-                data["lastUpdated"] = data["lastUpdated"].isoformat()
-                json.dump(data, f, indent=2)
-            print("Successfully updated streams.json with changes")
-            
-            # Post new streams to Bluesky
-            # Get list of match IDs with new or changed video IDs
-            new_or_changed_stream_match_ids = [
-                match_id for match_id, stream in output_data.streams.items()
-                if stream.video_id and (
-                    match_id not in existing_data.streams or 
-                    existing_data.streams[match_id].video_id != stream.video_id
-                )]
-            # Get list of match IDs with new or changed video IDs
-            if len(new_or_changed_stream_match_ids) > 0:
-                post_to_bluesky(new_or_changed_stream_match_ids, output_data)
+        except Exception as e:
+            print(f"Error in daemon poll: {str(e)}")
+            health["status"] = "error"
+            health["consecutiveFailures"] += 1
+            health["lastError"] = str(e)
+            # Back off on repeated failures, without sleeping past the relaxed interval
+            interval = min(
+                DAEMON_MIN_INTERVAL * 2 ** health["consecutiveFailures"],
+                DAEMON_MAX_INTERVAL
+            )
+
+        health["intervalSeconds"] = interval
+        health["nextPollAt"] = (clock.now() + timedelta(seconds=interval)).isoformat()
+        write_health_file(health_file, health)
+        print(f"Next poll in {interval:.0f} seconds")
+        stop.wait(interval)
+
+    notifier.join()
+    health["status"] = "stopped"
+    health["nextPollAt"] = None
+    write_health_file(health_file, health)
+    print("Daemon stopped")
+
+def main(
+    shard_index: int = 0,
+    shard_count: int = 1,
+    merge: bool = False,
+    shards_dir: Path = SHARDS_DIR,
+    lookahead_days: int = 0
+):
+    try:
+        if lookahead_days:
+            look_ahead(load_channels(), lookahead_days)
+        elif merge:
+            publish_merged_shards(shard_count, shards_dir)
+        elif shard_count > 1:
+            poll_shard(load_channels(), shard_index, shard_count, shards_dir)
         else:
-            print("No changes detected in streams data, skipping write")
-        
+            poll_streams(load_channels())
     except Exception as e:
         print(f"Error in main: {str(e)}")
         exit(1)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Update streams.json from YouTube")
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Stay resident and poll on an adaptive interval"
+    )
+    parser.add_argument(
+        "--health-file",
+        type=Path,
+        default=HEALTH_FILE,
+        help="Where the daemon writes its health status"
+    )
+    parser.add_argument(
+        "--shard-index",
+        type=int,
+        default=0,
+        help="Which shard of today's channels to poll, from 0"
+    )
+    parser.add_argument(
+        "--shard-count",
+        type=int,
+        default=1,
+        help="How many shards the channels are split across"
+    )
+    parser.add_argument(
+        "--merge-shards",
+        action="store_true",
+        help="Merge every shard's results into streams.json instead of polling"
+    )
+    parser.add_argument(
+        "--shards-dir",
+        type=Path,
+        default=SHARDS_DIR,
+        help="Where shards write their partial results"
+    )
+    parser.add_argument(
+        "--look-ahead",
+        type=int,
+        nargs="?",
+        const=LOOKAHEAD_DAYS,
+        default=0,
+        metavar="DAYS",
+        help=f"Find the streams already scheduled for the next DAYS days' fixtures ({LOOKAHEAD_DAYS} by default) instead of polling"
+    )
+    args = parser.parse_args()
+    if args.shard_count < 1 or not 0 <= args.shard_index < args.shard_count:
+        parser.error("--shard-index must be between 0 and --shard-count - 1")
+    if args.daemon and (args.shard_count > 1 or args.merge_shards):
+        parser.error("--daemon can't be combined with sharding")
+    if args.daemon:
+        run_daemon(args.health_file)
+    else:
+        main(args.shard_index, args.shard_count, args.merge_shards, args.shards_dir, args.look_ahead)
@@ -1,8 +1,17 @@
 import os
+import sys
 import json
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+from typing import Optional
+import httplib2
 from dotenv import load_dotenv
+from google.auth.exceptions import TransportError
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from state import StateStore, get_store
 
 # Load environment variables from .env file
 load_dotenv()
@@ -14,6 +23,18 @@ if not GOOGLE_API_KEY:
 
 youtube = build("youtube", "v3", developerKey=GOOGLE_API_KEY)
 
+# channels.list accepts up to 50 IDs per call
+CHANNELS_PER_REQUEST = 50
+# Each search.list call costs 100 quota units
+SEARCH_COST = 100
+SEARCH_QUOTA_CAP = int(os.getenv("SEARCH_QUOTA_CAP", "1000"))
+SEARCH_WORKERS = 4
+# How long a channel search is reused before it is run again
+SEARCH_CACHE_TTL = timedelta(days=int(os.getenv("SEARCH_CACHE_TTL_DAYS", "7")))
+SEARCH_CACHE_MAX_ENTRIES = 500
+# API errors, and network errors like timeouts, that fail a lookup without stopping the report
+REQUEST_ERRORS = (HttpError, httplib2.HttpLib2Error, TransportError, OSError)
+
 
 def load_channels():
     with open("channels.json", "r") as f:
@@ -25,86 +46,206 @@ def save_channels(channels):
         json.dump(channels, f, indent=2)
 
 
-def search_channel(name):
-    try:
-        print(f"\nSearching for: {name}")
-        request = youtube.search().list(
-            part="snippet", q=name, type="channel", maxResults=5
+def print_search_results(name, items):
+    print(f"\nSearch results for: {name}")
+    if not items:
+        print("❌ No channels found!")
+        return
+
+    print("\nFound channels:")
+    for i, item in enumerate(items, 1):
+        channel_id = item["snippet"]["channelId"]
+        channel_title = item["snippet"]["title"]
+        print(f"{i}. {channel_title}")
+        print(f"   ID: {channel_id}")
+        print(f"   URL: https://www.youtube.com/channel/{channel_id}")
+
+
+def get_channel_details(channel_ids: list[str]) -> dict[str, dict]:
+    """Look up channels in batches of 50, keyed by channel ID."""
+    details = {}
+    for i in range(0, len(channel_ids), CHANNELS_PER_REQUEST):
+        batch = channel_ids[i:i + CHANNELS_PER_REQUEST]
+        request = youtube.channels().list(
+            part="snippet,contentDetails", id=",".join(batch), maxResults=CHANNELS_PER_REQUEST
         )
         response = request.execute()
-
-        if not response.get("items"):
-            print("❌ No channels found!")
-            return None
-
-        print("\nFound channels:")
-        for i, item in enumerate(response["items"], 1):
-            channel_id = item["snippet"]["channelId"]
-            channel_title = item["snippet"]["title"]
-            print(f"{i}. {channel_title}")
-            print(f"   ID: {channel_id}")
-            print(f"   URL: https://www.youtube.com/channel/{channel_id}")
-
-        return response["items"]
-
-    except HttpError as e:
-        print(f"❌ Error searching for {name}: {e}")
-        return None
+        for item in response.get("items", []):
+            details[item["id"]] = item
+    return details
+
+
+class ChannelSearcher:
+    """Runs fallback channel searches concurrently, with a cache and a quota cap."""
+
+    def __init__(
+        self,
+        quota_cap: int = SEARCH_QUOTA_CAP,
+        store: Optional[StateStore] = None,
+        ttl: timedelta = SEARCH_CACHE_TTL,
+    ):
+        self.quota_cap = quota_cap
+        self.cache = (store or get_store()).namespace("channel-searches", ttl=ttl, max_entries=SEARCH_CACHE_MAX_ENTRIES)
+        self.quota_used = 0
+        self.skipped: list[str] = []
+
+    def search_all(self, names: list[str]) -> dict[str, Optional[list]]:
+        """Search for each name, reusing cached results and stopping at the quota cap."""
+        results = {}
+        to_search = []
+        names = list(dict.fromkeys(names))
+        cached = self.cache.get_many(names)
+        for name in names:
+            items = cached.get(name)
+            if items is not None:
+                results[name] = items
+            elif self.quota_used + SEARCH_COST <= self.quota_cap:
+                self.quota_used += SEARCH_COST
+                to_search.append(name)
+            else:
+                self.skipped.append(name)
+                results[name] = None
+
+        # Build requests up front; each is executed on its own connection, as
+        # the shared client isn't thread-safe
+        requests = [
+            youtube.search().list(part="snippet", q=name, type="channel", maxResults=5)
+            for name in to_search
+        ]
+
+        def execute(request):
+            try:
+                return request.execute(http=httplib2.Http(timeout=30))
+            except REQUEST_ERRORS as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=SEARCH_WORKERS) as executor:
+            responses = list(executor.map(execute, requests))
+
+        searched = {}
+        for name, response in zip(to_search, responses):
+            if isinstance(response, REQUEST_ERRORS):
+                print(f"❌ Error searching for {name}: {response}")
+                results[name] = None
+                continue
+            searched[name] = response.get("items", [])
+            results[name] = searched[name]
+        self.cache.set_many(searched)
+        if self.skipped:
+            print(f"⚠️ Search quota cap reached, skipped {len(self.skipped)} searches")
+        return results
 
 
-def validate_channels():
+def validate_channels(searcher: Optional[ChannelSearcher] = None, report_file: Optional[Path] = None) -> dict:
+    """Validate every channel and return a machine-readable report of what changed."""
     channels = load_channels()
-    updated = False
-
-    for county, channel in channels.items():
-        try:
-            print(f"\nValidating: {channel['name']}")
-            print(f"Current ID: {channel['youtubeChannelId']}")
-
-            # Get channel details including contentDetails to get uploads playlist
-            request = youtube.channels().list(
-                part="snippet,contentDetails", id=channel["youtubeChannelId"]
-            )
-            response = request.execute()
-
-            if not response.get("items"):
-                print("❌ Channel not found!")
-                print("Searching for correct channel...")
-                search_channel(channel["name"])
-                continue
+    searcher = searcher or ChannelSearcher()
+    report = {"changed": False, "changes": [], "missing": [], "mismatches": []}
+    to_search = []
 
-            channel_info = response["items"][0]["snippet"]
-            content_details = response["items"][0]["contentDetails"]
-            uploads_playlist_id = content_details["relatedPlaylists"]["uploads"]
-            
-            print(f"Found channel: {channel_info['title']}")
-            print(f"Channel URL: https://www.youtube.com/channel/{channel['youtubeChannelId']}")
-            print(f"Uploads Playlist ID: {uploads_playlist_id}")
-
-            # Update the channel with uploads playlist ID if it's not already there
-            if "uploadsPlaylistId" not in channel or channel["uploadsPlaylistId"] != uploads_playlist_id:
-                channel["uploadsPlaylistId"] = uploads_playlist_id
-                updated = True
-                print("✅ Added/Updated uploads playlist ID")
-
-            # Check if the found title matches our expected name
-            if channel_info["title"].lower() != channel["name"].lower():
-                print("⚠️ Warning: Channel name mismatch!")
-                print(f"Expected: {channel['name']}")
-                print(f"Found: {channel_info['title']}")
-                print("Searching for correct channel...")
-                search_channel(channel["name"])
-            else:
-                print("✅ Channel name matches")
+    channel_ids = [channel["youtubeChannelId"] for channel in channels.values()]
+    try:
+        details = get_channel_details(channel_ids)
+    except REQUEST_ERRORS as e:
+        print(f"❌ Error: {e}")
+        report["error"] = str(e)
+        write_report(report, report_file)
+        return report
 
-        except HttpError as e:
-            print(f"❌ Error: {e}")
+    for county, channel in channels.items():
+        print(f"\nValidating: {channel['name']}")
+        print(f"Current ID: {channel['youtubeChannelId']}")
+
+        item = details.get(channel["youtubeChannelId"])
+        if not item:
+            print("❌ Channel not found!")
+            report["missing"].append(county)
+            to_search.append(channel["name"])
             continue
 
-    if updated:
+        channel_info = item["snippet"]
+        uploads_playlist_id = item["contentDetails"]["relatedPlaylists"]["uploads"]
+
+        print(f"Found channel: {channel_info['title']}")
+        print(f"Channel URL: https://www.youtube.com/channel/{channel['youtubeChannelId']}")
+        print(f"Uploads Playlist ID: {uploads_playlist_id}")
+
+        # Update the channel with uploads playlist ID if it's not already there
+        if channel.get("uploadsPlaylistId") != uploads_playlist_id:
+            report["changes"].append({
+                "county": county,
+                "field": "uploadsPlaylistId",
+                "old": channel.get("uploadsPlaylistId"),
+                "new": uploads_playlist_id,
+            })
+            channel["uploadsPlaylistId"] = uploads_playlist_id
+            print("✅ Added/Updated uploads playlist ID")
+
+        # Check if the found title matches our expected name
+        if channel_info["title"].lower() != channel["name"].lower():
+            print("⚠️ Warning: Channel name mismatch!")
+            print(f"Expected: {channel['name']}")
+            print(f"Found: {channel_info['title']}")
+            report["mismatches"].append({
+                "county": county,
+                "expected": channel["name"],
+                "found": channel_info["title"],
+            })
+            to_search.append(channel["name"])
+        else:
+            print("✅ Channel name matches")
+
+    # Search for replacements for missing and mismatched channels together
+    search_results = searcher.search_all(to_search)
+    for name, items in search_results.items():
+        if items is not None:
+            print_search_results(name, items)
+    candidates = {
+        name: [
+            {"channelId": item["snippet"]["channelId"], "title": item["snippet"]["title"]}
+            for item in items
+        ]
+        for name, items in search_results.items()
+        if items
+    }
+    for entry in report["mismatches"]:
+        entry["candidates"] = candidates.get(entry["expected"], [])
+
+    report["changed"] = bool(report["changes"])
+    report["searchQuotaUsed"] = searcher.quota_used
+    report["searchesSkipped"] = searcher.skipped
+
+    if report["changed"]:
         save_channels(channels)
         print("\n✅ Updated channels.json with uploads playlist IDs")
+    else:
+        print("\nNo changes to channels.json")
+
+    write_report(report, report_file)
+    return report
+
+
+def write_report(report: dict, report_file: Optional[Path] = None):
+    """Write the report and the workflow outputs, including when validation failed."""
+    if report_file:
+        with open(report_file, "w") as f:
+            json.dump(report, f, indent=2)
+
+    # Let the workflow skip committing when nothing changed
+    github_output = os.getenv("GITHUB_OUTPUT")
+    if github_output:
+        with open(github_output, "a") as f:
+            f.write(f"changed={'true' if report['changed'] else 'false'}\n")
 
 
 if __name__ == "__main__":
-    validate_channels()
+    parser = argparse.ArgumentParser(description="Validate the YouTube channels in channels.json")
+    parser.add_argument(
+        "--report",
+        type=Path,
+        help="Write a JSON report of changes, missing channels and mismatches"
+    )
+    args = parser.parse_args()
+    report = validate_channels(report_file=args.report)
+    if "error" in report:
+        sys.exit(1)
@@ -0,0 +1,482 @@
+import os
+import hmac
+import queue
+import hashlib
+import argparse
+import threading
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+from urllib.parse import parse_qs, urlparse
+import requests
+from dotenv import load_dotenv
+from models import Channel
+import outbox
+import clock
+from state import STATE_DIR, load_json, save_json
+from update_streams import (
+    load_channels,
+    load_fixtures,
+    load_existing_streams,
+    get_video_streams,
+    merge_streams,
+    publish_streams,
+)
+
+# Load environment variables
+load_dotenv()
+
+# WebSub setup
+WEBSUB_HUB_URL = os.getenv("WEBSUB_HUB_URL", "https://pubsubhubbub.appspot.com/subscribe")
+WEBSUB_CALLBACK_URL = os.getenv("WEBSUB_CALLBACK_URL")
+WEBSUB_SECRET = os.getenv("WEBSUB_SECRET")
+WEBSUB_LEASE_SECONDS = int(os.getenv("WEBSUB_LEASE_SECONDS", "432000"))  # 5 days
+LEASE_RENEWAL_MARGIN = timedelta(days=1)
+LEASES_FILE = STATE_DIR / "websub-leases.json"
+# Requests awaiting the hub's verification, which is refused once they're this old
+PENDING_FILE = STATE_DIR / "websub-pending.json"
+PENDING_TTL = timedelta(hours=1)
+# Leases and pending requests are written by the renewal loop and the receiver's threads
+leases_lock = threading.Lock()
+
+TOPIC_URL = "https://www.youtube.com/xml/feeds/videos.xml?channel_id={channel_id}"
+ATOM_NS = "{http://www.w3.org/2005/Atom}"
+YT_NS = "{http://www.youtube.com/xml/schemas/2015}"
+
+
+def topic_for_channel(channel_id: str) -> str:
+    return TOPIC_URL.format(channel_id=channel_id)
+
+
+def parse_notification(body: bytes) -> list[tuple[str, str]]:
+    """Parse an Atom notification into (video_id, channel_id) pairs.
+
+    Deleted-entry tombstones are ignored, since a removed video can't become a stream.
+    """
+    try:
+        root = ET.fromstring(body)
+    except ET.ParseError as e:
+        print(f"Error parsing WebSub notification: {str(e)}")
+        return []
+
+    videos = []
+    for entry in root.iter(f"{ATOM_NS}entry"):
+        video_id = entry.findtext(f"{YT_NS}videoId")
+        channel_id = entry.findtext(f"{YT_NS}channelId")
+        if video_id and channel_id:
+            videos.append((video_id, channel_id))
+    return videos
+
+
+def build_notification(video_id: str, channel_id: str, title: str = "") -> bytes:
+    """Build an Atom notification in the shape YouTube's hub sends."""
+    now = clock.now().isoformat()
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns:yt="http://www.youtube.com/xml/schemas/2015" xmlns="http://www.w3.org/2005/Atom">
+  <link rel="hub" href="https://pubsubhubbub.appspot.com"/>
+  <link rel="self" href="{topic_for_channel(channel_id)}"/>
+  <title>YouTube video feed</title>
+  <updated>{now}</updated>
+  <entry>
+    <id>yt:video:{video_id}</id>
+    <yt:videoId>{video_id}</yt:videoId>
+    <yt:channelId>{channel_id}</yt:channelId>
+    <title>{title}</title>
+    <link rel="alternate" href="https://www.youtube.com/watch?v={video_id}"/>
+    <published>{now}</published>
+    <updated>{now}</updated>
+  </entry>
+</feed>
+""".encode("utf-8")
+
+
+def sign_body(body: bytes, secret: str) -> str:
+    return "sha1=" + hmac.new(secret.encode("utf-8"), body, hashlib.sha1).hexdigest()
+
+
+def load_leases(leases_file: Path = LEASES_FILE) -> dict[str, str]:
+    """Load lease expiry times keyed by topic."""
+    return load_json(leases_file, {})
+
+
+def save_leases(leases: dict[str, str], leases_file: Path = LEASES_FILE):
+    save_json(leases_file, leases)
+
+
+def load_pending(pending_file: Path = PENDING_FILE) -> dict[str, dict]:
+    """Load the requests awaiting verification, keyed by topic."""
+    return load_json(pending_file, {})
+
+
+def set_pending(topic: str, request: Optional[dict], pending_file: Path = PENDING_FILE):
+    """Record the request sent for a topic, or clear it with None."""
+    with leases_lock:
+        pending = load_pending(pending_file)
+        if request is None:
+            pending.pop(topic, None)
+        else:
+            pending[topic] = request
+        save_json(pending_file, pending)
+
+
+def subscribe(
+    channel_id: str,
+    callback_url: str,
+    hub_url: str = WEBSUB_HUB_URL,
+    mode: str = "subscribe",
+    secret: Optional[str] = WEBSUB_SECRET,
+    pending_file: Path = PENDING_FILE,
+) -> bool:
+    """Ask the hub to (un)subscribe our callback to a channel's uploads topic.
+
+    The hub confirms asynchronously by calling the callback with a challenge,
+    which the receiver only answers for the request recorded here.
+    """
+    topic = topic_for_channel(channel_id)
+    # Recorded before sending, as the hub can verify before it answers
+    set_pending(topic, {
+        "mode": mode,
+        "leaseSeconds": WEBSUB_LEASE_SECONDS,
+        "requestedAt": clock.now().isoformat(),
+    }, pending_file)
+    data = {
+        "hub.callback": callback_url,
+        "hub.topic": topic,
+        "hub.mode": mode,
+        "hub.verify": "async",
+        "hub.lease_seconds": str(WEBSUB_LEASE_SECONDS),
+    }
+    if secret:
+        data["hub.secret"] = secret
+    try:
+        response = requests.post(hub_url, data=data, timeout=10)
+        response.raise_for_status()
+        return True
+    except requests.exceptions.RequestException as e:
+        print(f"Error subscribing to {channel_id}: {str(e)}")
+        set_pending(topic, None, pending_file)
+        return False
+
+
+def renew_leases(
+    channels: dict[str, Channel],
+    callback_url: str,
+    hub_url: str = WEBSUB_HUB_URL,
+    leases_file: Path = LEASES_FILE,
+    secret: Optional[str] = WEBSUB_SECRET,
+    pending_file: Path = PENDING_FILE,
+) -> list[str]:
+    """Subscribe to every channel whose lease is missing or about to expire.
+
+    Returns the channel IDs a subscription request was sent for.
+    """
+    leases = load_leases(leases_file)
+    renew_before = clock.now() + LEASE_RENEWAL_MARGIN
+    renewed = []
+    for channel in channels.values():
+        expires_at = leases.get(topic_for_channel(channel.youtube_channel_id))
+        if expires_at and datetime.fromisoformat(expires_at) > renew_before:
+            continue
+        if subscribe(channel.youtube_channel_id, callback_url, hub_url, secret=secret, pending_file=pending_file):
+            renewed.append(channel.youtube_channel_id)
+    if renewed:
+        print(f"Requested WebSub subscriptions for {len(renewed)} channels")
+    return renewed
+
+
+def handle_announced_videos(video_ids: list[str]):
+    """Look up only the announced videos and merge any streams into streams.json."""
+    channels = load_channels()
+    fixtures = load_fixtures()
+    if not fixtures:
+        print("No fixtures found for today, ignoring announced videos")
+        return
+
+    live_streams, upcoming_matches = get_video_streams(video_ids, fixtures, channels)
+    if not live_streams and not upcoming_matches:
+        print(f"No fixture streams among {len(video_ids)} announced videos")
+        return
+
+    existing_data = load_existing_streams()
+    output_data = merge_streams(existing_data, live_streams, upcoming_matches)
+    publish_streams(output_data, existing_data, fixtures)
+
+
+class WebSubReceiver:
+    """HTTP endpoint that verifies subscriptions and receives upload notifications.
+
+    Announced video IDs are handed to a single worker thread, so lookups and
+    writes to streams.json never overlap. Notifications arriving close together
+    are coalesced into one lookup.
+    """
+
+    def __init__(
+        self,
+        channels: dict[str, Channel],
+        host: str = "0.0.0.0",
+        port: int = 8080,
+        secret: Optional[str] = WEBSUB_SECRET,
+        on_videos: Callable[[list[str]], None] = handle_announced_videos,
+        leases_file: Path = LEASES_FILE,
+        coalesce_seconds: float = 2.0,
+        pending_file: Path = PENDING_FILE,
+    ):
+        self.topics = {topic_for_channel(ch.youtube_channel_id) for ch in channels.values()}
+        self.channel_ids = {ch.youtube_channel_id for ch in channels.values()}
+        self.secret = secret
+        self.on_videos = on_videos
+        self.leases_file = leases_file
+        self.pending_file = pending_file
+        self.coalesce_seconds = coalesce_seconds
+        self.video_queue: queue.Queue[Optional[str]] = queue.Queue()
+        self.server = ThreadingHTTPServer((host, port), self._make_handler())
+        self.worker = threading.Thread(target=self._process_videos, daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self.server.server_address[1]
+
+    def _make_handler(self):
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+                status, body = receiver.verify(params)
+                self.send_response(status)
+                self.send_header("Content-Type", "text/plain")
+                self.end_headers()
+                self.wfile.write(body.encode("utf-8"))
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length)
+                receiver.receive(body, self.headers.get("X-Hub-Signature"))
+                # Always acknowledge, otherwise the hub keeps retrying
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def verify(self, params: dict[str, str]) -> tuple[int, str]:
+        """Answer a hub's verification request for one of our topics.
+
+        Only a request we've just sent is confirmed, so a forged verification
+        can't unsubscribe us or claim a lease that would stop us renewing.
+        """
+        mode = params.get("hub.mode")
+        topic = params.get("hub.topic")
+        challenge = params.get("hub.challenge")
+        if mode not in ("subscribe", "unsubscribe") or topic not in self.topics or not challenge:
+            print(f"Rejecting WebSub verification for {topic} ({mode})")
+            return 404, ""
+        try:
+            lease_seconds = int(params["hub.lease_seconds"]) if "hub.lease_seconds" in params else None
+        except ValueError:
+            print(f"Rejecting WebSub verification for {topic} with lease {params['hub.lease_seconds']!r}")
+            return 400, ""
+
+        with leases_lock:
+            pending = load_pending(self.pending_file)
+            request = pending.get(topic)
+            if (
+                not request
+                or request["mode"] != mode
+                or datetime.fromisoformat(request["requestedAt"]) < clock.now() - PENDING_TTL
+            ):
+                print(f"Rejecting WebSub {mode} for {topic}, which wasn't requested")
+                return 404, ""
+            del pending[topic]
+            save_json(self.pending_file, pending)
+
+            leases = load_leases(self.leases_file)
+            if mode == "subscribe":
+                # The hub may grant less than we asked for, but never more
+                requested = request["leaseSeconds"]
+                lease_seconds = requested if lease_seconds is None else min(max(lease_seconds, 0), requested)
+                expires_at = clock.now() + timedelta(seconds=lease_seconds)
+                leases[topic] = expires_at.isoformat()
+            else:
+                leases.pop(topic, None)
+            save_leases(leases, self.leases_file)
+        print(f"Verified WebSub {mode} for {topic}")
+        return 200, challenge
+
+    def receive(self, body: bytes, signature: Optional[str]):
+        """Queue the videos announced in a notification."""
+        if self.secret and not (
+            signature and hmac.compare_digest(signature, sign_body(body, self.secret))
+        ):
+            print("Ignoring WebSub notification with invalid signature")
+            return
+        for video_id, channel_id in parse_notification(body):
+            if channel_id in self.channel_ids:
+                self.video_queue.put(video_id)
+
+    def _process_videos(self):
+        while True:
+            video_id = self.video_queue.get()
+            if video_id is None:
+                return
+            video_ids = [video_id]
+            # Gather anything else announced in the same burst
+            try:
+                while True:
+                    next_id = self.video_queue.get(timeout=self.coalesce_seconds)
+                    if next_id is None:
+                        self.video_queue.put(None)
+                        break
+                    if next_id not in video_ids:
+                        video_ids.append(next_id)
+            except queue.Empty:
+                pass
+            print(f"Looking up {len(video_ids)} announced videos")
+            try:
+                self.on_videos(video_ids)
+            except Exception as e:
+                print(f"Error handling announced videos: {str(e)}")
+
+    def start(self):
+        self.worker.start()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.video_queue.put(None)
+        self.worker.join()
+
+
+class LocalHub:
+    """Minimal stand-in for the YouTube hub, for testing the receiver locally.
+
+    It accepts subscription requests, verifies them against the subscriber's
+    callback, and can publish notifications to verified subscribers.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.subscriptions: dict[str, dict[str, Optional[str]]] = {}
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._make_handler())
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/subscribe"
+
+    def _make_handler(self):
+        hub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                params = {
+                    k: v[0] for k, v in parse_qs(self.rfile.read(length).decode("utf-8")).items()
+                }
+                self.send_response(202)
+                self.end_headers()
+                threading.Thread(target=hub.verify_subscriber, args=(params,), daemon=True).start()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def verify_subscriber(self, params: dict[str, str]) -> bool:
+        challenge = os.urandom(8).hex()
+        try:
+            response = requests.get(
+                params["hub.callback"],
+                params={
+                    "hub.mode": params["hub.mode"],
+                    "hub.topic": params["hub.topic"],
+                    "hub.challenge": challenge,
+                    "hub.lease_seconds": params.get("hub.lease_seconds", WEBSUB_LEASE_SECONDS),
+                },
+                timeout=10,
+            )
+        except requests.exceptions.RequestException as e:
+            print(f"Local hub could not verify {params.get('hub.callback')}: {str(e)}")
+            return False
+        if response.status_code != 200 or response.text != challenge:
+            return False
+
+        with self.lock:
+            subscribers = self.subscriptions.setdefault(params["hub.topic"], {})
+            if params["hub.mode"] == "subscribe":
+                subscribers[params["hub.callback"]] = params.get("hub.secret")
+            else:
+                subscribers.pop(params["hub.callback"], None)
+        return True
+
+    def publish(self, channel_id: str, body: bytes) -> int:
+        """Deliver a notification to every subscriber of a channel's topic."""
+        with self.lock:
+            subscribers = dict(self.subscriptions.get(topic_for_channel(channel_id), {}))
+        for callback, secret in subscribers.items():
+            headers = {"Content-Type": "application/atom+xml"}
+            if secret:
+                headers["X-Hub-Signature"] = sign_body(body, secret)
+            requests.post(callback, data=body, headers=headers, timeout=10)
+        return len(subscribers)
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Receive YouTube upload notifications over WebSub")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8080")))
+    parser.add_argument(
+        "--callback-url",
+        default=WEBSUB_CALLBACK_URL,
+        help="Public URL the hub can reach this receiver on"
+    )
+    parser.add_argument(
+        "--local-hub",
+        action="store_true",
+        help="Subscribe through a local stand-in hub instead of YouTube's"
+    )
+    args = parser.parse_args()
+
+    channels = load_channels()
+    receiver = WebSubReceiver(channels, host=args.host, port=args.port)
+    receiver.start()
+    callback_url = args.callback_url or f"http://127.0.0.1:{receiver.port}/"
+
+    hub_url = WEBSUB_HUB_URL
+    if args.local_hub:
+        hub = LocalHub()
+        hub.start()
+        hub_url = hub.url
+        print(f"Local hub listening on {hub_url}")
+
+    print(f"WebSub receiver listening on port {receiver.port}, callback {callback_url}")
+    stop = threading.Event()
+    notifier = threading.Thread(target=outbox.run_worker, args=(stop,), daemon=True)
+    notifier.start()
+    try:
+        while not stop.is_set():
+            renew_leases(channels, callback_url, hub_url)
+            # Check leases hourly; renewals happen a day before expiry
+            stop.wait(3600)
+    except KeyboardInterrupt:
+        print("Shutting down WebSub receiver")
+    finally:
+        stop.set()
+        receiver.stop()
+        notifier.join()
+
+
+if __name__ == "__main__":
+    main()